@@ -1,13 +1,17 @@
 from services import geral_svc as g_svc
 
 import streamlit as st
-import pandas as pd
 import database as db
 import auth
+import componentes
 from datetime import datetime, date
+from services import dependencias_svc as dep
+pd = dep.preguicoso("pandas")
 
 # 1. Configuração Inicial
 st.set_page_config(page_title="Visão Operacional", layout="wide", page_icon="🏠")
+componentes.medir_pagina("Visão Operacional")
+db.carregar_referencias()  # Tabelas de referência já em memória para as demais telas
 
 if not auth.validar_sessao():
     auth.tela_login()
@@ -33,8 +37,21 @@ st.markdown("""
 
 # --- INTERFACE PRINCIPAL ---
 
-# 1. Busca os Totais (Cards) no Backend
-dados = db.buscar_resumo_operacional_mes(unidade_atual)
+# 1. Busca tudo o que a tela exibe no Backend (uma conexão, três consultas)
+# As listas de pendências vêm paginadas do banco (página atual de cada grade)
+painel = db.buscar_painel_home(
+    unidade_atual,
+    limite=componentes.TAMANHO_PAGINA,
+    offset_receber=componentes.offset_grade("home_receber"),
+    offset_pagar=componentes.offset_grade("home_pagar"),
+)
+dados = painel['resumo']
+
+# Página além do fim (a lista encolheu desde a última visita): volta ao início
+for chave, qtd in (("home_receber", painel['qtd_receber']), ("home_pagar", painel['qtd_pagar'])):
+    if qtd == 0 and componentes.offset_grade(chave) > 0:
+        componentes.reiniciar_grade(chave)
+        st.rerun()
 
 # Cabeçalho
 st.title(f"🏠 Visão Operacional ({dados.get('mes', '-')})")
@@ -56,50 +73,99 @@ if dados:
 st.markdown("### 📅 Próximos Vencimentos (Ainda não pagos)")
 col_l, col_r = st.columns(2)
 
+config_pendencias = {
+    "situacao": st.column_config.TextColumn("", width="small"),
+    "data_vencimento": st.column_config.DateColumn("Vencimento", format="DD/MM/YYYY"),
+    "nome": "Aluno",
+    "descricao": "Descrição",
+    "valor": st.column_config.NumberColumn("Valor", format="R$ %.2f"),
+}
+
+@componentes.na_fase("processamento")
+def preparar_pendencias(df, coluna_valor):
+    df = df.rename(columns={coluna_valor: 'valor'})
+    df.insert(0, 'situacao', g_svc.situacao_vencimento(df['data_vencimento']))
+    df['data_vencimento'] = pd.to_datetime(df['data_vencimento'])
+    df['valor'] = df['valor'] / 100.0
+    return df
+
 # --- COLUNA ESQUERDA: A RECEBER ---
 with col_l:
     st.markdown(f"**A Receber (Alunos): {g_svc.format_brl(dados.get('rec_pendente', 0))}**")
-    st.divider()
     
-    # Busca Lista no Backend
-    df_rec = db.buscar_pendencias_recebimento(unidade_atual, dados['mes'])
-    
-    if not df_rec.empty:
-        h1, h2, h3 = st.columns([1.5, 3, 2])
-        h1.caption("Vencimento")
-        h2.caption("Aluno")
-        h3.caption("Valor")
-        
-        for _, row in df_rec.iterrows():
-            visual_date = g_svc.get_status_visual(row['data_vencimento'])
-            r1, r2, r3 = st.columns([1.5, 3, 2])
-            r1.markdown(visual_date)
-            r2.write(row['nome'])
-            r3.write(g_svc.format_brl(db.from_cents(row['valor_pago'])))
-            st.markdown("<hr>", unsafe_allow_html=True)
+    if painel['qtd_receber']:
+        componentes.grade_paginada(
+            "home_receber", preparar_pendencias(painel['pendencias_receber'], 'valor_pago'), painel['qtd_receber'],
+            column_config=config_pendencias, selecionavel=False
+        )
     else:
         st.success("Tudo recebido neste mês!")
 
 # --- COLUNA DIREITA: A PAGAR ---
 with col_r:
     st.markdown(f"**A Pagar (Despesas): {g_svc.format_brl(dados.get('desp_pendente', 0))}**")
-    st.divider()
-    
-    # Busca Lista no Backend
-    df_pag = db.buscar_pendencias_pagamento(unidade_atual, dados['mes'])
     
-    if not df_pag.empty:
-        h1, h2, h3 = st.columns([1.5, 3, 2])
-        h1.caption("Vencimento")
-        h2.caption("Descrição")
-        h3.caption("Valor")
-        
-        for _, row in df_pag.iterrows():
-            visual_date = g_svc.get_status_visual(row['data_vencimento'])
-            r1, r2, r3 = st.columns([1.5, 3, 2])
-            r1.markdown(visual_date)
-            r2.write(row['descricao'])
-            r3.write(g_svc.format_brl(db.from_cents(row['valor'])))
-            st.markdown("<hr>", unsafe_allow_html=True)
+    if painel['qtd_pagar']:
+        componentes.grade_paginada(
+            "home_pagar", preparar_pendencias(painel['pendencias_pagar'], 'valor'), painel['qtd_pagar'],
+            column_config=config_pendencias, selecionavel=False
+        )
     else:
-        st.success("Tudo pago neste mês!")
\ No newline at end of file
+        st.success("Tudo pago neste mês!")
+
+
+# --- CARTEIRA EM ATRASO (AGING) ---
+st.markdown("---")
+st.markdown("### ⏳ Carteira a Receber por Atraso")
+
+df_aging = painel['aging']
+
+if df_aging.empty:
+    st.success("Nenhuma mensalidade pendente na unidade.")
+else:
+    faixas = dict(db.FAIXAS_AGING)
+    colunas_faixa = list(faixas.keys())
+    df_aging[colunas_faixa + ['total']] = df_aging[colunas_faixa + ['total']] / 100.0
+
+    # Totais da unidade (uma métrica por faixa)
+    totais = df_aging[colunas_faixa].sum()
+    for col, (chave, rotulo) in zip(st.columns(len(colunas_faixa)), db.FAIXAS_AGING):
+        col.metric(rotulo, g_svc.format_brl(totais[chave]))
+
+    a1, a2 = st.columns([1, 3])
+    visao = a1.radio("Agrupar por", ["Disciplina", "Aluno"], horizontal=True)
+    faixa_sel = a2.selectbox(
+        "Detalhar faixa",
+        ["Todas"] + colunas_faixa,
+        format_func=lambda x: faixas.get(x, x)
+    )
+
+    config_faixas = {k: st.column_config.NumberColumn(v, format="R$ %.2f") for k, v in db.FAIXAS_AGING}
+    config_faixas['total'] = st.column_config.NumberColumn("Total", format="R$ %.2f")
+
+    if visao == "Disciplina":
+        df_disc = df_aging.groupby('disciplina', as_index=False)[colunas_faixa + ['total']].sum()
+        st.dataframe(df_disc, hide_index=True, use_container_width=True,
+                     column_config={'disciplina': "Disciplina", **config_faixas})
+    else:
+        # Drill-down: alunos com saldo na faixa escolhida, do maior valor para o menor
+        df_alunos = df_aging.groupby(['aluno_id', 'nome'], as_index=False).agg(
+            {**{c: 'sum' for c in colunas_faixa + ['total', 'parcelas']}, 'maior_atraso': 'max'}
+        )
+        if faixa_sel != "Todas":
+            df_alunos = df_alunos[df_alunos[faixa_sel] > 0].sort_values(faixa_sel, ascending=False)
+        else:
+            df_alunos = df_alunos.sort_values('maior_atraso', ascending=False)
+
+        st.caption(f"{len(df_alunos)} aluno(s)")
+        st.dataframe(
+            df_alunos.drop(columns='aluno_id'), hide_index=True, use_container_width=True,
+            column_config={
+                'nome': "Aluno",
+                'parcelas': "Parcelas",
+                'maior_atraso': st.column_config.NumberColumn("Maior Atraso (dias)"),
+                **config_faixas
+            }
+        )
+
+componentes.concluir_pagina()
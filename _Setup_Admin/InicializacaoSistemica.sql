@@ -48,8 +48,11 @@ CREATE TABLE IF NOT EXISTS alunos (
     cpf_responsavel TEXT, 
     id_canal_aquisicao INTEGER, -- Alterado de TEXT para FK
     data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    lote_importacao_id INTEGER, -- Lote de migração que criou o registro (NULL = cadastro pelo sistema)
+    chave_migracao INTEGER, -- Hash de nome + CPF normalizados (importação incremental)
     FOREIGN KEY (unidade_id) REFERENCES unidades (id),
-    FOREIGN KEY (id_canal_aquisicao) REFERENCES canais_aquisicao (id)
+    FOREIGN KEY (id_canal_aquisicao) REFERENCES canais_aquisicao (id),
+    FOREIGN KEY (lote_importacao_id) REFERENCES lotes_importacao (id)
 );
 
 CREATE TABLE IF NOT EXISTS matriculas (
@@ -65,9 +68,12 @@ CREATE TABLE IF NOT EXISTS matriculas (
             bolsa_ativa BOOLEAN DEFAULT 0,
             bolsa_meses_restantes INTEGER DEFAULT 0,
             data_fim DATE,
+            lote_importacao_id INTEGER,
+            chave_migracao INTEGER, -- Hash da chave do aluno + disciplina (importação incremental)
             FOREIGN KEY (unidade_id) REFERENCES unidades (id),
             FOREIGN KEY (aluno_id) REFERENCES alunos (id),
-            FOREIGN KEY (id_disciplina) REFERENCES disciplinas (id)
+            FOREIGN KEY (id_disciplina) REFERENCES disciplinas (id),
+            FOREIGN KEY (lote_importacao_id) REFERENCES lotes_importacao (id)
 );
 
 CREATE TABLE IF NOT EXISTS pagamentos (
@@ -82,12 +88,14 @@ CREATE TABLE IF NOT EXISTS pagamentos (
             id_status INTEGER DEFAULT 1,          -- FK: Pendente
             id_tipo INTEGER DEFAULT 1,            -- FK: Mensalidade
             id_forma_pagamento INTEGER,           -- Alterado de TEXT para FK
+            lote_importacao_id INTEGER,
             FOREIGN KEY (unidade_id) REFERENCES unidades (id),
             FOREIGN KEY (matricula_id) REFERENCES matriculas (id),
             FOREIGN KEY (aluno_id) REFERENCES alunos (id),
             FOREIGN KEY (id_status) REFERENCES status_pagamentos (id),
             FOREIGN KEY (id_tipo) REFERENCES tipos_pagamento (id),
-            FOREIGN KEY (id_forma_pagamento) REFERENCES formas_pagamento (id)
+            FOREIGN KEY (id_forma_pagamento) REFERENCES formas_pagamento (id),
+            FOREIGN KEY (lote_importacao_id) REFERENCES lotes_importacao (id)
 );
 
 CREATE TABLE IF NOT EXISTS categorias_despesas (
@@ -301,6 +309,103 @@ INSERT OR IGNORE INTO formas_pagamento (id, nome) VALUES (7, 'Cheque');
 
 -- CAMPO STATUS/TIPO TABELA PAGAMENTOS FIM --
 
+-- LEDGER DO ROBÔ FINANCEIRO INICIO --
+
+-- Uma linha por competência processada. Base do modo retroativo (catch-up):
+-- tudo entre a última competência registrada e o mês atual é gerado em lote.
+CREATE TABLE IF NOT EXISTS robo_execucoes (
+            unidade_id INTEGER NOT NULL,
+            mes_referencia TEXT NOT NULL,
+            data_execucao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            qtd_despesas INTEGER DEFAULT 0,
+            qtd_boletos INTEGER DEFAULT 0,
+            qtd_rh INTEGER DEFAULT 0,
+            PRIMARY KEY (unidade_id, mes_referencia),
+            FOREIGN KEY (unidade_id) REFERENCES unidades (id));
+
+-- LEDGER DO ROBÔ FINANCEIRO FIM --
+
+-- FOTOGRAFIA MENSAL DE MATRÍCULAS INICIO --
+
+-- Quem estava matriculado (aluno x disciplina) em cada competência já encerrada.
+-- Gravada uma vez por mês (relatorios_rps.fechar_competencias_pendentes) e lida pelos relatórios
+-- por período: inativações posteriores não alteram meses fechados. O mês em aberto é calculado na hora.
+CREATE TABLE IF NOT EXISTS matriculas_competencia (
+            unidade_id INTEGER NOT NULL,
+            competencia TEXT NOT NULL, -- 'MM/AAAA'
+            aluno_id INTEGER NOT NULL,
+            id_disciplina INTEGER NOT NULL,
+            PRIMARY KEY (unidade_id, competencia, aluno_id, id_disciplina),
+            FOREIGN KEY (unidade_id) REFERENCES unidades (id),
+            FOREIGN KEY (aluno_id) REFERENCES alunos (id),
+            FOREIGN KEY (id_disciplina) REFERENCES disciplinas (id));
+
+-- Competências já fotografadas (inclusive as que não tinham nenhum aluno)
+CREATE TABLE IF NOT EXISTS competencias_fechadas (
+            unidade_id INTEGER NOT NULL,
+            competencia TEXT NOT NULL,
+            data_fechamento TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (unidade_id, competencia),
+            FOREIGN KEY (unidade_id) REFERENCES unidades (id));
+
+-- FOTOGRAFIA MENSAL DE MATRÍCULAS FIM --
+
+-- LOTES DE IMPORTAÇÃO (MIGRAÇÃO) INICIO --
+
+-- Uma linha por importação de planilha (11_Migracao). Alunos, matrículas e mensalidades criados
+-- por ela guardam o lote em lote_importacao_id. A gravação é feita em blocos, cada um na sua
+-- transação; linhas_gravadas é o ponto de retomada de uma importação interrompida.
+-- status: EM_ANDAMENTO, CONCLUIDO ou REVERTIDO
+-- modo: COMPLETA (unidade vazia) ou INCREMENTAL (só registros novos ou alterados, por chave_migracao)
+CREATE TABLE IF NOT EXISTS lotes_importacao (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            unidade_id INTEGER NOT NULL,
+            arquivo TEXT,
+            usuario TEXT,
+            assinatura TEXT NOT NULL, -- Hash dos dados limpos: reenviar o mesmo arquivo retoma o lote
+            total_linhas INTEGER NOT NULL,
+            linhas_gravadas INTEGER DEFAULT 0,
+            status TEXT DEFAULT 'EM_ANDAMENTO',
+            modo TEXT DEFAULT 'COMPLETA',
+            data_inicio TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            data_fim TIMESTAMP,
+            FOREIGN KEY (unidade_id) REFERENCES unidades (id));
+
+-- Bancos criados antes dos lotes: executar uma vez
+-- ALTER TABLE alunos ADD COLUMN lote_importacao_id INTEGER REFERENCES lotes_importacao (id);
+-- ALTER TABLE matriculas ADD COLUMN lote_importacao_id INTEGER REFERENCES lotes_importacao (id);
+-- ALTER TABLE pagamentos ADD COLUMN lote_importacao_id INTEGER REFERENCES lotes_importacao (id);
+
+-- Bancos criados antes da importação incremental: executar uma vez
+-- (as chaves dos registros existentes são calculadas na primeira importação incremental da unidade)
+-- ALTER TABLE alunos ADD COLUMN chave_migracao INTEGER;
+-- ALTER TABLE matriculas ADD COLUMN chave_migracao INTEGER;
+-- ALTER TABLE lotes_importacao ADD COLUMN modo TEXT DEFAULT 'COMPLETA';
+
+-- Chave sem valor = a calcular na próxima importação incremental. As telas de cadastro não conhecem
+-- a chave: editar o que a compõe só a apaga, e a importação recalcula só as que estão vazias.
+CREATE TRIGGER IF NOT EXISTS trg_alunos_chave_migracao
+AFTER UPDATE OF nome, cpf_responsavel ON alunos
+WHEN NEW.chave_migracao IS NOT NULL
+BEGIN
+    UPDATE alunos SET chave_migracao = NULL WHERE id = NEW.id;
+    UPDATE matriculas SET chave_migracao = NULL WHERE aluno_id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_matriculas_chave_migracao
+AFTER UPDATE OF aluno_id, id_disciplina ON matriculas
+WHEN NEW.chave_migracao IS NOT NULL
+BEGIN
+    UPDATE matriculas SET chave_migracao = NULL WHERE id = NEW.id;
+END;
+
+-- Bancos com chaves gravadas antes dos gatilhos acima: executar uma vez
+-- (cadastros editados nesse meio-tempo podem estar com a chave antiga)
+-- UPDATE alunos SET chave_migracao = NULL;
+-- UPDATE matriculas SET chave_migracao = NULL;
+
+-- LOTES DE IMPORTAÇÃO (MIGRAÇÃO) FIM --
+
 -- Executar inserção após inserir usuário ADM
 
 -- INSERT OR IGNORE INTO usuario_unidades (usuario_username, unidade_id) VALUES ('admin', 1);
@@ -352,6 +457,45 @@ ON alunos (cpf_responsavel);
 CREATE INDEX IF NOT EXISTS idx_matriculas_geracao 
 ON matriculas (unidade_id, ativo);
 
+-- Cenário: Cards da Home ("Alunos ausentes no mês")
+-- Cobre: WHERE unidade_id=? AND ativo=0 AND data_fim >= ? AND data_fim < ?
+CREATE INDEX IF NOT EXISTS idx_matriculas_encerramento 
+ON matriculas (unidade_id, ativo, data_fim);
+
 -- Cenário: Vínculo com Aluno (JOINs)
 CREATE INDEX IF NOT EXISTS idx_matriculas_aluno 
-ON matriculas (aluno_id);
\ No newline at end of file
+ON matriculas (aluno_id);
+
+
+-- 5. Tabela COFRES_MOVIMENTACAO
+-- Cenário: Extrato paginado por cursor (mais recentes primeiro)
+-- Cobre: WHERE unidade_id=? AND id < ? ORDER BY id DESC (o id/rowid já faz parte do índice)
+CREATE INDEX IF NOT EXISTS idx_cofres_mov_unidade
+ON cofres_movimentacao (unidade_id);
+
+
+-- 6. Lotes de importação (só os registros vindos de migração entram no índice)
+-- Cenário: Reverter uma importação inteira
+-- Cobre: DELETE ... WHERE lote_importacao_id=?
+CREATE INDEX IF NOT EXISTS idx_alunos_lote
+ON alunos (lote_importacao_id) WHERE lote_importacao_id IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_matriculas_lote
+ON matriculas (lote_importacao_id) WHERE lote_importacao_id IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_pagamentos_lote
+ON pagamentos (lote_importacao_id) WHERE lote_importacao_id IS NOT NULL;
+
+-- Cenário: Retomar uma importação interrompida (mesmo arquivo, mesma unidade)
+CREATE INDEX IF NOT EXISTS idx_lotes_importacao_unidade
+ON lotes_importacao (unidade_id, status);
+
+
+-- 7. Importação incremental (chaves normalizadas de aluno e matrícula)
+-- Cenário: Comparar a planilha com a base da unidade numa única junção
+-- Cobre: JOIN ... ON unidade_id=? AND chave_migracao=?
+CREATE INDEX IF NOT EXISTS idx_alunos_chave
+ON alunos (unidade_id, chave_migracao);
+
+CREATE INDEX IF NOT EXISTS idx_matriculas_chave
+ON matriculas (unidade_id, chave_migracao);
\ No newline at end of file
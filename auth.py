@@ -1,6 +1,7 @@
 import streamlit as st
-import time
 import database as db
+from services import seguranca_svc as seg
+from services import desempenho_svc as perf
 
 # --- 1. LÓGICA DE SESSÃO E LOGIN ---
 
@@ -24,9 +25,12 @@ def logout():
 def realizar_login(usuario, senha):
     """
     Valida credenciais e inicializa a sessão.
+    Retorna True/False, ou None quando a tentativa foi recusada pelo limite de acessos (aviso já exibido).
     """
     try:
-        sucesso, nome, admin = db.verificar_credenciais(usuario, senha)
+        # IP do cliente (limite de tentativas por origem); indisponível em versões antigas do Streamlit
+        ip = getattr(st.context, 'ip_address', None)
+        sucesso, nome, admin = db.verificar_credenciais(usuario, senha, ip)
         if sucesso:
             st.session_state['usuario_logado'] = usuario
             st.session_state['usuario_nome'] = nome
@@ -43,6 +47,9 @@ def realizar_login(usuario, senha):
                 
             return True
         return False
+    except seg.LoginBloqueado as e:
+        st.warning(str(e))
+        return None
     except Exception as e:
         st.error(f"Erro de conexão: {e}")
         return False
@@ -70,6 +77,7 @@ def atualizar_unidade_selecionada():
 
 # --- 3. COMPONENTES VISUAIS ---
 
+@perf.na_fase("auth")
 def tela_login():
     c1, c2, c3 = st.columns([1, 1, 1])
     with c2:
@@ -78,13 +86,15 @@ def tela_login():
             user_input = st.text_input("Usuário")
             pass_input = st.text_input("Senha", type="password")
             if st.form_submit_button("Entrar", type="primary", use_container_width=True):
-                if realizar_login(user_input, pass_input):
+                resultado = realizar_login(user_input, pass_input)
+                if resultado:
                     st.success("Bem-vindo!")
-                    time.sleep(0.5)
+                    perf.pausa(0.5)
                     st.rerun()
-                else:
+                elif resultado is False:
                     st.error("Dados incorretos.")
 
+@perf.na_fase("auth")
 def barra_lateral():
     with st.sidebar:
         st.write(f"👤 **{st.session_state.get('usuario_nome', 'Usuário')}**")
@@ -125,6 +135,7 @@ def barra_lateral():
         # 2. VISÃO ESTRATÉGICA (Dashboard Dedicado)
         st.markdown("### Visão Estratégica")
         st.page_link("pages/5_Dashboard.py", label="Dashboard", icon="📊")
+        st.page_link("pages/12_Consolidado.py", label="Visão Consolidada", icon="🏢")
         
         # 3. SECRETARIA
         st.markdown("### Secretaria")
@@ -151,6 +162,7 @@ def barra_lateral():
             
             if st.session_state.get('usuario_admin'):
                 st.page_link("pages/9_Admin_Usuarios.py", label="Admin Usuários", icon="🔑")
+                st.page_link("pages/13_Diagnostico.py", label="Diagnóstico", icon="⏱️")
         
         st.divider()
        
@@ -0,0 +1,342 @@
+from __future__ import annotations
+
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+from streamlit.errors import StreamlitAPIException
+from typing import Dict, Optional, Tuple
+
+from services import desempenho_svc as perf
+from services import exportacao_svc as exportacao
+from services import dependencias_svc as dep
+pd = dep.preguicoso("pandas")
+
+# --- GRADE PAGINADA (Listas longas como um único componente) ---
+# A paginação e a ordenação acontecem no banco (LIMIT/OFFSET + ORDER BY), então o custo de
+# desenho não depende do tamanho da lista. A seleção de linha substitui os botões por linha.
+#
+# Uso típico:
+#   ordem, desc = componentes.ordenacao_grade("rec", {"Vencimento": "vencimento", "Aluno": "aluno"})
+#   df, total = rps.buscar_xxx_pagina(..., ordem, desc, TAMANHO_PAGINA, componentes.offset_grade("rec"))
+#   linha = componentes.grade_paginada("rec", df, total, column_config={...})
+#   if linha is not None: abrir_dialogo(linha)
+
+TAMANHO_PAGINA = 25
+
+
+def _chave_pagina(chave: str) -> str:
+    return f"{chave}_pagina"
+
+
+def _ir_para_pagina(chave: str, pagina: int) -> None:
+    st.session_state[_chave_pagina(chave)] = max(0, pagina)
+    cursores = st.session_state.get(f"{chave}_cursores")
+    if cursores:
+        del cursores[max(0, pagina) + 1:]  # Grade por cursor: as páginas seguintes serão recalculadas
+    limpar_selecao(chave)  # O índice selecionado pertence à página anterior
+
+
+def reiniciar_grade(chave: str) -> None:
+    """Volta a grade para a primeira página (ex: filtro mudou e a página atual deixou de existir)."""
+    _ir_para_pagina(chave, 0)
+
+
+def offset_grade(chave: str, tamanho: int = TAMANHO_PAGINA) -> int:
+    """Deslocamento (OFFSET) da página atual da grade."""
+    return st.session_state.get(_chave_pagina(chave), 0) * tamanho
+
+
+def ordenacao_grade(chave: str, opcoes: Dict[str, str], padrao_desc: bool = False) -> Tuple[str, bool]:
+    """
+    Desenha os controles de ordenação e retorna (chave_da_coluna, decrescente).
+    opcoes: {rótulo exibido: chave aceita pela função de busca do repositório}.
+    Mudar a ordenação volta para a primeira página.
+    """
+    c1, c2 = st.columns([3, 1])
+    rotulo = c1.selectbox("Ordenar por", list(opcoes.keys()), key=f"{chave}_ordem",
+                          on_change=_ir_para_pagina, args=(chave, 0))
+    desc = c2.toggle("Decrescente", value=padrao_desc, key=f"{chave}_desc",
+                     on_change=_ir_para_pagina, args=(chave, 0))
+    return opcoes[rotulo], desc
+
+
+def ordem_atual(chave: str, opcoes: Dict[str, str], padrao_desc: bool = False) -> Tuple[str, bool]:
+    """Ordenação escolhida em ordenacao_grade, sem desenhar os controles (ex: para antecipar a consulta)."""
+    rotulo = st.session_state.get(f"{chave}_ordem", next(iter(opcoes)))
+    return opcoes.get(rotulo, next(iter(opcoes.values()))), st.session_state.get(f"{chave}_desc", padrao_desc)
+
+
+def limpar_selecao(chave: str) -> None:
+    """Desmarca a linha selecionada (troca a chave do componente)."""
+    st.session_state[f"{chave}_versao"] = st.session_state.get(f"{chave}_versao", 0) + 1
+    st.session_state.pop(f"{chave}_ultima", None)
+
+
+def grade_paginada(chave: str, df: pd.DataFrame, total: int, tamanho: int = TAMANHO_PAGINA,
+                   column_config: Optional[dict] = None, selecionavel: bool = True,
+                   altura="auto") -> Optional[pd.Series]:
+    """
+    Desenha a página atual (df) e o paginador.
+    Retorna a linha recém-selecionada (só no rerun em que a seleção muda), ou None.
+    """
+    pagina = st.session_state.get(_chave_pagina(chave), 0)
+    paginas = max(1, -(-total // tamanho))
+
+    # A lista encolheu (ex: itens pagos) e a página atual deixou de existir
+    if pagina >= paginas:
+        _ir_para_pagina(chave, paginas - 1)
+        st.rerun()
+
+    linha = None
+    if selecionavel:
+        evento = st.dataframe(
+            df, column_config=column_config, hide_index=True, use_container_width=True,
+            selection_mode="single-row", on_select="rerun", height=altura,
+            key=f"{chave}_grade_{st.session_state.get(f'{chave}_versao', 0)}"
+        )
+        selecao = tuple(evento.selection.rows)
+        if selecao != st.session_state.get(f"{chave}_ultima", ()):
+            st.session_state[f"{chave}_ultima"] = selecao
+            if selecao and selecao[0] < len(df):
+                linha = df.iloc[selecao[0]]
+    else:
+        st.dataframe(df, column_config=column_config, hide_index=True, use_container_width=True, height=altura)
+
+    if paginas > 1:
+        p1, p2, p3 = st.columns([1, 2, 1])
+        p1.button("◀ Anterior", key=f"{chave}_ant", disabled=pagina == 0,
+                  on_click=_ir_para_pagina, args=(chave, pagina - 1), use_container_width=True)
+        p2.caption(f"Página {pagina + 1} de {paginas} · {total} itens")
+        p3.button("Próxima ▶", key=f"{chave}_prox", disabled=pagina >= paginas - 1,
+                  on_click=_ir_para_pagina, args=(chave, pagina + 1), use_container_width=True)
+    return linha
+
+
+# --- GRADE POR CURSOR (históricos que crescem sem limite) ---
+# O repositório devolve (página, cursor da próxima) em vez de (página, total): sem OFFSET e sem
+# COUNT, o custo de cada página não depende do tamanho do histórico (database.consultar_pagina_cursor).
+# A grade guarda o cursor com que cada página visitada começou, para o botão "Anterior".
+#
+# Uso típico:
+#   df, proximo = rps.buscar_historico(unidade, componentes.cursor_grade("hist"), componentes.TAMANHO_PAGINA)
+#   componentes.grade_cursor("hist", df, proximo, column_config={...})
+
+def _cursores(chave: str) -> list:
+    return st.session_state.setdefault(f"{chave}_cursores", [None])
+
+
+def cursor_grade(chave: str) -> Optional[tuple]:
+    """Cursor de início da página atual da grade (None na primeira página)."""
+    cursores = _cursores(chave)
+    pagina = st.session_state.get(_chave_pagina(chave), 0)
+    if pagina >= len(cursores):  # Página sem cursor conhecido: recomeça
+        st.session_state[_chave_pagina(chave)] = 0
+        return None
+    return cursores[pagina]
+
+
+def _avancar_cursor(chave: str, proximo: tuple) -> None:
+    pagina = st.session_state.get(_chave_pagina(chave), 0)
+    cursores = _cursores(chave)
+    del cursores[pagina + 1:]
+    cursores.append(proximo)
+    _ir_para_pagina(chave, pagina + 1)
+
+
+def voltar_se_vazia(chave: str, df: pd.DataFrame) -> None:
+    """Os itens da página deixaram de existir (ex: inativados com filtro ligado): volta uma página."""
+    pagina = st.session_state.get(_chave_pagina(chave), 0)
+    if df.empty and pagina > 0:
+        _ir_para_pagina(chave, pagina - 1)
+        st.rerun()
+
+
+def paginador_cursor(chave: str, proximo: Optional[tuple]) -> None:
+    """Botões Anterior/Próxima de uma lista paginada por cursor (não aparece se houver só uma página)."""
+    pagina = st.session_state.get(_chave_pagina(chave), 0)
+    if pagina == 0 and proximo is None:
+        return
+    p1, p2, p3 = st.columns([1, 2, 1])
+    p1.button("◀ Anterior", key=f"{chave}_ant", disabled=pagina == 0,
+              on_click=_ir_para_pagina, args=(chave, pagina - 1), use_container_width=True)
+    p2.caption(f"Página {pagina + 1}")
+    p3.button("Próxima ▶", key=f"{chave}_prox", disabled=proximo is None,
+              on_click=_avancar_cursor, args=(chave, proximo), use_container_width=True)
+
+
+def grade_cursor(chave: str, df: pd.DataFrame, proximo: Optional[tuple], column_config: Optional[dict] = None,
+                 selecionavel: bool = False, altura="auto") -> Optional[pd.Series]:
+    """
+    Desenha a página atual (df) e o paginador por cursor.
+    Com selecionavel=True, retorna a linha selecionada (enquanto estiver selecionada), ou None.
+    """
+    voltar_se_vazia(chave, df)
+
+    linha = None
+    if selecionavel:
+        evento = st.dataframe(
+            df, column_config=column_config, hide_index=True, use_container_width=True,
+            selection_mode="single-row", on_select="rerun", height=altura,
+            key=f"{chave}_grade_{st.session_state.get(f'{chave}_versao', 0)}"
+        )
+        if evento.selection.rows and evento.selection.rows[0] < len(df):
+            linha = df.iloc[evento.selection.rows[0]]
+    else:
+        st.dataframe(df, column_config=column_config, hide_index=True, use_container_width=True, height=altura)
+
+    paginador_cursor(chave, proximo)
+    return linha
+
+
+# --- EXPORTAÇÃO DE GRADES (services/exportacao_svc.py) ---
+# A grade mostra uma página; a exportação percorre o resultado inteiro, em lotes, só no clique.
+#
+# Uso típico:
+#   componentes.botao_exportar("hist", "Extrato_Cofres", rps.exportacao_historico_movimentacoes_cofres, unidade)
+
+def _exportar(fonte, args, formato: str) -> bytes:
+    colunas, lotes = fonte(*args)
+    return exportacao.gerar(colunas, lotes, formato)
+
+
+def botao_exportar(chave: str, nome_base: str, fonte, *args) -> None:
+    """
+    Popover com um botão de download por formato disponível.
+    fonte(*args) deve retornar (colunas, lotes), como database.consultar_em_lotes.
+    """
+    with st.popover("⬇️ Exportar"):
+        for formato, info in exportacao.disponiveis().items():
+            st.download_button(
+                info["rotulo"], data=functools.partial(_exportar, fonte, args, formato),
+                file_name=f"{nome_base}.{formato}", mime=info["mime"], key=f"{chave}_exportar_{formato}",
+                on_click="ignore", use_container_width=True
+            )
+
+
+# --- MEDIÇÃO DE LATÊNCIA (services/desempenho_svc.py) ---
+# Cada página chama medir_pagina() logo após o set_page_config e concluir_pagina() no final.
+# O tempo de banco é medido automaticamente pela conexão; robô, processamento e pausas são
+# marcados com fase()/pausa(); o resto conta como renderização.
+#
+# Uso típico:
+#   componentes.medir_pagina("Financeiro")
+#   with componentes.fase("processamento"): df = preparar(df)
+#   componentes.pausa(1)   # no lugar de time.sleep(1)
+#   componentes.concluir_pagina()
+
+fase = perf.fase
+na_fase = perf.na_fase
+pausa = perf.pausa
+
+
+def medir_pagina(nome: str) -> None:
+    """
+    Abre a medição desta execução da página (fechando a anterior, se ela foi interrompida).
+    Na primeira página aberta no processo, também dispara o pré-carregamento das bibliotecas comuns.
+    """
+    dep.aquecer()
+    anterior = st.session_state.get("_medicao")
+    if anterior is not None:
+        perf.encerrar(anterior, fim=anterior.ultimo)  # st.stop/st.rerun: vale até a última atividade medida
+    st.session_state["_medicao"] = perf.iniciar(nome)
+    st.session_state["_medicao_pagina"] = nome
+
+
+def concluir_pagina() -> None:
+    """Fecha a medição da execução atual (última linha da página)."""
+    m = st.session_state.pop("_medicao", None)
+    if m is not None:
+        perf.encerrar(m)
+
+
+# --- FRAGMENTOS MEDIDOS (Reruns parciais) ---
+# Uma interação dentro de um fragmento reexecuta só a função decorada, não a página inteira.
+# Cada execução do fragmento vira uma amostra própria ("Página · fragmento"); na execução
+# completa da página o tempo também entra nas fases da página.
+#
+# Uso típico:
+#   @componentes.fragmento("fin_entradas")
+#   def aba_entradas(uid): ...
+
+def fragmento(nome: str):
+    """st.fragment que mede cada execução da função em `nome`."""
+    def decorador(func):
+        @functools.wraps(func)
+        def medido(*args, **kwargs):
+            pagina = st.session_state.get("_medicao_pagina")
+            with perf.trecho(f"{pagina} · {nome}" if pagina else nome):
+                return func(*args, **kwargs)
+        return st.fragment(medido)
+    return decorador
+
+
+def recarregar_fragmento() -> None:
+    """
+    Reexecuta só o fragmento atual (ex: após salvar algo que só ele exibe).
+    Fora de um rerun de fragmento (ex: primeira execução da página) recarrega a página inteira.
+    """
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+
+# --- ABAS SOB DEMANDA (Só a aba visível consulta o banco) ---
+# Com st.tabs(..., key=..., on_change="rerun") cada aba expõe .open e o corpo das abas ocultas
+# pode ser pulado. A próxima aba provável pode ser antecipada em segundo plano: a consulta roda
+# numa thread enquanto a aba atual é desenhada e o resultado é usado quando o usuário trocar de aba.
+#
+# Uso típico:
+#   aba_a, aba_b = st.tabs(["A", "B"], key="pagina_aba", on_change="rerun")
+#   with aba_a:
+#       if componentes.aba_aberta(aba_a):
+#           componentes.antecipar(rps.buscar_b, uid)          # provável próxima aba
+#           df = componentes.carregar(rps.buscar_a, uid)
+#   with aba_b:
+#       if componentes.aba_aberta(aba_b):
+#           df = componentes.carregar(rps.buscar_b, uid)      # usa o resultado antecipado
+
+VALIDADE_ANTECIPACAO_S = 60
+
+_pool_antecipacao = ThreadPoolExecutor(max_workers=2, thread_name_prefix="antecipacao")
+
+
+def aba_aberta(aba) -> bool:
+    """Aba selecionada? Abas sem rastreamento de estado (on_change="ignore") contam sempre como abertas."""
+    return aba.open is not False
+
+
+def _chave_consulta(funcao, args: tuple) -> tuple:
+    return (funcao.__module__, funcao.__qualname__, args)
+
+
+def antecipar(funcao, *args) -> None:
+    """
+    Dispara funcao(*args) em segundo plano. Um carregar() com a mesma função e os mesmos
+    argumentos em até VALIDADE_ANTECIPACAO_S segundos usa o resultado em vez de consultar de novo.
+    Só para leituras: os argumentos precisam ser hasheáveis e a função não pode usar st.*.
+    """
+    pendentes = st.session_state.setdefault("_antecipadas", {})
+    chave = _chave_consulta(funcao, args)
+    if chave not in pendentes:
+        pendentes[chave] = (time.monotonic(), _pool_antecipacao.submit(funcao, *args))
+
+
+def carregar(funcao, *args):
+    """funcao(*args), reaproveitando uma antecipação válida (que é consumida)."""
+    antecipada = st.session_state.get("_antecipadas", {}).pop(_chave_consulta(funcao, args), None)
+    if antecipada is not None:
+        criada_em, futuro = antecipada
+        if time.monotonic() - criada_em <= VALIDADE_ANTECIPACAO_S:
+            try:
+                return futuro.result()
+            except Exception:
+                pass  # Falhou em segundo plano: consulta de novo para o erro aparecer na tela
+    return funcao(*args)
+
+
+def descartar_antecipacoes() -> None:
+    """Invalida os resultados antecipados (chamar após gravar algo no banco)."""
+    st.session_state.pop("_antecipadas", None)
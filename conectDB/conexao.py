@@ -1,14 +1,112 @@
 import sqlite3
+import time
+
+from services import desempenho_svc as perf
 
 # --- 2. CONEXÃO ---
 DB_PATH = 'kumon.db'
 _DEFAULT_TIMEOUT = 10
 
+
+# --- MEDIÇÃO DO TEMPO DE BANCO ---
+# Cursor e conexão que somam o tempo de cada operação na fase "banco" da página em execução
+# (services/desempenho_svc.py). Fora de uma medição o custo é só a leitura do relógio.
+
+class _CursorMedido(sqlite3.Cursor):
+    def execute(self, *args):
+        t0 = time.perf_counter()
+        try:
+            return super().execute(*args)
+        finally:
+            perf.registrar_banco(time.perf_counter() - t0)
+
+    def executemany(self, *args):
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(*args)
+        finally:
+            perf.registrar_banco(time.perf_counter() - t0)
+
+    def executescript(self, *args):
+        t0 = time.perf_counter()
+        try:
+            return super().executescript(*args)
+        finally:
+            perf.registrar_banco(time.perf_counter() - t0)
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            perf.registrar_banco(time.perf_counter() - t0)
+
+    def fetchmany(self, *args):
+        t0 = time.perf_counter()
+        try:
+            return super().fetchmany(*args)
+        finally:
+            perf.registrar_banco(time.perf_counter() - t0)
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            perf.registrar_banco(time.perf_counter() - t0)
+
+    # Iteração linha a linha: o tempo é somado no cursor e registrado uma vez, quando as linhas
+    # acabam ou o cursor é fechado (não a cada linha)
+    _iteracao = 0.0
+
+    def __next__(self):
+        t0 = time.perf_counter()
+        try:
+            linha = super().__next__()
+        except StopIteration:
+            self._iteracao += time.perf_counter() - t0
+            self._registrar_iteracao()
+            raise
+        self._iteracao += time.perf_counter() - t0
+        return linha
+
+    def _registrar_iteracao(self):
+        if self._iteracao:
+            perf.registrar_banco(self._iteracao)
+            self._iteracao = 0.0
+
+    def close(self):
+        self._registrar_iteracao()
+        return super().close()
+
+
+class _ConexaoMedida(sqlite3.Connection):
+    def cursor(self, factory=_CursorMedido):
+        return super().cursor(factory)
+
+    # Connection.execute* nativos não passam por cursor(): redireciona para o cursor medido
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+
+    def executescript(self, *args):
+        return self.cursor().executescript(*args)
+
+    def commit(self):
+        t0 = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            perf.registrar_banco(time.perf_counter() - t0)
+
+
 def conectar() -> sqlite3.Connection:
     """Retorna uma nova conexão SQLite configurada com segurança para uso em app web (check_same_thread=False).
     A função preserva a API original (retorna sqlite3.Connection).
     """
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False, timeout=_DEFAULT_TIMEOUT)
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, timeout=_DEFAULT_TIMEOUT, factory=_ConexaoMedida)
     # Usar row factory facilita leitura por nome em alguns pontos
     conn.row_factory = sqlite3.Row
-    return conn
\ No newline at end of file
+    return conn
@@ -7,15 +7,21 @@ Goals:
 - Add small helpers to reduce repetition and to make code easier to test.
 """
 
+from __future__ import annotations
+
 import sqlite3
 import bcrypt
 import logging
+import threading
+import time
 from datetime import date, datetime
 from calendar import monthrange
-from typing import Dict, Tuple, List, Any, Optional
-import pandas as pd
+from typing import Dict, Iterator, Tuple, List, Any, Optional
 
 from conectDB import conexao as cnc
+from services import seguranca_svc as seg
+from services import dependencias_svc as dep
+pd = dep.preguicoso("pandas")
 
 # --- Logging ---
 logger = logging.getLogger(__name__)
@@ -38,12 +44,15 @@ sqlite3.register_adapter(date, adapt_date)
 sqlite3.register_adapter(datetime, adapt_datetime)
 
 
-# --- Helpers internos ---
-def _get_valid_date(year: int, month: int, day: int) -> date:
+# --- Datas de vencimento (usado também pelos repositórios) ---
+def get_valid_date(year: int, month: int, day: int) -> date:
     """Retorna uma data válida ajustando o dia se ultrapassar o último dia do mês."""
     max_day = monthrange(year, month)[1]
     return date(year, month, min(day, max_day))
 
+
+# --- Helpers internos ---
+
 def _ensure_positive_number(name: str, value: Any) -> float:
     try:
         v = float(value)
@@ -78,50 +87,236 @@ def from_cents(val) -> float:
         return 0.0
 
 
+# --- CACHE DE TABELAS DE REFERÊNCIA (compartilhado entre todas as sessões do processo) ---
+# Tabelas que quase nunca mudam. São lidas todas de uma vez, na abertura do app (carregar_referencias,
+# chamado pela Home) ou na primeira consulta, e guardadas como tuplas de sqlite3.Row (imutáveis,
+# acessíveis por r['nome'] ou r[0]).
+# Unidades e disciplinas são incluídas direto no banco, fora do app: cada tabela é relida depois de
+# TTL_REFERENCIA_S, e o admin pode forçar a releitura (botão "Recarregar Cadastros" em Admin Usuários).
+# Quem alterar uma dessas tabelas pelo app deve chamar invalidar_cache_referencia(<tabela>).
+_CONSULTAS_REFERENCIA = {
+    'canais_aquisicao': "SELECT id, nome FROM canais_aquisicao ORDER BY nome",
+    'disciplinas': "SELECT id, nome FROM disciplinas ORDER BY nome",
+    'formas_pagamento': "SELECT id, nome FROM formas_pagamento ORDER BY nome",
+    'categorias_despesas': "SELECT id, nome_categoria FROM categorias_despesas ORDER BY nome_categoria",
+    'tipos_contratacao': "SELECT id, nome FROM tipos_contratacao ORDER BY nome",
+    'unidades': "SELECT id, nome FROM unidades ORDER BY nome",
+}
+TTL_REFERENCIA_S = 5 * 60
+_cache_referencia: Dict[str, tuple] = {}
+_carregado_em: Dict[str, float] = {}  # tabela -> instante da leitura (time.monotonic)
+_lock_referencia = threading.Lock()
+
+
+def _vencidas(agora: float) -> List[str]:
+    return [t for t in _CONSULTAS_REFERENCIA
+            if t not in _cache_referencia or agora - _carregado_em[t] > TTL_REFERENCIA_S]
+
+
+def _carregar_referencias(tabelas: List[str], agora: float) -> None:
+    """Lê as tabelas numa única conexão (chamar com _lock_referencia)."""
+    conn = cnc.conectar()
+    try:
+        for t in tabelas:
+            _cache_referencia[t] = tuple(conn.execute(_CONSULTAS_REFERENCIA[t]).fetchall())
+            _carregado_em[t] = agora
+    finally:
+        conn.close()
+
+
+def carregar_referencias() -> None:
+    """Aquece o cache: lê as tabelas que ainda não foram lidas ou já venceram."""
+    agora = time.monotonic()
+    with _lock_referencia:
+        vencidas = _vencidas(agora)
+        if vencidas:
+            _carregar_referencias(vencidas, agora)
+    if 'unidades' in vencidas:
+        invalidar_cache_unidades_usuario()  # Os vínculos guardam o nome da unidade
+
+
+def obter_referencia(tabela: str) -> tuple:
+    """Registros da tabela de referência, servidos do cache do processo (relidos após TTL_REFERENCIA_S)."""
+    dados = _cache_referencia.get(tabela)
+    if dados is not None and time.monotonic() - _carregado_em.get(tabela, 0) <= TTL_REFERENCIA_S:
+        return dados
+    carregar_referencias()
+    return _cache_referencia[tabela]
+
+
+def invalidar_cache_referencia(*tabelas: str) -> None:
+    """Descarta as tabelas informadas (ou todas) para que sejam relidas na próxima consulta."""
+    with _lock_referencia:
+        if not tabelas:
+            _cache_referencia.clear()
+        for t in tabelas:
+            _cache_referencia.pop(t, None)
+    if not tabelas or 'unidades' in tabelas:
+        # Os vínculos guardam o nome da unidade
+        invalidar_cache_unidades_usuario()
+    logger.info("Cache de referência invalidado: %s", ", ".join(tabelas) or "todas")
+
+
+# --- PAGINAÇÃO POR CURSOR (keyset) ---
+# Para listas que crescem sem limite (históricos). Em vez de OFFSET, que percorre tudo o que pula,
+# a página seguinte começa logo após a última linha vista: WHERE (chaves) > (cursor).
+# Cada página custa o mesmo na primeira ou na centésima, e não há contagem total.
+# Regras para as chaves: são colunas do resultado da consulta, não podem ser NULL (use COALESCE)
+# e a última deve ser única (ex: id), para que a ordem seja estável entre as páginas.
+LIMITE_PAGINA_MAX = 200
+
+Cursor = Tuple[Any, ...]
+
+
+def limitar_pagina(limite: int) -> int:
+    """Tamanho de página dentro de 1..LIMITE_PAGINA_MAX."""
+    return max(1, min(int(limite), LIMITE_PAGINA_MAX))
+
+
+def _valor_cursor(valor: Any) -> Any:
+    # Escalares do numpy (int64 etc.) não são aceitos como parâmetro pelo sqlite3
+    return valor.item() if hasattr(valor, "item") else valor
+
+
+def consultar_pagina_cursor(conn, consulta: str, params, chaves: Tuple[str, ...], desc: bool = False,
+                            cursor: Optional[Cursor] = None, limite: int = 25) -> Tuple[pd.DataFrame, Optional[Cursor]]:
+    """
+    Página de `consulta` (SELECT sem ORDER BY/LIMIT, parâmetros posicionais) ordenada por `chaves`,
+    começando após `cursor`. Retorna (página, cursor da próxima página ou None se esta for a última).
+    """
+    limite = limitar_pagina(limite)
+    params = list(params)
+    sql = f"SELECT * FROM ({consulta})"
+    if cursor is not None:
+        if len(cursor) != len(chaves):
+            raise ValueError("Cursor incompatível com a ordenação da lista")
+        marcadores = ", ".join("?" * len(chaves))
+        sql += f" WHERE ({', '.join(chaves)}) {'<' if desc else '>'} ({marcadores})"
+        params.extend(cursor)
+    sentido = "DESC" if desc else "ASC"
+    sql += " ORDER BY " + ", ".join(f"{c} {sentido}" for c in chaves) + " LIMIT ?"
+    params.append(limite + 1)  # Uma linha a mais só para saber se existe próxima página
+
+    df = pd.read_sql(sql, conn, params=params)
+    if len(df) <= limite:
+        return df, None
+    df = df.iloc[:limite].copy()  # Cópia: quem chama costuma acrescentar colunas de exibição
+    ultima = df.iloc[-1]
+    return df, tuple(_valor_cursor(ultima[c]) for c in chaves)
+
+
+# --- LEITURA EM LOTES (exportações) ---
+# Para percorrer um resultado inteiro sem montá-lo na memória: as linhas chegam em lotes de
+# `tamanho` (fetchmany) direto do cursor. Usado por services/exportacao_svc.py.
+LOTE_EXPORTACAO = 2000
+
+
+def consultar_em_lotes(consulta: str, params=(), tamanho: int = LOTE_EXPORTACAO) -> Tuple[List[str], Iterator[List[tuple]]]:
+    """
+    Executa a consulta e retorna (nomes das colunas, gerador de lotes de tuplas).
+    A conexão fica aberta até o gerador terminar (ou ser fechado).
+    """
+    conn = cnc.conectar()
+    try:
+        cur = conn.execute(consulta, params)
+        colunas = [d[0] for d in cur.description]
+    except Exception:
+        conn.close()
+        raise
+
+    def lotes():
+        try:
+            while True:
+                linhas = cur.fetchmany(tamanho)
+                if not linhas:
+                    return
+                yield [tuple(r) for r in linhas]
+        finally:
+            conn.close()
+
+    return colunas, lotes()
+
+
 # --- 4. Funções auxiliares e operacionais (preservando assinaturas públicas) ---
 
-def verificar_credenciais(usuario: str, senha_digitada: str) -> Tuple[bool, Optional[str], bool]:
+def verificar_credenciais(usuario: str, senha_digitada: str, ip: Optional[str] = None) -> Tuple[bool, Optional[str], bool]:
     """Verifica credenciais. Compatível com hashes existentes.
     Retorna (ok, nome_completo, is_admin).
+
+    O bcrypt roda no pool de seguranca_svc (fora da thread da sessão). Tentativas em excesso
+    por usuário ou IP levantam seguranca_svc.LoginBloqueado antes de qualquer hash.
+    Se o custo do hash armazenado diferir do configurado, ele é regravado em segundo plano.
     """
+    seg.verificar_bloqueio(usuario, ip)
+
     conn = cnc.conectar()
     try:
-        
         row = conn.execute("SELECT nome_completo, admin, password_hash FROM usuarios WHERE username = ? AND ativo=1", (usuario,)).fetchone()
-        
-        if not row:
-            return False, None, False
+    finally:
+        conn.close()
 
-        stored = row['password_hash']
+    stored = row['password_hash'] if row else None
+    if not seg.verificar_senha(senha_digitada, stored):
+        seg.registrar_falha(usuario, ip)
+        return False, None, False
 
-        # # Se o stored for um algoritmo diferente no futuro, adapte aqui
-        # if stored == senha_hash:
-        #     return True, row['nome_completo'], bool(row['admin'])
+    seg.registrar_sucesso(usuario, ip)
+    if seg.precisa_rehash(stored):
+        seg.agendar(_regravar_hash_senha, usuario, senha_digitada)
+    return True, row['nome_completo'], bool(row['admin'])
 
-        # O stored_hash vem do SQLite como string, então também convertemos para bytes
-        try:
-            if bcrypt.checkpw(senha_digitada.encode('utf-8'), stored.encode('utf-8')):
-                return True, row['nome_completo'], bool(row['admin'])
-        except ValueError:
-            # Proteção caso, por algum erro manual, o banco tenha um hash inválido/corrompido
-            return False, None, False
 
-        # Se quiser implementar troca incremental: verificar outros esquemas aqui (ex: bcrypt)
-        return False, None, False
+def _regravar_hash_senha(usuario: str, senha: str) -> None:
+    # Executa no pool do bcrypt: já está fora da thread da sessão, então gera o hash direto
+    novo_hash = bcrypt.hashpw(senha.encode('utf-8'), bcrypt.gensalt(rounds=seg.custo_atual())).decode('utf-8')
+    conn = cnc.conectar()
+    try:
+        with conn:
+            conn.execute("UPDATE usuarios SET password_hash=? WHERE username=?", (novo_hash, usuario))
+        logger.info("Hash de senha atualizado para o custo %s: %s", seg.custo_atual(), usuario)
+    except Exception:
+        logger.exception("Falha ao regravar hash de senha: %s", usuario)
     finally:
         conn.close()
 
 
-def get_unidades_usuario(usuario: str) -> List[Tuple[int, str]]:
+# --- CACHE DE VÍNCULOS USUÁRIO -> UNIDADES (compartilhado entre as sessões, por username) ---
+# A barra lateral consulta os vínculos a cada rerun; o banco só é lido na primeira vez.
+# admin_usuarios_rps invalida o usuário ao criar/editar vínculos.
+_cache_unidades_usuario: Dict[str, Tuple[Tuple[int, str], ...]] = {}
+_lock_unidades_usuario = threading.Lock()
+_geracao_unidades_usuario = 0  # Incrementada a cada invalidação (descarta leituras concorrentes antigas)
+
+
+def get_unidades_usuario(usuario: str) -> Tuple[Tuple[int, str], ...]:
+    unis = _cache_unidades_usuario.get(usuario)
+    if unis is not None:
+        return unis
+    geracao = _geracao_unidades_usuario
     conn = cnc.conectar()
     try:
         rows = conn.execute(
             'SELECT u.id AS id, u.nome AS nome FROM unidades u JOIN usuario_unidades uu ON u.id = uu.unidade_id WHERE uu.usuario_username = ? ORDER BY u.id',
             (usuario,)
         ).fetchall()
-        return [(r['id'], r['nome']) for r in rows]
+        unis = tuple((r['id'], r['nome']) for r in rows)
     finally:
         conn.close()
+    with _lock_unidades_usuario:
+        if geracao == _geracao_unidades_usuario:
+            _cache_unidades_usuario[usuario] = unis
+    return unis
+
+
+def invalidar_cache_unidades_usuario(usuario: Optional[str] = None) -> None:
+    """Descarta os vínculos do usuário informado (ou de todos)."""
+    global _geracao_unidades_usuario
+    with _lock_unidades_usuario:
+        _geracao_unidades_usuario += 1
+        if usuario is None:
+            _cache_unidades_usuario.clear()
+        else:
+            _cache_unidades_usuario.pop(usuario, None)
 
 
 def get_parametros_unidade(unidade_id):
@@ -147,19 +342,18 @@ def buscar_todas_unidades():
     """
     Retorna lista de tuplas (id, nome) de todas as unidades cadastradas.
     """
-    conn = cnc.conectar()
-    try:
-        return conn.execute("SELECT id, nome FROM unidades ORDER BY nome").fetchall()
-    finally:
-        conn.close()
+    return obter_referencia('unidades')
 
-def buscar_lista_usuarios():
+def buscar_lista_usuarios(cursor: Optional[Cursor] = None, limite: int = 25) -> Tuple[pd.DataFrame, Optional[Cursor]]:
     """
-    Retorna DataFrame com dados básicos dos usuários para listagem.
+    Retorna uma página (DataFrame) com dados básicos dos usuários, em ordem de nome,
+    e o cursor da próxima página (None na última).
     """
     conn = cnc.conectar()
     try:
-        return pd.read_sql("SELECT username, nome_completo, admin, ativo FROM usuarios ORDER BY nome_completo", conn)
+        consulta = "SELECT username, COALESCE(nome_completo, '') AS nome_completo, admin, ativo FROM usuarios"
+        return consultar_pagina_cursor(conn, consulta, [], ('nome_completo', 'username'),
+                                       cursor=cursor, limite=limite)
     finally:
         conn.close()
 
@@ -167,12 +361,80 @@ def buscar_ids_unidades_usuario(username):
     """
     Retorna uma lista de IDs das unidades que o usuário tem acesso.
     """
-    conn = cnc.conectar()
-    try:
-        res = conn.execute("SELECT unidade_id FROM usuario_unidades WHERE usuario_username=?", (username,)).fetchall()
-        return [r[0] for r in res]
-    finally:
-        conn.close()
+    return [u[0] for u in get_unidades_usuario(username)]
+
+def _consultar_resumo_mes(conn, unidade_id, hoje: datetime) -> dict:
+    # Uma passada com agregação condicional sobre pagamentos + despesas do mês;
+    # as contagens de matrículas vão como subconsultas no mesmo comando.
+    # O filtro por faixa de data_fim (em vez de strftime) usa idx_matriculas_encerramento.
+    mes_ref = hoje.strftime("%m/%Y")
+    inicio_mes = date(hoje.year, hoje.month, 1)
+    inicio_prox = date(hoje.year + hoje.month // 12, hoje.month % 12 + 1, 1)
+
+    row = conn.execute("""
+        SELECT
+            COALESCE(SUM(CASE WHEN origem='R' THEN valor END), 0) AS rec_total,
+            COALESCE(SUM(CASE WHEN origem='R' AND id_status=1 THEN valor END), 0) AS rec_pendente,
+            COALESCE(SUM(CASE WHEN origem='D' THEN valor END), 0) AS desp_total,
+            COALESCE(SUM(CASE WHEN origem='D' AND id_status=1 THEN valor END), 0) AS desp_pendente,
+            (SELECT COUNT(*) FROM matriculas WHERE unidade_id=:u AND ativo=1) AS alunos_ativos,
+            (SELECT COUNT(*) FROM matriculas WHERE unidade_id=:u AND ativo=0
+                AND data_fim >= :ini AND data_fim < :fim) AS alunos_ausentes
+        FROM (
+            SELECT 'R' AS origem, valor_pago AS valor, id_status FROM pagamentos WHERE unidade_id=:u AND mes_referencia=:mes
+            UNION ALL
+            SELECT 'D' AS origem, valor, id_status FROM despesas WHERE unidade_id=:u AND mes_referencia=:mes
+        )
+    """, {'u': unidade_id, 'mes': mes_ref, 'ini': inicio_mes, 'fim': inicio_prox}).fetchone()
+
+    return {
+        "mes": mes_ref,
+        "rec_total": from_cents(row['rec_total']),
+        "rec_pendente": from_cents(row['rec_pendente']),
+        "desp_total": from_cents(row['desp_total']),
+        "desp_pendente": from_cents(row['desp_pendente']),
+        "saldo_previsto": from_cents(row['rec_total'] - row['desp_total']),
+        "alunos_ativos": row['alunos_ativos'] or 0,
+        "alunos_ausentes": row['alunos_ausentes'] or 0,
+    }
+
+
+def _consultar_pendencias_mes(conn, unidade_id, mes_ref, limite: Optional[int] = None,
+                              offset_receber: int = 0, offset_pagar: int = 0) -> Tuple[pd.DataFrame, pd.DataFrame, int, int]:
+    # As duas listas da Home em um único comando; separadas depois pela coluna 'origem'.
+    # Com 'limite', cada lista é paginada no próprio banco (ROW_NUMBER por origem).
+    df = pd.read_sql_query("""
+        SELECT origem, descricao, data_vencimento, valor, total FROM (
+            SELECT *,
+                ROW_NUMBER() OVER (PARTITION BY origem ORDER BY data_vencimento, id) AS pos,
+                COUNT(*) OVER (PARTITION BY origem) AS total
+            FROM (
+                SELECT 'R' AS origem, p.id, a.nome AS descricao, p.data_vencimento, p.valor_pago AS valor
+                FROM pagamentos p JOIN alunos a ON p.aluno_id = a.id
+                WHERE p.id_status=1 AND p.mes_referencia = :mes AND p.unidade_id = :u
+                UNION ALL
+                SELECT 'D' AS origem, id, descricao, data_vencimento, valor
+                FROM despesas
+                WHERE id_status=1 AND mes_referencia = :mes AND unidade_id = :u
+            )
+        )
+        WHERE :lim IS NULL
+           OR (origem = 'R' AND pos > :off_r AND pos <= :off_r + :lim)
+           OR (origem = 'D' AND pos > :off_p AND pos <= :off_p + :lim)
+        ORDER BY origem, pos
+    """, conn, params={'u': unidade_id, 'mes': mes_ref, 'lim': limite, 'off_r': offset_receber, 'off_p': offset_pagar})
+
+    rec = df['origem'] == 'R'
+    receber = (df.loc[rec, ['descricao', 'data_vencimento', 'valor']]
+                 .rename(columns={'descricao': 'nome', 'valor': 'valor_pago'})
+                 .reset_index(drop=True))
+    pagar = df.loc[~rec, ['descricao', 'data_vencimento', 'valor']].reset_index(drop=True)
+
+    # Página vazia (além do fim) não traz o total: a contagem fica 0 e a tela volta ao início
+    total_receber = int(df.loc[rec, 'total'].iloc[0]) if rec.any() else 0
+    total_pagar = int(df.loc[~rec, 'total'].iloc[0]) if (~rec).any() else 0
+    return receber, pagar, total_receber, total_pagar
+
 
 def buscar_resumo_operacional_mes(unidade_id):
     """
@@ -181,42 +443,31 @@ def buscar_resumo_operacional_mes(unidade_id):
     """
     conn = cnc.conectar()
     try:
-        hoje = datetime.now()
-        mes_ref = hoje.strftime("%m/%Y")     # Para pagamentos/despesas
-        mes_anomes = hoje.strftime('%Y-%m')  # Para filtro de data_fim (sqlite)
-
-        cursor = conn.cursor()
-
-        # 1. Receitas
-        cursor.execute("SELECT SUM(valor_pago) FROM pagamentos WHERE mes_referencia = ? AND unidade_id = ?", (mes_ref, unidade_id))
-        rec_total = cursor.fetchone()[0] or 0.0
-
-        cursor.execute("SELECT SUM(valor_pago) FROM pagamentos WHERE mes_referencia = ? AND id_status=1 AND unidade_id = ?", (mes_ref, unidade_id))
-        rec_pendente = cursor.fetchone()[0] or 0.0
-
-        # 2. Despesas
-        cursor.execute("SELECT SUM(valor) FROM despesas WHERE mes_referencia = ? AND unidade_id = ?", (mes_ref, unidade_id))
-        desp_total = cursor.fetchone()[0] or 0.0
-
-        cursor.execute("SELECT SUM(valor) FROM despesas WHERE mes_referencia = ? AND id_status=1 AND unidade_id = ?", (mes_ref, unidade_id))
-        desp_pendente = cursor.fetchone()[0] or 0.0
-
-        # 3. Alunos
-        cursor.execute("SELECT COUNT(id) FROM matriculas WHERE ativo=1 AND unidade_id = ?", (unidade_id,))
-        alunos_ativos = cursor.fetchone()[0] or 0
+        return _consultar_resumo_mes(conn, unidade_id, datetime.now())
+    finally:
+        conn.close()
 
-        cursor.execute("SELECT COUNT(*) FROM matriculas WHERE unidade_id = ? AND ativo = 0 AND strftime('%Y-%m', data_fim) = ?", (unidade_id, mes_anomes))
-        alunos_ausentes = cursor.fetchone()[0] or 0
 
+def buscar_painel_home(unidade_id, limite: Optional[int] = None, offset_receber: int = 0, offset_pagar: int = 0) -> Dict[str, Any]:
+    """
+    Tudo o que a Home exibe, numa única conexão e em três consultas:
+    1. Cards do mês (agregação condicional + contagens de matrículas)
+    2. Listas de pendências a receber e a pagar (UNION ALL, paginadas quando há 'limite')
+    3. Carteira a receber por faixa de atraso
+    """
+    conn = cnc.conectar()
+    try:
+        hoje = datetime.now()
+        resumo = _consultar_resumo_mes(conn, unidade_id, hoje)
+        receber, pagar, qtd_receber, qtd_pagar = _consultar_pendencias_mes(
+            conn, unidade_id, resumo['mes'], limite, offset_receber, offset_pagar)
         return {
-            "mes": mes_ref,
-            "rec_total": from_cents(rec_total),
-            "rec_pendente": from_cents(rec_pendente),
-            "desp_total": from_cents(desp_total),
-            "desp_pendente": from_cents(desp_pendente),
-            "saldo_previsto": from_cents(rec_total - desp_total),
-            "alunos_ativos": alunos_ativos,
-            "alunos_ausentes": alunos_ausentes,
+            "resumo": resumo,
+            "pendencias_receber": receber,
+            "pendencias_pagar": pagar,
+            "qtd_receber": qtd_receber,
+            "qtd_pagar": qtd_pagar,
+            "aging": _consultar_aging_recebiveis(conn, unidade_id, hoje.date()),
         }
     finally:
         conn.close()
@@ -253,27 +504,51 @@ def buscar_pendencias_pagamento(unidade_id, mes_ref):
     finally:
         conn.close()
 
-def buscar_canais_aquisicao() -> List[dict]:
-    conn = cnc.conectar()
-    try:
-        # Retorna lista de dicts com 'id' e 'nome'
-        df = pd.read_sql_query("SELECT id, nome FROM canais_aquisicao ORDER BY nome", conn)
-        return df.to_dict(orient="records")
-    finally:
-        conn.close()
+# Faixas de atraso (dias após o vencimento) usadas na cobrança
+FAIXAS_AGING = [
+    ('a_vencer', 'A vencer'),
+    ('d1_30', '1-30 dias'),
+    ('d31_60', '31-60 dias'),
+    ('d61_90', '61-90 dias'),
+    ('d90_mais', '90+ dias'),
+]
 
-def buscar_disciplinas() -> List[dict]:
-    conn = cnc.conectar()
-    try:
-        df = pd.read_sql_query("SELECT id, nome FROM disciplinas ORDER BY nome", conn)
-        return df.to_dict(orient="records")
-    finally:
-        conn.close()
 
-def buscar_formas_pagamento() -> List[dict]:
-    conn = cnc.conectar()
-    try:
-        df = pd.read_sql("SELECT id, nome FROM formas_pagamento ORDER BY nome", conn)
-        return df.to_dict(orient="records")
-    finally:
-        conn.close()
\ No newline at end of file
+def _consultar_aging_recebiveis(conn, unidade_id, hoje: date) -> pd.DataFrame:
+    """
+    Carteira de recebíveis pendentes da unidade distribuída nas faixas de FAIXAS_AGING.
+    Uma única consulta agregada por aluno e disciplina (valores em centavos); os totais
+    por disciplina e da unidade saem da soma dessas linhas (a Home lê pelo painel, chave 'aging').
+    """
+    # WHERE unidade_id=? AND id_status=1 percorre apenas o índice idx_pagamentos_cobranca
+    query = """
+        SELECT
+            p.aluno_id, a.nome, COALESCE(d.nome, 'Taxa') AS disciplina,
+            COUNT(*) AS parcelas,
+            SUM(p.valor_pago) AS total,
+            SUM(CASE WHEN p.data_vencimento >= :hoje THEN p.valor_pago ELSE 0 END) AS a_vencer,
+            SUM(CASE WHEN p.data_vencimento <  :hoje AND p.data_vencimento >= DATE(:hoje, '-30 days') THEN p.valor_pago ELSE 0 END) AS d1_30,
+            SUM(CASE WHEN p.data_vencimento <  DATE(:hoje, '-30 days') AND p.data_vencimento >= DATE(:hoje, '-60 days') THEN p.valor_pago ELSE 0 END) AS d31_60,
+            SUM(CASE WHEN p.data_vencimento <  DATE(:hoje, '-60 days') AND p.data_vencimento >= DATE(:hoje, '-90 days') THEN p.valor_pago ELSE 0 END) AS d61_90,
+            SUM(CASE WHEN p.data_vencimento <  DATE(:hoje, '-90 days') THEN p.valor_pago ELSE 0 END) AS d90_mais,
+            CAST(MAX(julianday(:hoje) - julianday(p.data_vencimento)) AS INTEGER) AS maior_atraso
+        FROM pagamentos p
+        LEFT JOIN alunos a ON (a.id = p.aluno_id)
+        LEFT JOIN matriculas m ON (m.id = p.matricula_id)
+        LEFT JOIN disciplinas d ON (d.id = m.id_disciplina)
+        WHERE p.unidade_id = :unidade AND p.id_status = 1
+        GROUP BY p.aluno_id, a.nome, COALESCE(d.nome, 'Taxa')
+        ORDER BY maior_atraso DESC
+    """
+    return pd.read_sql_query(query, conn, params={'unidade': unidade_id, 'hoje': hoje.isoformat()})
+
+
+def buscar_canais_aquisicao() -> tuple:
+    # Retorna registros com 'id' e 'nome' (servidos do cache de referência)
+    return obter_referencia('canais_aquisicao')
+
+def buscar_disciplinas() -> tuple:
+    return obter_referencia('disciplinas')
+
+def buscar_formas_pagamento() -> tuple:
+    return obter_referencia('formas_pagamento')
@@ -2,10 +2,12 @@ from repositories import equipe_rps as rps
 
 import streamlit as st
 import auth
+import componentes
 import database as db
-from datetime import datetime, date, time
+from datetime import datetime, date
 
 st.set_page_config(page_title="Gestão de Equipe", layout="wide", page_icon="👥")
+componentes.medir_pagina("Gestão de Equipe")
 if not auth.validar_sessao(): auth.tela_login(); st.stop()
 auth.barra_lateral()
 
@@ -218,7 +220,7 @@ with tab2:
                                     unidade_id=unidade_atual
                                 )
                                 st.toast("Custo removido e despesa cancelada.")
-                                time.sleep(1)
+                                componentes.pausa(1)
                                 st.rerun()
                             except Exception as e:
                                 st.error(f"Erro: {e}")
@@ -258,4 +260,6 @@ with tab2:
                                     st.error(f"Erro: {e}")
 
     else:
-        st.warning("Nenhum funcionário encontrado para o filtro selecionado.")
\ No newline at end of file
+        st.warning("Nenhum funcionário encontrado para o filtro selecionado.")
+
+componentes.concluir_pagina()
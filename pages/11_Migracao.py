@@ -1,56 +1,100 @@
 from repositories import migracao_rps as rps
+from services import migracao_svc as mig_svc
 
 import streamlit as st
-import pandas as pd
 import database as db
 import auth
+import componentes
 from datetime import datetime, date
 import calendar
+import hashlib
+from services import dependencias_svc as dep
+pd = dep.preguicoso("pandas")
 
 st.set_page_config(page_title="Migração de Dados", layout="wide", page_icon="🚚")
+componentes.medir_pagina("Migração de Dados")
 if not auth.validar_sessao(): auth.tela_login(); st.stop()
 auth.barra_lateral()
 
 unidade_atual = st.session_state.get('unidade_ativa')
 if not unidade_atual: st.error("Erro Unidade"); st.stop()
 
-# --- TRAVA DE SEGURANÇA (BACKEND) ---
-unidade_limpa, n_alunos, n_matriculas = rps.verificar_status_migracao(unidade_atual)
+# --- LOTES DE IMPORTAÇÃO (histórico e reversão) ---
+@st.dialog("Reverter Importação")
+def popup_reverter(lote_id, descricao):
+    st.warning(f"Deseja realmente apagar tudo o que foi criado pela importação **{descricao}**?")
+    st.caption("Alunos, matrículas e mensalidades do lote serão excluídos. Esta ação não pode ser desfeita.")
 
-if not unidade_limpa:
-    st.error(f"""
-        🚫 **Migração Bloqueada**
-        
-        Esta unidade já possui dados operacionais e não pode receber migração em massa para evitar duplicidade.
-        
-        **Registros encontrados:**
-        - Alunos: {n_alunos}
-        - Matrículas: {n_matriculas}
-        
-        Para realizar uma nova migração, é necessário que a unidade esteja completamente vazia.
-    """)
-    st.info("💡 Dica: Se isso for um erro e você precisa reiniciar a unidade, contate o suporte.")
-    st.stop()
+    col_sim, col_nao = st.columns(2)
+
+    if col_sim.button("✅ Sim, Reverter", type="primary"):
+        try:
+            r = rps.reverter_lote_importacao(lote_id, unidade_atual)
+            st.session_state.pop('previa_migracao', None)
+            st.toast(f"Importação revertida: {r['alunos']} alunos, {r['matriculas']} matrículas e {r['mensalidades']} mensalidades apagados.")
+            componentes.pausa(0.5)
+            st.rerun()
+        except Exception as e:
+            st.error(f"Erro ao reverter: {e}")
+
+    if col_nao.button("Cancelar"):
+        st.rerun()
+
+def painel_lotes():
+    lotes = rps.listar_lotes_importacao(unidade_atual)
+    if lotes.empty: return
+
+    st.divider()
+    st.subheader("🗂️ Importações Realizadas")
+    rotulos = {'EM_ANDAMENTO': '⏸️ Interrompida', 'CONCLUIDO': '✅ Concluída', 'REVERTIDO': '↩️ Revertida'}
+    st.dataframe(
+        lotes.assign(status=lotes['status'].map(rotulos).fillna(lotes['status']),
+                     modo=lotes['modo'].map({'COMPLETA': 'Completa', 'INCREMENTAL': 'Incremental'}).fillna(lotes['modo'])),
+        hide_index=True, width='stretch',
+        column_config={
+            "id": "Lote", "arquivo": "Arquivo", "usuario": "Usuário", "modo": "Modo", "status": "Situação",
+            "linhas_gravadas": "Linhas Gravadas", "total_linhas": "Total de Linhas",
+            "data_inicio": "Início", "data_fim": "Fim",
+        }
+    )
+
+    reversiveis = lotes[lotes['status'] != 'REVERTIDO']
+    if not reversiveis.empty:
+        descricoes = {r.id: f"#{r.id} - {r.arquivo or 'sem nome'}" for r in reversiveis.itertuples()}
+        c1, c2 = st.columns([3, 1], vertical_alignment="bottom")
+        lote_sel = c1.selectbox("Lote", list(descricoes), format_func=descricoes.get, key="mig_lote_reverter")
+        if c2.button("↩️ Reverter Importação"):
+            popup_reverter(lote_sel, descricoes[lote_sel])
+
+# --- MODO DE IMPORTAÇÃO (BACKEND) ---
+# Unidade vazia: importação completa. Unidade com dados: importação incremental (só novos ou alterados).
+unidade_limpa, n_alunos, n_matriculas = rps.verificar_status_migracao(unidade_atual)
+modo_incremental = not unidade_limpa
 
 # --- INTERFACE DE MIGRAÇÃO ---
 
 st.title("🚚 Migração de Dados")
 st.info("Use esta ferramenta para importar sua base antiga (Excel/CSV).")
 
-# Funções Auxiliares de Tratamento (Frontend)
-def limpar_cpf(cpf_str):
-    if pd.isna(cpf_str): return ""
-    return ''.join(filter(str.isdigit, str(cpf_str)))
+if modo_incremental:
+    st.warning(f"""
+        🔁 **Importação Incremental**
 
-def formatar_cpf(cpf_limpo):
-    if len(cpf_limpo) != 11: return cpf_limpo 
-    return f"{cpf_limpo[:3]}.{cpf_limpo[3:6]}.{cpf_limpo[6:9]}-{cpf_limpo[9:]}"
+        Esta unidade já possui dados (**{n_alunos}** alunos e **{n_matriculas}** matrículas). Só os registros novos
+        ou alterados da planilha serão gravados: o aluno é reconhecido pelo nome + CPF do responsável e a
+        matrícula pelo aluno + disciplina. Confira a prévia antes de aplicar.
+    """)
+
+lote_pendente = None if modo_incremental else rps.buscar_lote_pendente(unidade_atual)
+if lote_pendente:
+    st.warning(f"⏸️ A importação **#{lote_pendente['id']}** ({lote_pendente['arquivo'] or 'sem nome'}) foi interrompida com "
+               f"{lote_pendente['linhas_gravadas']} de {lote_pendente['total_linhas']} linhas gravadas. "
+               "Envie o mesmo arquivo para continuar de onde parou, ou reverta-a (abaixo) antes de importar outro arquivo.")
 
 # Download Modelo
-colunas_modelo = ["Aluno", "Responsavel", "CPF Responsavel", "Disciplina", "Valor", "Dia Vencimento", "Canal"]
 st.download_button(
     "📥 Baixar Modelo Atualizado (com CPF)", 
-    pd.DataFrame(columns=colunas_modelo).to_csv(index=False, sep=';').encode('latin-1'), 
+    pd.DataFrame(columns=mig_svc.COLUNAS_MODELO).to_csv(index=False, sep=';').encode('latin-1'), 
     "modelo_migracao.csv"
 )
 
@@ -61,64 +105,122 @@ arquivo = st.file_uploader("Upload CSV/XLSX", type=['xlsx','csv'])
 
 if arquivo:
     try:
-        # Leitura do Arquivo
+        # Leitura do Arquivo (CSV como texto: CPFs e valores chegam como digitados)
         if arquivo.name.endswith('.csv'):
-            try: df = pd.read_csv(arquivo, sep=None, engine='python')
-            except: arquivo.seek(0); df = pd.read_csv(arquivo, sep=None, engine='python', encoding='latin-1')
+            try: df = pd.read_csv(arquivo, sep=None, engine='python', dtype=str)
+            except: arquivo.seek(0); df = pd.read_csv(arquivo, sep=None, engine='python', encoding='latin-1', dtype=str)
         else: df = pd.read_excel(arquivo)
         
-        df.columns = [c.strip().title() for c in df.columns]
-        
-        colunas_obrigatorias = {"Aluno", "Responsavel", "Disciplina", "Valor", "Dia Vencimento"}
+        df = mig_svc.normalizar_colunas(df)
         
-        if colunas_obrigatorias.issubset(set(df.columns)):
+        if mig_svc.COLUNAS_OBRIGATORIAS.issubset(set(df.columns)):
             st.success(f"Arquivo lido! {len(df)} registros encontrados.")
             st.dataframe(df.head())
-            
-            if st.button("🚀 Iniciar Importação", type="primary"):
-                # PREPARAÇÃO DOS DADOS (Frontend)
-                registros_preparados = []
-                
-                try:
-                    with st.spinner("Processando dados e enviando para o banco..."):
-                        for idx, row in df.iterrows():
-                            # Limpeza e Tratamento
-                            nome = str(row['Aluno']).strip()
-                            resp = str(row['Responsavel']).strip()
-                            disc = str(row['Disciplina']).strip()
-                            dia = int(row['Dia Vencimento'])
-                            
-                            # Valor
-                            try: valor = float(str(row['Valor']).replace("R$","").replace(".","").replace(",","."))
-                            except: valor = float(str(row['Valor']).replace(",", "."))
-                            
-                            # CPF
-                            cpf_raw = row['Cpf Responsavel'] if 'Cpf Responsavel' in df.columns else ""
-                            cpf_final = formatar_cpf(limpar_cpf(cpf_raw))
-                            
-                            canal = row['Canal'] if 'Canal' in df.columns else 'Importacao'
-                            
-                            # Adiciona ao pacote
-                            registros_preparados.append({
-                                'nome': nome,
-                                'responsavel': resp,
-                                'disciplina': disc,
-                                'dia_vencimento': dia,
-                                'valor': valor,
-                                'cpf': cpf_final,
-                                'canal': canal
-                            })
-                        
-                        # EXECUÇÃO (Backend)
-                        rps.importar_dados_migracao(unidade_atual, registros_preparados)
-                        
-                        st.success("Importação concluída com sucesso!")
+
+            # PRÉ-VALIDAÇÃO (todas as linhas, antes de gravar qualquer coisa)
+            limpo, erros = mig_svc.validar_planilha(
+                df,
+                [d['nome'] for d in db.obter_referencia('disciplinas')],
+                [c['nome'] for c in db.obter_referencia('canais_aquisicao')],
+            )
+            linhas_com_erro = erros['Linha'].nunique()
+
+            m1, m2, m3 = st.columns(3)
+            m1.metric("Linhas no arquivo", len(df))
+            m2.metric("Prontas para importar", len(limpo))
+            m3.metric("Com problema", linhas_com_erro)
+
+            importar_validas = True
+            if linhas_com_erro:
+                st.warning(f"⚠️ {linhas_com_erro} linha(s) com problema. Corrija a planilha e envie de novo, "
+                           "ou importe só as linhas válidas.")
+                st.dataframe(erros, hide_index=True, width='stretch')
+                st.download_button(
+                    "📥 Baixar Relatório de Erros (CSV)",
+                    erros.to_csv(index=False, sep=';').encode('utf-8-sig'),
+                    "erros_migracao.csv", mime="text/csv"
+                )
+                importar_validas = st.checkbox(f"Ignorar as linhas com problema e importar as {len(limpo)} válidas")
+
+            if modo_incremental:
+                # PRÉVIA: o que será inserido, atualizado ou ignorado (nada é gravado ainda).
+                # Calculada uma vez por arquivo; os cliques na tela reaproveitam a da sessão.
+                chave_previa = (unidade_atual, hashlib.sha256(arquivo.getvalue()).hexdigest())
+                if st.session_state.get('previa_migracao', (None,))[0] != chave_previa:
+                    st.session_state['previa_migracao'] = (
+                        chave_previa,
+                        *(rps.planejar_migracao_incremental(unidade_atual, limpo) if not limpo.empty else (None, None))
+                    )
+                _, plano, previa = st.session_state['previa_migracao']
+                if plano is not None:
+                    st.subheader("🔍 Prévia da Importação Incremental")
+                    p1, p2, p3, p4, p5 = st.columns(5)
+                    p1.metric("Alunos novos", previa['alunos_novos'])
+                    p2.metric("Alunos atualizados", previa['alunos_atualizados'])
+                    p3.metric("Matrículas novas", previa['matriculas_novas'])
+                    p4.metric("Matrículas atualizadas", previa['matriculas_atualizadas'])
+                    p5.metric("Sem alteração", previa['ignoradas'])
+
+                    rotulos_acao = {'INSERIR': '➕ Inserir', 'ATUALIZAR': '✏️ Atualizar', 'MANTER': '—', 'IGNORAR': '— Ignorar'}
+                    so_mudancas = st.toggle("Mostrar só o que muda", value=True)
+                    exibir = plano if not so_mudancas else plano[plano['acao_matricula'].ne('IGNORAR') | plano['acao_aluno'].ne('MANTER')]
+                    st.dataframe(
+                        exibir.assign(acao_aluno=exibir['acao_aluno'].map(rotulos_acao),
+                                      acao_matricula=exibir['acao_matricula'].map(rotulos_acao)),
+                        hide_index=True, width='stretch',
+                        column_config={
+                            "linha": "Linha", "nome": "Aluno", "disciplina": "Disciplina",
+                            "acao_aluno": "Aluno (ação)", "acao_matricula": "Matrícula (ação)", "alteracoes": "Alterações",
+                        }
+                    )
+                    st.caption("Reverter o lote depois apaga só o que foi inserido; as atualizações permanecem.")
+
+                sem_mudancas = previa is None or not any(v for k, v in previa.items() if k != 'ignoradas')
+                if st.button("🔁 Aplicar Importação Incremental", type="primary",
+                             disabled=sem_mudancas or not importar_validas):
+                    try:
+                        with st.spinner("Gravando alterações..."):
+                            resumo = rps.importar_migracao_incremental(
+                                unidade_atual, limpo,
+                                arquivo=arquivo.name, usuario=st.session_state.get('usuario_logado')
+                            )
+                        st.session_state.pop('previa_migracao', None)  # A base mudou: a próxima prévia é recalculada
+                        st.success(f"Importação #{resumo['lote_id']} concluída! {resumo['alunos_novos']} alunos novos, "
+                                   f"{resumo['alunos_atualizados']} atualizados; {resumo['matriculas_novas']} matrículas novas, "
+                                   f"{resumo['matriculas_atualizadas']} atualizadas e {resumo['ignoradas']} sem alteração.")
                         st.balloons()
-                        
+                    except Exception as e:
+                        st.error(f"Erro durante o processo: {e}. Nada foi gravado.")
+
+            elif st.button("🚀 Iniciar Importação", type="primary", disabled=limpo.empty or not importar_validas):
+                try:
+                    # EXECUÇÃO (Backend): gravação em blocos, com progresso
+                    barra = st.progress(0.0, text="Enviando para o banco...")
+                    def mostrar_progresso(feitos, total, etapa):
+                        barra.progress(feitos / total if total else 1.0, text=f"{etapa}: {feitos}/{total} registros gravados")
+
+                    resumo = rps.importar_migracao_em_lotes(
+                        unidade_atual, limpo, progresso=mostrar_progresso,
+                        arquivo=arquivo.name, usuario=st.session_state.get('usuario_logado')
+                    )
+                    barra.empty()
+
+                    if resumo['retomado_de']:
+                        st.info(f"Importação retomada a partir da linha {resumo['retomado_de'] + 1}.")
+                    st.success(f"Importação #{resumo['lote_id']} concluída com sucesso! {resumo['alunos']} alunos, "
+                               f"{resumo['matriculas']} matrículas e {resumo['mensalidades']} mensalidades.")
+                    st.balloons()
+
                 except Exception as e:
                     st.error(f"Erro durante o processo: {e}")
+                    if rps.buscar_lote_pendente(unidade_atual):
+                        st.caption("Os blocos já confirmados ficaram gravados: envie o mesmo arquivo para continuar.")
         else: 
             st.error("Colunas obrigatórias faltando.")
-            st.write(f"Esperado: {colunas_obrigatorias}")
+            st.write(f"Esperado: {mig_svc.COLUNAS_OBRIGATORIAS}")
             
-    except Exception as e: st.error(f"Erro ao ler arquivo: {e}")
\ No newline at end of file
+    except Exception as e: st.error(f"Erro ao ler arquivo: {e}")
+
+painel_lotes()
+
+componentes.concluir_pagina()
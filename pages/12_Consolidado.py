@@ -0,0 +1,123 @@
+from repositories import dashboard_rps as rps
+
+import streamlit as st
+import auth
+import componentes
+from datetime import datetime
+from services import dependencias_svc as dep
+pd = dep.preguicoso("pandas")
+np = dep.preguicoso("numpy")
+px = dep.preguicoso("plotly.express")
+
+st.set_page_config(page_title="Visão Consolidada", layout="wide", page_icon="🏢")
+componentes.medir_pagina("Visão Consolidada")
+if not auth.validar_sessao(): auth.tela_login(); st.stop()
+auth.barra_lateral()
+
+usuario = st.session_state.get('usuario_logado')
+if not usuario:
+    st.error("Sessão inválida. Faça login novamente.")
+    st.stop()
+
+st.title("🏢 Visão Consolidada da Rede")
+st.caption("Comparativo de todas as unidades às quais você tem acesso.")
+
+def format_brl(val): return f"R$ {val:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+# 1. FILTRO DE ANO
+anos_disponiveis = [str(datetime.now().year), str(datetime.now().year - 1)]
+ano_sel = st.selectbox("Selecione o Ano de Análise:", anos_disponiveis)
+
+# --- CARREGAMENTO (UMA CONSULTA AGRUPADA POR UNIDADE) ---
+df = rps.buscar_kpis_consolidados(usuario, ano_sel)
+
+if df.empty:
+    st.info("Nenhuma unidade vinculada ao seu usuário.")
+    st.stop()
+
+# --- KPIS POR UNIDADE (Vetorizado: uma coluna por indicador) ---
+for col in ['receita', 'despesa', 'custo_rh', 'valor_total', 'valor_atrasado']:
+    df[col] = df[col] / 100.0
+
+df['lucro'] = df['receita'] - df['despesa']
+df['margem'] = np.where(df['receita'] > 0, df['lucro'] / df['receita'].where(df['receita'] > 0) * 100, 0.0)
+df['inadimplencia'] = np.where(df['valor_total'] > 0, df['valor_atrasado'] / df['valor_total'].where(df['valor_total'] > 0) * 100, 0.0)
+media_mensal = df['receita'] / df['meses_faturados'].clip(lower=1)
+df['ticket_aluno'] = np.where(df['alunos_unicos'] > 0, media_mensal / df['alunos_unicos'].clip(lower=1), 0.0)
+df['alunos_por_func'] = np.where(df['funcionarios'] > 0, df['matriculas'] / df['funcionarios'].clip(lower=1), 0.0)
+
+# ==============================================================================
+# SEÇÃO 1: TOTAIS DA REDE
+# ==============================================================================
+receita_rede = df['receita'].sum()
+lucro_rede = df['lucro'].sum()
+total_rede = df['valor_total'].sum()
+inad_rede = (df['valor_atrasado'].sum() / total_rede) * 100 if total_rede > 0 else 0
+
+st.markdown(f"### 🌐 Totais da Rede ({len(df)} unidades)")
+c1, c2, c3, c4 = st.columns(4)
+c1.metric("Faturamento Anual", format_brl(receita_rede))
+c2.metric("Lucro Líquido", format_brl(lucro_rede), delta_color="normal" if lucro_rede >= 0 else "inverse")
+c3.metric("Matrículas Ativas", int(df['matriculas'].sum()), help=f"{int(df['alunos_unicos'].sum())} alunos únicos")
+c4.metric("Inadimplência", f"{inad_rede:.1f}%", delta_color="inverse")
+
+st.markdown("---")
+
+# ==============================================================================
+# SEÇÃO 2: RANKING
+# ==============================================================================
+st.markdown("### 🏆 Ranking das Unidades")
+
+INDICADORES = {
+    "Faturamento": ('receita', False),
+    "Lucro Líquido": ('lucro', False),
+    "Margem (%)": ('margem', False),
+    "Matrículas Ativas": ('matriculas', False),
+    "Ticket Médio (Aluno)": ('ticket_aluno', False),
+    "Alunos por Funcionário": ('alunos_por_func', False),
+    "Inadimplência (%)": ('inadimplencia', True),  # Menor é melhor
+}
+nome_ind = st.radio("Ordenar por:", list(INDICADORES.keys()), horizontal=True)
+coluna, menor_melhor = INDICADORES[nome_ind]
+
+ranking = df.sort_values(coluna, ascending=menor_melhor).reset_index(drop=True)
+ranking.insert(0, 'posicao', np.arange(1, len(ranking) + 1))
+
+fig = px.bar(
+    ranking, x=coluna, y='unidade', orientation='h', text_auto='.2s',
+    color=coluna, color_continuous_scale='RdYlGn_r' if menor_melhor else 'RdYlGn',
+    labels={coluna: nome_ind, 'unidade': ''}
+)
+fig.update_layout(
+    yaxis={'categoryorder': 'array', 'categoryarray': ranking['unidade'].tolist()[::-1]},
+    coloraxis_showscale=False, height=max(300, 40 * len(ranking)), margin=dict(l=0, r=0, t=10, b=0)
+)
+st.plotly_chart(fig, use_container_width=True)
+
+# ==============================================================================
+# SEÇÃO 3: COMPARATIVO LADO A LADO
+# ==============================================================================
+st.markdown("### 📋 Comparativo Detalhado")
+tabela = ranking[['posicao', 'unidade', 'receita', 'despesa', 'lucro', 'margem', 'matriculas',
+                  'alunos_unicos', 'ticket_aluno', 'inadimplencia', 'funcionarios', 'alunos_por_func']]
+st.dataframe(
+    tabela,
+    use_container_width=True,
+    hide_index=True,
+    column_config={
+        'posicao': st.column_config.NumberColumn("#", width="small"),
+        'unidade': "Unidade",
+        'receita': st.column_config.NumberColumn("Faturamento", format="R$ %.2f"),
+        'despesa': st.column_config.NumberColumn("Despesas", format="R$ %.2f"),
+        'lucro': st.column_config.NumberColumn("Lucro", format="R$ %.2f"),
+        'margem': st.column_config.NumberColumn("Margem", format="%.1f%%"),
+        'matriculas': "Matrículas",
+        'alunos_unicos': "Alunos",
+        'ticket_aluno': st.column_config.NumberColumn("Ticket/Aluno", format="R$ %.2f"),
+        'inadimplencia': st.column_config.NumberColumn("Inadimplência", format="%.1f%%"),
+        'funcionarios': "Equipe",
+        'alunos_por_func': st.column_config.NumberColumn("Alunos/Func.", format="%.1f"),
+    }
+)
+
+componentes.concluir_pagina()
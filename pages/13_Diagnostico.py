@@ -0,0 +1,128 @@
+from services import desempenho_svc as perf
+from services import artefatos_svc as artefatos
+
+import streamlit as st
+import auth
+import componentes
+from services import dependencias_svc as dep
+pd = dep.preguicoso("pandas")
+px = dep.preguicoso("plotly.express")
+
+st.set_page_config(page_title="Diagnóstico", layout="wide", page_icon="⏱️")
+componentes.medir_pagina("Diagnóstico")
+if not auth.validar_sessao(): auth.tela_login(); st.stop()
+
+# Segurança: área restrita a administradores
+if not st.session_state.get('usuario_admin'):
+    st.error("⛔ Acesso negado. Esta área é restrita a administradores.")
+    auth.barra_lateral()
+    st.stop()
+
+auth.barra_lateral()
+st.title("⏱️ Diagnóstico de Desempenho")
+st.caption(f"Tempo por execução de página (últimas {perf.AMOSTRAS} de cada, em memória neste servidor). "
+           f"Orçamento de referência: p95 até {perf.ORCAMENTO_MS:,.0f} ms.".replace(",", "."))
+
+resumo = perf.resumo()
+if resumo.empty:
+    st.info("Nenhuma execução registrada ainda. Navegue pelas páginas e volte aqui.")
+    componentes.concluir_pagina()
+    st.stop()
+
+# ==============================================================================
+# SEÇÃO 1: VISÃO GERAL POR PÁGINA
+# ==============================================================================
+total = resumo[resumo['fase'] == 'total'].set_index('pagina')
+p50_fases = resumo[resumo['fase'] != 'total'].pivot(index='pagina', columns='fase', values='p50')
+
+tabela = total[['execucoes', 'p50', 'p95']].join(p50_fases[list(perf.FASES)])
+tabela['situacao'] = (tabela['p95'] <= perf.ORCAMENTO_MS).map({True: "✅", False: "🚨"})
+tabela = tabela.sort_values('p95', ascending=False).reset_index()
+
+c1, c2, c3 = st.columns(3)
+c1.metric("Páginas/Trechos Medidos", len(tabela))
+c2.metric("Execuções Registradas", int(tabela['execucoes'].sum()))
+c3.metric("Acima do Orçamento (p95)", int((tabela['situacao'] == "🚨").sum()))
+
+formato_ms = "%.0f ms"
+st.dataframe(
+    tabela[['situacao', 'pagina', 'execucoes', 'p50', 'p95', *perf.FASES]],
+    hide_index=True,
+    use_container_width=True,
+    column_config={
+        'situacao': st.column_config.TextColumn("", width="small"),
+        'pagina': "Página / Fragmento",
+        'execucoes': "Execuções",
+        'p50': st.column_config.NumberColumn("Total p50", format=formato_ms),
+        'p95': st.column_config.NumberColumn("Total p95", format=formato_ms),
+        **{f: st.column_config.NumberColumn(f"{rotulo} (p50)", format=formato_ms) for f, rotulo in perf.FASES.items()},
+    }
+)
+
+# ==============================================================================
+# SEÇÃO 2: DETALHE DE UMA PÁGINA
+# ==============================================================================
+st.markdown("### 🔍 Onde o tempo é gasto")
+pagina_sel = st.selectbox("Página:", tabela['pagina'].tolist())
+
+detalhe = resumo[(resumo['pagina'] == pagina_sel) & (resumo['fase'] != 'total')].copy()
+detalhe['fase'] = detalhe['fase'].map(perf.FASES)
+detalhe = detalhe.melt(id_vars='fase', value_vars=['p50', 'p95'], var_name='percentil', value_name='ms')
+
+fig = px.bar(detalhe, x='ms', y='fase', color='percentil', barmode='group', orientation='h',
+             text_auto='.0f', labels={'ms': 'Tempo (ms)', 'fase': '', 'percentil': ''},
+             color_discrete_map={'p50': '#3498db', 'p95': '#e67e22'})
+fig.update_layout(height=350, margin=dict(l=0, r=0, t=10, b=0))
+st.plotly_chart(fig, use_container_width=True)
+st.caption("As fases são exclusivas: consultas feitas pelo robô contam em 'Consultas ao Banco'. "
+           "Renderização é o restante do tempo da execução.")
+
+# ==============================================================================
+# SEÇÃO 3: IMPORTAÇÃO DE BIBLIOTECAS
+# ==============================================================================
+st.markdown("### 📦 Importação de Bibliotecas")
+st.caption("Primeira carga de cada biblioteca pesada neste processo. "
+           "'aquecimento' = carregada em segundo plano antes de ser usada pela página.")
+importacoes = pd.DataFrame(dep.tempos_importacao(), columns=['modulo', 'ms', 'origem'])
+if importacoes.empty:
+    st.info("Nenhuma biblioteca carregada sob demanda até agora.")
+else:
+    st.dataframe(
+        importacoes, hide_index=True, use_container_width=True,
+        column_config={
+            'modulo': "Biblioteca",
+            'ms': st.column_config.NumberColumn("Tempo", format=formato_ms),
+            'origem': "Carregada por",
+        }
+    )
+
+# ==============================================================================
+# SEÇÃO 4: CACHE DE RELATÓRIOS
+# ==============================================================================
+st.markdown("### 🗄️ Cache de Relatórios")
+arquivos, ocupados = artefatos.ocupacao()
+st.caption(f"{arquivos} arquivo(s), {ocupados / 1024 / 1024:.1f} de {artefatos.LIMITE_MB:.0f} MB "
+           f"em {artefatos.DIRETORIO}. Contadores desde o início deste servidor.")
+uso_cache = pd.DataFrame(artefatos.estatisticas(), columns=['tipo', 'acertos', 'falhas', 'taxa', 'geracao_ms'])
+if uso_cache.empty:
+    st.info("Nenhum relatório baixado até agora.")
+else:
+    st.dataframe(
+        uso_cache, hide_index=True, use_container_width=True,
+        column_config={
+            'tipo': "Relatório",
+            'acertos': "Servidos do Cache",
+            'falhas': "Gerados",
+            'taxa': st.column_config.NumberColumn("Taxa de Acerto", format="%.0f%%"),
+            'geracao_ms': st.column_config.NumberColumn("Geração Média", format=formato_ms),
+        }
+    )
+if st.button("🗑️ Esvaziar Cache de Relatórios"):
+    artefatos.limpar()
+    st.rerun()
+
+if st.button("🗑️ Limpar Amostras"):
+    perf.limpar()
+    st.rerun()
+
+componentes.concluir_pagina()
@@ -1,15 +1,19 @@
 from repositories import financeiro_rps as rps
 from repositories import robo_financeiro_rps as robo_rps
+from repositories import relatorios_rps as rel_rps
 
 import streamlit as st
-import pandas as pd
 import database as db
 import auth
+import componentes
+from services import geral_svc as g_svc
 from datetime import datetime, date, timedelta
 import calendar
-import time
+from services import dependencias_svc as dep
+pd = dep.preguicoso("pandas")
 
 st.set_page_config(page_title="Financeiro", layout="wide", page_icon="💰")
+componentes.medir_pagina("Financeiro")
 if not auth.validar_sessao(): auth.tela_login(); st.stop()
 auth.barra_lateral()
 
@@ -22,22 +26,38 @@ dict_formas = {f['nome']: f['id'] for f in lista_formas}
 opcoes_formas = list(dict_formas.keys())
 
 # --- ROBÔ AUTOMÁTICO (Executa ao abrir a tela) ---
-try:
-    # Chama a função blindada do banco silenciosamente
-    c_desp, c_rec, c_rh = robo_rps.executar_robo_financeiro(unidade_atual)
+# Uma vez por unidade e por dia nesta sessão: reruns (diálogos, filtros) não repetem a verificação
+chave_robo = (unidade_atual, date.today())
+if st.session_state.get('robo_fin_executado') != chave_robo:
+    try:
+        with componentes.fase("robo"):
+            # 1. Modo retroativo: recupera meses em que ninguém abriu o Financeiro desta unidade
+            resumo_retro = robo_rps.executar_robo_retroativo(unidade_atual)
 
-    
-    total_gerado = c_desp + c_rec + c_rh
-    
-    # Só avisa e recarrega SE houve alguma novidade
-    if total_gerado > 0:
-        st.toast(f"🤖 Robô: {c_rec} Boletos, {c_desp} Despesas e {c_rh} RH gerados.", icon="✅")
-        time.sleep(1.5) # Pausa rápida para ler o toast
-        st.rerun()      # Recarrega a página para exibir os novos dados nas tabelas abaixo
-        
-except Exception as e:
-    # Se der erro no robô, mostramos um aviso discreto mas não travamos a tela inteira
-    st.error(f"Alerta: O Robô Financeiro encontrou um problema: {e}")
+            # 2. Chama a função blindada do banco silenciosamente (competência atual)
+            c_desp, c_rec, c_rh = robo_rps.executar_robo_financeiro(unidade_atual)
+
+            # 3. Fotografa as matrículas dos meses encerrados (base dos relatórios por período)
+            rel_rps.fechar_competencias_pendentes(unidade_atual)
+
+        # Só marca como executado se tudo deu certo: com erro, a próxima abertura tenta de novo
+        st.session_state['robo_fin_executado'] = chave_robo
+
+        for r in resumo_retro:
+            st.toast(f"🤖 Robô ({r['mes']}): {r['boletos']} Boletos, {r['despesas']} Despesas e {r['rh']} RH recuperados.", icon="⏪")
+
+
+        total_gerado = c_desp + c_rec + c_rh + sum(r['boletos'] + r['despesas'] + r['rh'] for r in resumo_retro)
+
+        # Só avisa e recarrega SE houve alguma novidade
+        if total_gerado > 0:
+            st.toast(f"🤖 Robô: {c_rec} Boletos, {c_desp} Despesas e {c_rh} RH gerados.", icon="✅")
+            componentes.pausa(1.5) # Pausa rápida para ler o toast
+            st.rerun()      # Recarrega a página para exibir os novos dados nas tabelas abaixo
+
+    except Exception as e:
+        # Se der erro no robô, mostramos um aviso discreto mas não travamos a tela inteira
+        st.error(f"Alerta: O Robô Financeiro encontrou um problema: {e}")
 
 
 
@@ -48,16 +68,6 @@ def format_brl(val):
 def get_valid_date(year, month, day): 
     return date(year, month, min(day, calendar.monthrange(year, month)[1]))
 
-def get_visual_status(dt_str):
-    try:
-        d = datetime.strptime(str(dt_str), '%Y-%m-%d').date() if isinstance(dt_str, str) else dt_str
-        hoje = date.today()
-        s = d.strftime('%d/%m')
-        if d < hoje: return f"🚨 :red[**{s}**]"
-        elif d == hoje: return f"⚠️ :orange[**{s}**]"
-        return s
-    except: return "-"
-
 def get_meses_disponiveis(uid):
     # 1. Busca o histórico real do banco (backend)
     lista = rps.buscar_meses_com_movimento(uid)
@@ -107,7 +117,9 @@ def popup_receber(id_pagamento, valor_bruto, nome_aluno):
                 )
                 
                 st.toast(f"Recebimento de {nome_aluno} confirmado!")
-                time.sleep(1)
+                componentes.limpar_selecao("fin_receber")
+                componentes.descartar_antecipacoes()
+                componentes.pausa(1)
                 st.rerun()
                 
             except Exception as e:
@@ -126,13 +138,39 @@ def popup_estorno(id_item, tipo_item, descricao):
             rps.estornar_operacao(id_item, tipo_item)
             
             st.toast("Operação estornada com sucesso!")
-            time.sleep(0.5) # Pausa rápida para ler o toast
+            componentes.limpar_selecao("fin_fluxo")
+            componentes.descartar_antecipacoes()
+            componentes.pausa(0.5) # Pausa rápida para ler o toast
             st.rerun()
             
         except Exception as e:
             st.error(f"Erro ao estornar: {e}")
             
     if col_nao.button("Cancelar"):
+        componentes.limpar_selecao("fin_fluxo")
+        st.rerun()
+
+@st.dialog("Pagar Conta")
+def popup_pagar(id_despesa, descricao, valor):
+    st.write(f"**Conta:** {descricao}")
+    st.write(f"**Valor:** {format_brl(valor)}")
+    st.caption("A conta será marcada como paga com a data de hoje.")
+
+    col_sim, col_nao = st.columns(2)
+
+    if col_sim.button("✅ Confirmar Pagamento", type="primary"):
+        try:
+            rps.pagar_despesa(id_despesa)
+            st.toast("Conta paga com sucesso!")
+            componentes.limpar_selecao("fin_pagar")
+            componentes.descartar_antecipacoes()
+            componentes.pausa(0.5)
+            st.rerun()
+        except Exception as e:
+            st.error(f"Erro ao pagar: {e}")
+
+    if col_nao.button("Cancelar"):
+        componentes.limpar_selecao("fin_pagar")
         st.rerun()
 
 
@@ -140,119 +178,141 @@ def popup_estorno(id_item, tipo_item, descricao):
 # --- INTERFACE PRINCIPAL ---
 st.title("💰 Controle Financeiro")
 lista_meses = get_meses_disponiveis(unidade_atual)
-tab_in, tab_out, tab_fluxo = st.tabs(["🟢 Entradas (Receber)", "🔴 Saídas (Pagar)", "📊 Fluxo de Caixa"])
+
+# Só a aba visível consulta o banco (on_change="rerun" expõe .open em cada aba)
+tab_in, tab_out, tab_fluxo = st.tabs(["🟢 Entradas (Receber)", "🔴 Saídas (Pagar)", "📊 Fluxo de Caixa"],
+                                     key="fin_aba", on_change="rerun")
+
+ORDEM_ENTRADAS = {"Vencimento": "vencimento", "Aluno": "aluno", "Valor": "valor"}
+ORDEM_SAIDAS = {"Vencimento": "vencimento", "Categoria": "categoria", "Descrição": "descricao", "Valor": "valor"}
+ORDEM_FLUXO = {"Data": "data", "Tipo": "tipo", "Descrição": "descricao", "Valor": "valor"}
+
+# Consulta de cada aba a partir do estado dos seus filtros (a mesma usada para antecipar a aba)
+def consulta_entradas(unidade_atual, lista_meses):
+    ordem, desc = componentes.ordem_atual("fin_receber", ORDEM_ENTRADAS)
+    mes = st.session_state.get("fin_receber_mes", lista_meses[0])
+    return (rps.buscar_recebimentos_pendentes_pagina, unidade_atual, mes, ordem, desc,
+            componentes.TAMANHO_PAGINA, componentes.offset_grade("fin_receber"))
+
+def consulta_saidas(unidade_atual, lista_meses):
+    ordem, desc = componentes.ordem_atual("fin_pagar", ORDEM_SAIDAS)
+    mes = st.session_state.get("fin_pagar_mes", lista_meses[0])
+    return (rps.buscar_despesas_pendentes_pagina, unidade_atual, mes, ordem, desc,
+            componentes.TAMANHO_PAGINA, componentes.offset_grade("fin_pagar"))
+
+def consulta_fluxo(unidade_atual, lista_meses):
+    ordem, desc = componentes.ordem_atual("fin_fluxo", ORDEM_FLUXO, padrao_desc=True)
+    mes = st.session_state.get("fin_fluxo_mes", lista_meses[0])
+    return (rps.buscar_fluxo_caixa_pagina, unidade_atual, mes, ordem, desc,
+            componentes.TAMANHO_PAGINA, componentes.offset_grade("fin_fluxo"))
+
+# Cada aba é um fragmento: filtro, ordenação, paginação e seleção reexecutam só a própria aba
 
 # ABA ENTRADAS
-with tab_in:
+@componentes.fragmento("fin_entradas")
+def aba_entradas(unidade_atual, lista_meses):
     c1, c2 = st.columns([1,3])
-    filtro_in = c1.selectbox("Mês (Entradas)", ["Todos"]+lista_meses, index=1)
+    c1.selectbox("Mês (Entradas)", ["Todos"]+lista_meses, index=1, key="fin_receber_mes",
+                 on_change=componentes.reiniciar_grade, args=("fin_receber",))
+    with c2:
+        componentes.ordenacao_grade("fin_receber", ORDEM_ENTRADAS)
     
-    # 1. Busca Segura (Sem SQL na tela)
-    df = rps.buscar_recebimentos_pendentes(unidade_atual, filtro_in)
+    # 1. Busca Segura (Sem SQL na tela) - apenas a página visível
+    df, total = componentes.carregar(*consulta_entradas(unidade_atual, lista_meses))
     
-    if not df.empty:
-        d1,d2,d3,d4 = st.columns([1.5, 4, 1.5, 1.5])
-        d1.markdown("**Vencimento**")
-        d2.markdown("**Aluno**")
-        d3.markdown("**Valor**")
-        d4.markdown("**Ação**")
-        # st.markdown("**Vencimento | Aluno | Valor | Ação**")
-        for i, r in df.iterrows():
-            c1,c2,c3,c4 = st.columns([1.5, 4, 1.5, 1.5])
-            
-            # Formatação Visual
-            c1.markdown(get_visual_status(r['data_vencimento']))
-            
-            # Tratamento de nome de disciplina (lógica de apresentação)
-            disciplina = r['disciplina'] if r['disciplina'] else 'Taxa'
-            c2.text(f"{r['nome']} ({disciplina})")
-            
-            c3.text(format_brl(db.from_cents(r['valor_pago'])))
-            
-            # Botão de Ação chamando o Popup (que já arrumamos antes)
-            if c4.button("Receber", key=f"r_{r['id']}"): 
-                popup_receber(r['id'], r['valor_pago'], r['nome'])
-                
-            st.markdown("<hr style='margin:0; opacity:0.1'>", unsafe_allow_html=True)
+    if total:
+        st.caption("Selecione uma linha para registrar o recebimento.")
+        with componentes.fase("processamento"):
+            df.insert(1, 'situacao', g_svc.situacao_vencimento(df['data_vencimento']))
+            df['data_vencimento'] = pd.to_datetime(df['data_vencimento'])
+            df['valor'] = df['valor_pago'] / 100.0
+        
+        linha = componentes.grade_paginada(
+            "fin_receber", df[['id', 'situacao', 'data_vencimento', 'nome', 'disciplina', 'valor']], total,
+            column_config={
+                "id": None,
+                "situacao": st.column_config.TextColumn("", width="small"),
+                "data_vencimento": st.column_config.DateColumn("Vencimento", format="DD/MM/YYYY"),
+                "nome": "Aluno",
+                "disciplina": "Disciplina",
+                "valor": st.column_config.NumberColumn("Valor", format="R$ %.2f"),
+            }
+        )
+        # Seleção de linha abre o Popup de recebimento
+        if linha is not None:
+            popup_receber(int(linha['id']), float(linha['valor']), linha['nome'])
     else:
         st.info("Nada pendente para receber.")
 
 # ABA SAÍDAS
-with tab_out:
+@componentes.fragmento("fin_saidas")
+def aba_saidas(unidade_atual, lista_meses):
     c1, c2 = st.columns([1,3])
-    filtro_out = c1.selectbox("Mês (Saídas)", ["Todos"] + lista_meses, index=1)
+    c1.selectbox("Mês (Saídas)", ["Todos"] + lista_meses, index=1, key="fin_pagar_mes",
+                 on_change=componentes.reiniciar_grade, args=("fin_pagar",))
+    with c2:
+        componentes.ordenacao_grade("fin_pagar", ORDEM_SAIDAS)
     
-    # 1. Busca os dados usando a função nova
-    df = rps.buscar_despesas_pendentes(unidade_atual, filtro_out)
+    df, total = componentes.carregar(*consulta_saidas(unidade_atual, lista_meses))
     
-    if not df.empty:
-        st.markdown("**Vencimento | Descrição | Valor | Ação**")
+    if total:
+        st.caption("Selecione uma linha para pagar a conta.")
+        with componentes.fase("processamento"):
+            df.insert(1, 'situacao', g_svc.situacao_vencimento(df['data_vencimento']))
+            df['data_vencimento'] = pd.to_datetime(df['data_vencimento'])
+            df['valor'] = df['valor'] / 100.0
         
-        for i, r in df.iterrows():
-            c1, c2, c3, c4 = st.columns([1.5, 4, 1.5, 1.5])
-            
-            # Funções visuais (assumindo que já existem no seu código)
-            c1.markdown(get_visual_status(r['data_vencimento']))
-            c2.text(f"{r['nome_categoria']} - {r['descricao']}")
-            c3.text(format_brl(db.from_cents(r['valor'])))
-            
-            # 2. Lógica do Botão Segura
-            if c4.button("Pagar", key=f"p_{r['id']}"):
-                try:
-                    rps.pagar_despesa(r['id'])
-                    st.toast("Conta paga com sucesso!")
-                    time.sleep(0.5)
-                    st.rerun()
-                except Exception as e:
-                    st.error(f"Erro ao pagar: {e}")
-            
-            st.markdown("<hr style='margin:0; opacity:0.1'>", unsafe_allow_html=True)
+        linha = componentes.grade_paginada(
+            "fin_pagar", df[['id', 'situacao', 'data_vencimento', 'nome_categoria', 'descricao', 'valor']], total,
+            column_config={
+                "id": None,
+                "situacao": st.column_config.TextColumn("", width="small"),
+                "data_vencimento": st.column_config.DateColumn("Vencimento", format="DD/MM/YYYY"),
+                "nome_categoria": "Categoria",
+                "descricao": "Descrição",
+                "valor": st.column_config.NumberColumn("Valor", format="R$ %.2f"),
+            }
+        )
+        if linha is not None:
+            popup_pagar(int(linha['id']), f"{linha['nome_categoria']} - {linha['descricao']}", float(linha['valor']))
     else:
         st.info("Nada a pagar neste período.")
 
 # ABA FLUXO
-
-with tab_fluxo:
+@componentes.fragmento("fin_fluxo")
+def aba_fluxo(unidade_atual, lista_meses):
     c1, c2 = st.columns([1,3])
-    f_fluxo = c1.selectbox("Mês (Fluxo)", lista_meses, index=0)
+    c1.selectbox("Mês (Fluxo)", lista_meses, index=0, key="fin_fluxo_mes",
+                 on_change=componentes.reiniciar_grade, args=("fin_fluxo",))
+    with c2:
+        componentes.ordenacao_grade("fin_fluxo", ORDEM_FLUXO, padrao_desc=True)
     
-    # 1. Busca os dados prontos do Backend
-    geral = rps.buscar_fluxo_caixa(unidade_atual, f_fluxo)
+    # 1. Busca a página e os totais do mês prontos do Backend
+    geral, totais = componentes.carregar(*consulta_fluxo(unidade_atual, lista_meses))
     
-    if not geral.empty:
-        # Cabeçalho da Tabela
-        h1, h2, h3, h4, h5, h6 = st.columns([1.2, 1, 4, 1.5, 1.5, 1.2])
-        h1.markdown("**Data**"); h2.markdown("**Tipo**"); h3.markdown("**Descrição**")
-        h4.markdown("**Valor**"); h5.markdown("**Forma**"); h6.markdown("**Ação**")
-        st.divider()
+    if totais['linhas']:
+        st.caption("Selecione um lançamento para estorná-lo.")
+        geral['valor'] = geral['valor_pago'] / 100.0
+        
+        linha = componentes.grade_paginada(
+            "fin_fluxo", geral[['id', 'data_pagamento', 'Tipo', 'Descricao', 'valor', 'forma_pagamento']], totais['linhas'],
+            column_config={
+                "id": None,
+                "data_pagamento": st.column_config.DateColumn("Data", format="DD/MM"),
+                "Tipo": "Tipo",
+                "Descricao": "Descrição",
+                "valor": st.column_config.NumberColumn("Valor", format="R$ %.2f"),
+                "forma_pagamento": "Forma",
+            }
+        )
+        if linha is not None:
+            popup_estorno(int(linha['id']), linha['Tipo'], linha['Descricao'])
         
-        # Loop de Exibição
-        for i, row in geral.iterrows():
-            c1, c2, c3, c4, c5, c6 = st.columns([1.2, 1, 4, 1.5, 1.5, 1.2])
-            
-            # Formatação de data segura
-            data_fmt = row['data_pagamento'].strftime('%d/%m') if pd.notnull(row['data_pagamento']) else "-"
-            c1.text(data_fmt)
-            
-            # Badge colorido para Tipo
-            cor = 'green' if row['Tipo'] == 'Entrada' else 'red'
-            c2.markdown(f":{cor}[{row['Tipo']}]")
-            
-            c3.text(row['Descricao'])
-            c4.text(format_brl(db.from_cents(row['valor_pago'])))
-            c5.text(row['forma_pagamento'] if row['forma_pagamento'] else "-")
-            
-            # Botão de Estorno
-            if c6.button("↩️", key=f"est_{row['Tipo']}_{row['id']}", help="Estornar Lançamento"):
-                popup_estorno(row['id'], row['Tipo'], row['Descricao'])
-                
-            st.markdown("<hr style='margin: 0px 0px 10px 0px; opacity: 0.1'>", unsafe_allow_html=True)
-            
         st.divider()
         
-        # Cálculo de Totais (Otimizado com Pandas)
-        total_entradas = db.from_cents(geral[geral['Tipo'] == 'Entrada']['valor_pago'].sum())
-        total_saidas = db.from_cents(geral[geral['Tipo'] == 'Saída']['valor_pago'].sum())
+        # Totais do mês inteiro (não só da página)
+        total_entradas = db.from_cents(totais['entradas'])
+        total_saidas = db.from_cents(totais['saidas'])
         saldo = total_entradas - total_saidas
         
         k1, k2, k3 = st.columns(3)
@@ -260,5 +320,23 @@ with tab_fluxo:
         k2.metric("Total Saídas", format_brl(total_saidas))
         k3.metric("Saldo do Período", format_brl(saldo), delta_color="normal")
         
+        mes = st.session_state.get("fin_fluxo_mes", lista_meses[0])
+        componentes.botao_exportar("fin_fluxo", f"Fluxo_Caixa_{mes.replace('/', '-')}",
+                                   rps.exportacao_fluxo_caixa, unidade_atual, mes)
+        
     else:
         st.info("Sem movimentação financeira neste mês.")
+
+# Aba visível + antecipação da vizinha à direita (a próxima mais provável)
+ABAS = [
+    (tab_in, aba_entradas, consulta_saidas),
+    (tab_out, aba_saidas, consulta_fluxo),
+    (tab_fluxo, aba_fluxo, consulta_entradas),
+]
+for aba, desenhar, consulta_proxima in ABAS:
+    with aba:
+        if componentes.aba_aberta(aba):
+            componentes.antecipar(*consulta_proxima(unidade_atual, lista_meses))
+            desenhar(unidade_atual, lista_meses)
+
+componentes.concluir_pagina()
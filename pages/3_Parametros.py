@@ -1,13 +1,15 @@
 from repositories import parametros_rps as rps
 
 import streamlit as st
-import pandas as pd
 import database as db
 import auth
+import componentes
 from datetime import datetime
-import time
+from services import dependencias_svc as dep
+pd = dep.preguicoso("pandas")
 
 st.set_page_config(page_title="Configurações", layout="wide", page_icon="⚙️")
+componentes.medir_pagina("Configurações")
 if not auth.validar_sessao(): auth.tela_login(); st.stop()
 auth.barra_lateral()
 
@@ -53,7 +55,7 @@ with tab1:
                 )
                 
                 st.success("Parâmetros salvos com sucesso!")
-                time.sleep(1)
+                componentes.pausa(1)
                 st.rerun()
                 
             except Exception as e:
@@ -82,7 +84,7 @@ with tab2:
                 try:
                     rps.excluir_royalty(row['id'])
                     st.success("Regra removida.")
-                    time.sleep(0.5)
+                    componentes.pausa(0.5)
                     st.rerun()
                 except Exception as e:
                     st.error(f"Erro ao excluir: {e}")
@@ -106,7 +108,7 @@ with tab2:
                     # Chama função segura do backend
                     rps.adicionar_royalty(unidade_atual, r_val, r_ini)
                     st.success("Regra adicionada com sucesso!")
-                    time.sleep(1)
+                    componentes.pausa(1)
                     st.rerun()
                 except Exception as e:
                     st.error(f"Erro ao salvar: {e}")
@@ -141,7 +143,7 @@ with tab3:
             try:
                 rps.excluir_modelo_contrato(unidade_atual)
                 st.success("Modelo removido.")
-                time.sleep(0.5)
+                componentes.pausa(0.5)
                 st.rerun()
             except Exception as e:
                 st.error(f"Erro ao remover: {e}")
@@ -166,8 +168,10 @@ with tab3:
             )
             
             st.success("Modelo salvo com sucesso!")
-            time.sleep(1)
+            componentes.pausa(1)
             st.rerun()
             
         except Exception as e:
-            st.error(f"Erro ao salvar arquivo: {e}")
\ No newline at end of file
+            st.error(f"Erro ao salvar arquivo: {e}")
+
+componentes.concluir_pagina()
@@ -1,14 +1,16 @@
 from repositories import despesas_rps as rps
 
 import streamlit as st
-import pandas as pd
 import database as db
 import auth
+import componentes
 from datetime import datetime, date
 import calendar
-import time
+from services import dependencias_svc as dep
+pd = dep.preguicoso("pandas")
 
 st.set_page_config(page_title="Gestão de Despesas", layout="wide", page_icon="💸")
+componentes.medir_pagina("Gestão de Despesas")
 if not auth.validar_sessao(): auth.tela_login(); st.stop()
 auth.barra_lateral()
 
@@ -110,7 +112,7 @@ with tab1:
                             )
                             st.success("Despesa Avulsa lançada no Financeiro.")
                         
-                        time.sleep(1)
+                        componentes.pausa(1)
                         st.rerun()
                         
                     except Exception as e:
@@ -123,10 +125,13 @@ with tab2:
     st.subheader("Gerenciar Contas Fixas")
     
     # Lista apenas as ATIVAS por padrão
-    filtro_ativo = st.checkbox("Mostrar apenas regras ativas?", value=True)
+    filtro_ativo = st.checkbox("Mostrar apenas regras ativas?", value=True,
+                               on_change=componentes.reiniciar_grade, args=("recorrencias",))
     
-    # 1. Busca Lista (Backend)
-    df = rps.buscar_recorrencias(unidade_atual, filtro_ativo)
+    # 1. Busca Lista (Backend): só a página atual (paginação por cursor)
+    df, proximo = rps.buscar_recorrencias(unidade_atual, filtro_ativo,
+                                          componentes.cursor_grade("recorrencias"), componentes.TAMANHO_PAGINA)
+    componentes.voltar_se_vazia("recorrencias", df)
     
     if not df.empty:
         col_list, col_edit = st.columns([1, 2])
@@ -148,6 +153,7 @@ with tab2:
                 format_func=fmt_radio,
                 label_visibility="collapsed"
             )
+            componentes.paginador_cursor("recorrencias", proximo)
 
         with col_edit:
             if rec_id_sel:
@@ -200,7 +206,7 @@ with tab2:
                                     unidade_id=unidade_atual
                                 )
                                 st.success("Regra atualizada e contas pendentes ajustadas!")
-                                time.sleep(1)
+                                componentes.pausa(1)
                                 st.rerun()
                             except Exception as e:
                                 st.error(f"Erro ao atualizar: {e}")
@@ -213,11 +219,13 @@ with tab2:
                             try:
                                 rps.encerrar_recorrencia(rec_id_sel)
                                 st.success("Recorrência encerrada.")
-                                time.sleep(0.5)
+                                componentes.pausa(0.5)
                                 st.rerun()
                             except Exception as e:
                                 st.error(f"Erro: {e}")
                     else:
                         st.info("Esta despesa já está inativa.")
     else:
-        st.info("Nenhuma despesa recorrente encontrada.")
\ No newline at end of file
+        st.info("Nenhuma despesa recorrente encontrada.")
+
+componentes.concluir_pagina()
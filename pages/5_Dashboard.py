@@ -1,26 +1,18 @@
-import sys
-import os
-
-# 1. Pega o caminho absoluto de onde o arquivo '1_Aluno.py' está
-diretorio_atual = os.path.dirname(os.path.abspath(__file__))
-
-# 2. Sobe um nível para chegar na raiz do projeto (o pai do diretorio_atual)
-diretorio_raiz = os.path.dirname(diretorio_atual)
-
-# 3. Adiciona a raiz à lista de lugares onde o Python procura arquivos
-sys.path.append(diretorio_raiz)
-
 from repositories import dashboard_rps as rps
+from services import projecao_svc as proj_svc
+from services import coortes_svc
 
 import streamlit as st
-import pandas as pd
-import database as db
 import auth
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime
+import componentes
+from datetime import date, datetime
+from services import dependencias_svc as dep
+pd = dep.preguicoso("pandas")
+px = dep.preguicoso("plotly.express")
+go = dep.preguicoso("plotly.graph_objects")
 
 st.set_page_config(page_title="Dashboard Estratégico", layout="wide", page_icon="📈")
+componentes.medir_pagina("Dashboard Estratégico")
 if not auth.validar_sessao(): auth.tela_login(); st.stop()
 auth.barra_lateral()
 
@@ -38,53 +30,33 @@ def format_brl(val): return f"R$ {val:,.2f}".replace(",", "X").replace(".", ",")
 anos_disponiveis = [str(datetime.now().year), str(datetime.now().year - 1)]
 ano_sel = st.selectbox("Selecione o Ano de Análise:", anos_disponiveis)
 
-# --- CARREGAMENTO DE DADOS FINANCEIROS ---
-
-# A. Dados Financeiros por Mês (Para Gráficos)
-df_fin = rps.buscar_dados_financeiros_anuais(unidade_atual, ano_sel)
-
-# (O restante do código que usa df_fin para criar o gráfico continua igual...)
-
-# B. Dados de Categoria (Backend)
-df_cat = rps.buscar_despesas_por_categoria(unidade_atual, ano_sel)
+# --- CARREGAMENTO DE DADOS (UMA CHAMADA AO BACKEND) ---
+# Todos os indicadores do ano vêm de uma única conexão com consultas agregadas combinadas
+kpis = rps.buscar_kpis_dashboard(unidade_atual, ano_sel)
 
-# C. Dados de Matrículas (Backend)
-df_mat = rps.buscar_distribuicao_matriculas(unidade_atual)
-# O cálculo de soma continua sendo feito com o DataFrame retornado
-total_alunos_ativos = df_mat['qtd'].sum() if not df_mat.empty else 0
+# Cópias: os gráficos abaixo transformam as colunas em Reais
+df_fin = kpis.financeiro_mensal.copy()
+df_cat = kpis.despesas_categoria.copy()
+df_mat = kpis.distribuicao_matriculas.copy()
 
-# D. Inadimplência (Backend)
-df_inad = rps.buscar_indicadores_inadimplencia(unidade_atual, ano_sel)
+# Matrículas ativas (DISCIPLINAS) e alunos únicos (PESSOAS)
+total_alunos_ativos = kpis.total_matriculas
+total_matriculas_ativas = kpis.total_matriculas
+total_alunos_unicos = kpis.alunos_unicos
 
-# ... (O restante do código que gera os gráficos continua igual) ...
+# Custo RH (Pessoal + Impostos) e Equipe
+custo_pessoal_ano = kpis.custo_rh
+qtd_funcionarios = kpis.funcionarios_ativos
 
-
-# E. Dados de RH (Pessoal)
-# Custo Total com Pessoal no Ano (Categoria 'Pessoal' + Custos associados na tabela despesas)
-# Nota: Assumimos que o Robô de RH lança na categoria 'Pessoal' ou 'Impostos' mas com descrição clara. 
-# Para simplificar e ser robusto, vamos somar a categoria 'Pessoal' que é onde lançamos salários e benefícios.
-# 1. Custo RH (Pessoal + Impostos) - Backend
-custo_pessoal_ano = rps.buscar_custo_rh_anual(unidade_atual, ano_sel)
-
-# 2. Contagem de Funcionários - Backend
-qtd_funcionarios = rps.contar_funcionarios_ativos(unidade_atual)
-
-# 3. Meses Faturados (Para Ticket Médio) - Backend
-meses_faturados = rps.contar_meses_com_faturamento(unidade_atual, ano_sel)
+# Meses Faturados (Para Ticket Médio)
+meses_faturados = kpis.meses_faturados
 # Proteção contra divisão por zero (Lógica de Interface)
 if meses_faturados == 0: 
     meses_faturados = 1
 
 # --- CÁLCULO DE KPIS GERAIS ---
-
-# 1. Busca contagem de alunos únicos (PESSOAS)
-total_alunos_unicos = rps.contar_alunos_unicos_ativos(unidade_atual)
-
-# 2. Busca total de matrículas (DISCIPLINAS)
-total_matriculas_ativas = df_mat['qtd'].sum() if not df_mat.empty else 0
-
-receita_ano = db.from_cents(df_fin[df_fin['tipo']=='Receita']['total'].sum())
-despesa_ano = db.from_cents(df_fin[df_fin['tipo']=='Despesa']['total'].sum())
+receita_ano = kpis.receita_ano
+despesa_ano = kpis.despesa_ano
 lucro_ano = receita_ano - despesa_ano
 
 # TICKET MÉDIO CORRIGIDO
@@ -99,9 +71,7 @@ ticket_por_aluno = media_faturamento_mensal / total_alunos_unicos if total_aluno
 ticket_por_materia = media_faturamento_mensal / total_matriculas_ativas if total_matriculas_ativas > 0 else 0
 
 # INADIMPLÊNCIA
-taxa_inad = 0
-if not df_inad.empty and df_inad['valor_total'].iloc[0] and df_inad['valor_total'].iloc[0] > 0:
-    taxa_inad = (df_inad['valor_atrasado'].iloc[0] / df_inad['valor_total'].iloc[0]) * 100
+taxa_inad = kpis.taxa_inadimplencia
 
 # --- CÁLCULO DE KPIS DE RH (Inteligência de Equipe) ---
 # 1. Capacidade: Alunos por Funcionário
@@ -258,4 +228,121 @@ with col_g2:
         st.plotly_chart(fig_donut, use_container_width=True)
         
     else:
-        st.info("Sem matrículas ativas.")
\ No newline at end of file
+        st.info("Sem matrículas ativas.")
+
+st.markdown("---")
+
+# ==============================================================================
+# VISUALIZAÇÃO - SEÇÃO 4: PROJEÇÃO DE FLUXO DE CAIXA
+# ==============================================================================
+@componentes.na_fase("processamento")
+@st.cache_data(show_spinner=False, max_entries=64)
+def carregar_projecao(unidade_id, versao, meses, mes_atual):
+    # 'versao' e 'mes_atual' só entram na chave do cache: mudam quando as fontes da unidade mudam
+    # e na virada do mês (a projeção começa no mês seguinte ao atual)
+    return proj_svc.projetar_fluxo_caixa(rps.buscar_bases_projecao(unidade_id), meses)
+
+st.markdown("### 🔮 Projeção de Fluxo de Caixa")
+st.caption("Simulação a partir das matrículas ativas (com bolsas), despesas fixas, folha e royalties. Nada é gravado no banco.")
+
+horizonte = st.radio("Horizonte:", [12, 18, 24], format_func=lambda x: f"{x} meses", horizontal=True)
+
+df_proj = carregar_projecao(unidade_atual, kpis.versao_projecao, horizonte, date.today().replace(day=1))
+
+p1, p2, p3 = st.columns(3)
+p1.metric("Entradas Previstas", format_brl(df_proj['entradas'].sum()))
+p2.metric("Saídas Previstas", format_brl(df_proj['saidas'].sum()))
+saldo_final = df_proj['saldo_acumulado'].iloc[-1]
+p3.metric("Saldo Acumulado", format_brl(saldo_final), delta_color="normal" if saldo_final >= 0 else "inverse")
+
+fig_proj = go.Figure()
+fig_proj.add_bar(x=df_proj['mes_referencia'], y=df_proj['entradas'], name="Entradas", marker_color="#28a745")
+fig_proj.add_bar(x=df_proj['mes_referencia'], y=-df_proj['saidas'], name="Saídas", marker_color="#dc3545")
+fig_proj.add_scatter(x=df_proj['mes_referencia'], y=df_proj['saldo_acumulado'], name="Saldo Acumulado", mode="lines+markers")
+fig_proj.update_layout(barmode="relative", yaxis_title="Valor (R$)", xaxis_title="Mês")
+st.plotly_chart(fig_proj, use_container_width=True)
+
+with st.expander("Detalhamento mensal"):
+    st.dataframe(
+        df_proj,
+        column_config={
+            "mes_referencia": "Mês",
+            "mensalidades": st.column_config.NumberColumn("Mensalidades", format="R$ %.2f"),
+            "despesas_fixas": st.column_config.NumberColumn("Despesas Fixas", format="R$ %.2f"),
+            "pessoal": st.column_config.NumberColumn("Pessoal", format="R$ %.2f"),
+            "royalties": st.column_config.NumberColumn("Royalties", format="R$ %.2f"),
+            "entradas": st.column_config.NumberColumn("Entradas", format="R$ %.2f"),
+            "saidas": st.column_config.NumberColumn("Saídas", format="R$ %.2f"),
+            "saldo": st.column_config.NumberColumn("Saldo", format="R$ %.2f"),
+            "saldo_acumulado": st.column_config.NumberColumn("Acumulado", format="R$ %.2f"),
+        },
+        hide_index=True,
+        use_container_width=True
+    )
+
+st.markdown("---")
+
+# ==============================================================================
+# VISUALIZAÇÃO - SEÇÃO 5: RETENÇÃO E CHURN (COORTES)
+# ==============================================================================
+@componentes.na_fase("processamento")
+@st.cache_data(show_spinner=False, max_entries=64)
+def carregar_coortes(unidade_id, versao, dimensao):
+    # 'versao' muda apenas quando as matrículas da unidade mudam
+    return coortes_svc.analisar_coortes(rps.buscar_historico_matriculas(unidade_id), por=dimensao)
+
+st.markdown("### 🔁 Retenção de Alunos")
+st.caption("Coortes por mês de início da matrícula, com todo o histórico da unidade. Matrículas ativas contam como em andamento.")
+
+dimensao = st.radio("Comparar por:", list(coortes_svc.DIMENSOES.keys()), format_func=coortes_svc.DIMENSOES.get, horizontal=True)
+coortes = carregar_coortes(unidade_atual, kpis.versao_matriculas, dimensao)
+df_resumo = coortes['resumo']
+
+if df_resumo.empty:
+    st.info("Sem histórico de matrículas para analisar.")
+else:
+    geral = df_resumo[df_resumo['grupo'] == 'Geral'].iloc[0]
+    r1, r2, r3, r4 = st.columns(4)
+    r1.metric("Churn Mensal", f"{geral['churn_mensal']:.1f}%", help="Cancelamentos divididos pelos meses-matrícula expostos.")
+    r2.metric("Permanência Média", f"{geral['vida_media']:.1f} meses", help=f"Estimada por 1 / churn (limite de {coortes_svc.LIMITE_VIDA_MESES} meses).")
+    r3.metric("LTV Médio", format_brl(geral['ltv']), help="Mensalidade média x permanência média.")
+    r4.metric("Matrículas Analisadas", int(geral['matriculas']), help=f"{int(geral['encerradas'])} encerradas")
+
+    col_r1, col_r2 = st.columns(2)
+    with col_r1:
+        st.subheader("📉 Curva de Sobrevivência")
+        fig_surv = px.line(
+            coortes['curvas'], x='mes', y='sobrevivencia', color='grupo',
+            labels={'mes': 'Meses desde o início', 'sobrevivencia': '% ainda matriculado', 'grupo': coortes_svc.DIMENSOES[dimensao]}
+        )
+        fig_surv.update_traces(selector=dict(name='Geral'), line=dict(width=4, dash='dash', color='black'))
+        fig_surv.update_layout(yaxis_range=[0, 100])
+        st.plotly_chart(fig_surv, use_container_width=True)
+
+    with col_r2:
+        st.subheader("🧊 Matriz de Coortes")
+        matriz = coortes['matriz'].tail(18)
+        fig_heat = px.imshow(
+            matriz.drop(columns='tamanho'), text_auto='.0f', aspect='auto',
+            color_continuous_scale='Blues', zmin=0, zmax=100,
+            labels={'x': 'Mês de vida', 'y': 'Coorte', 'color': '% retido'}
+        )
+        st.plotly_chart(fig_heat, use_container_width=True)
+
+    st.dataframe(
+        df_resumo,
+        column_config={
+            "grupo": coortes_svc.DIMENSOES[dimensao],
+            "matriculas": "Matrículas",
+            "ativas": "Ativas",
+            "encerradas": "Encerradas",
+            "churn_mensal": st.column_config.NumberColumn("Churn Mensal", format="%.1f%%"),
+            "vida_media": st.column_config.NumberColumn("Permanência (meses)", format="%.1f"),
+            "ticket_medio": st.column_config.NumberColumn("Mensalidade Média", format="R$ %.2f"),
+            "ltv": st.column_config.NumberColumn("LTV", format="R$ %.2f"),
+        },
+        hide_index=True,
+        use_container_width=True
+    )
+
+componentes.concluir_pagina()
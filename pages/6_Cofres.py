@@ -1,13 +1,15 @@
 from repositories import cofres_rps as rps
 
 import streamlit as st
-import pandas as pd
 import database as db
 import auth
+import componentes
 from datetime import datetime, date
-import time
+from services import dependencias_svc as dep
+pd = dep.preguicoso("pandas")
 
 st.set_page_config(page_title="Cofres Inteligentes", layout="wide", page_icon="🏦")
+componentes.medir_pagina("Cofres Inteligentes")
 if not auth.validar_sessao(): auth.tela_login(); st.stop()
 auth.barra_lateral()
 
@@ -65,7 +67,8 @@ def popup_distribuir(lucro_disponivel, df_cofres):
                 rps.realizar_distribuicao_lucro(st.session_state['unidade_ativa'], input_vals)
                 
                 st.success("Lucro guardado nos cofres com sucesso!")
-                time.sleep(1)
+                componentes.descartar_antecipacoes()
+                componentes.pausa(1)
                 st.rerun()
                 
             except Exception as e:
@@ -93,136 +96,151 @@ def popup_saque(cofre_id, nome_cofre, saldo_atual):
                     rps.realizar_saque_cofre(unidade_atual, cofre_id, valor, motivo)
                     
                     st.success("Saque registrado com sucesso!")
-                    time.sleep(1)
+                    componentes.descartar_antecipacoes()
+                    componentes.pausa(1)
                     st.rerun()
                 except Exception as e:
                     st.error(f"Erro ao realizar saque: {e}")
 
 # --- LÓGICA PRINCIPAL (Separada) ---
 
-# 1. Busca Dados dos Cofres (Backend)
-df_cofres = rps.buscar_cofres_com_saldo(unidade_atual)
-
-# 2. Calcula Lucro do Mês Anterior (Lógica de Data + Backend)
+# Mês anterior (referência do lucro a distribuir)
 hj = datetime.now()
 # Pega o primeiro dia deste mês e volta um dia para cair no mês anterior
 mes_ant_date = (hj.replace(day=1) - pd.DateOffset(days=1))
 mes_ant_str = mes_ant_date.strftime("%m/%Y")
 
-# Chama a "Fórmula Oficial" do lucro
-lucro_sugerido = rps.calcular_lucro_realizado(unidade_atual, mes_ant_str)
-
-tab1, tab2, tab3 = st.tabs(["📊 Dashboard & Distribuição", "⚙️ Configurar Regras", "📜 Extrato"])
+# Só a aba visível consulta o banco; a próxima provável é antecipada em segundo plano
+tab1, tab2, tab3 = st.tabs(["📊 Dashboard & Distribuição", "⚙️ Configurar Regras", "📜 Extrato"],
+                           key="cofres_aba", on_change="rerun")
 
 # ==============================================================================
 # TAB 1: DASHBOARD
 # ==============================================================================
 with tab1:
-    # A. PAINEL DE SALDOS
-    st.subheader("Saldos Acumulados")
-    cols = st.columns(len(df_cofres)) if not df_cofres.empty else [st.container()]
+    if componentes.aba_aberta(tab1):
+        componentes.antecipar(rps.buscar_historico_movimentacoes_cofres, unidade_atual,
+                              componentes.cursor_grade("cofres_extrato"), componentes.TAMANHO_PAGINA)
+
+        # 1. Busca Dados dos Cofres (Backend)
+        df_cofres = componentes.carregar(rps.buscar_cofres_com_saldo, unidade_atual)
+
+        # 2. Chama a "Fórmula Oficial" do lucro do mês anterior
+        lucro_sugerido = componentes.carregar(rps.calcular_lucro_realizado, unidade_atual, mes_ant_str)
+
+        # A. PAINEL DE SALDOS
+        st.subheader("Saldos Acumulados")
+        cols = st.columns(len(df_cofres)) if not df_cofres.empty else [st.container()]
     
-    total_guardado = 0
-    for i, row in df_cofres.iterrows():
-        total_guardado += row['saldo_atual']
-        with cols[i % 4]: # Quebra linha a cada 4
-            st.metric(label=row['nome'], value=format_brl(row['saldo_atual']))
-            if st.button("Sacar", key=f"btn_saque_{row['id']}"):
-                popup_saque(row['id'], row['nome'], row['saldo_atual'])
+        total_guardado = 0
+        for i, row in df_cofres.iterrows():
+            total_guardado += row['saldo_atual']
+            with cols[i % 4]: # Quebra linha a cada 4
+                st.metric(label=row['nome'], value=format_brl(row['saldo_atual']))
+                if st.button("Sacar", key=f"btn_saque_{row['id']}"):
+                    popup_saque(row['id'], row['nome'], row['saldo_atual'])
     
-    st.divider()
+        st.divider()
     
-    # B. SIMULADOR E DISTRIBUIÇÃO
-    st.markdown("### 💸 Distribuir Lucros")
+        # B. SIMULADOR E DISTRIBUIÇÃO
+        st.markdown("### 💸 Distribuir Lucros")
     
-    c_sim1, c_sim2 = st.columns([2, 1])
-    with c_sim1:
-        # Usamos 'lucro_sugerido', que já calculamos logo acima usando a função do banco
-        st.info(f"Lucro Realizado do mês passado ({mes_ant_str}): **{format_brl(lucro_sugerido)}**")
-        val_dist = st.number_input("Quanto deseja distribuir agora?", value=float(lucro_sugerido), min_value=0.0, step=100.0)
+        c_sim1, c_sim2 = st.columns([2, 1])
+        with c_sim1:
+            # Usamos 'lucro_sugerido', que já calculamos logo acima usando a função do banco
+            st.info(f"Lucro Realizado do mês passado ({mes_ant_str}): **{format_brl(lucro_sugerido)}**")
+            val_dist = st.number_input("Quanto deseja distribuir agora?", value=float(lucro_sugerido), min_value=0.0, step=100.0)
     
-    with c_sim2:
-        st.write("##") # Spacer
-        if st.button("🚀 Distribuir nos Cofres", type="primary"):
-            if val_dist > 0:
-                popup_distribuir(val_dist, df_cofres)
-            else:
-                st.warning("Informe um valor maior que zero.")
+        with c_sim2:
+            st.write("##") # Spacer
+            if st.button("🚀 Distribuir nos Cofres", type="primary"):
+                if val_dist > 0:
+                    popup_distribuir(val_dist, df_cofres)
+                else:
+                    st.warning("Informe um valor maior que zero.")
 
 # ==============================================================================
 # TAB 2: CONFIGURAÇÃO
 # ==============================================================================
 with tab2:
-    st.subheader("Definir Regras de Porcentagem")
-    st.caption("A soma das porcentagens deve ser idealmente 100%.")
+    if componentes.aba_aberta(tab2):
+        componentes.antecipar(rps.calcular_lucro_realizado, unidade_atual, mes_ant_str)
+        df_cofres = componentes.carregar(rps.buscar_cofres_com_saldo, unidade_atual)
+
+        st.subheader("Definir Regras de Porcentagem")
+        st.caption("A soma das porcentagens deve ser idealmente 100%.")
     
-    with st.form("config_cofres"):
-        # Dicionário para guardar os inputs do usuário
-        novos_percs = {}
-        total_perc = 0.0
+        with st.form("config_cofres"):
+            # Dicionário para guardar os inputs do usuário
+            novos_percs = {}
+            total_perc = 0.0
         
-        # Itera sobre os dados carregados anteriormente (df_cofres)
-        if not df_cofres.empty:
-            for index, row in df_cofres.iterrows():
-                c1, c2 = st.columns([3, 1])
-                c1.markdown(f"**{row['nome']}**")
-                c1.caption(row['descricao'])
+            # Itera sobre os dados carregados anteriormente (df_cofres)
+            if not df_cofres.empty:
+                for index, row in df_cofres.iterrows():
+                    c1, c2 = st.columns([3, 1])
+                    c1.markdown(f"**{row['nome']}**")
+                    c1.caption(row['descricao'])
                 
-                val = c2.number_input(
-                    f"% Alocação", 
-                    value=float(row['percentual_padrao']), 
-                    min_value=0.0, 
-                    max_value=100.0, 
-                    step=1.0, 
-                    key=f"cfg_{row['id']}"
-                )
+                    val = c2.number_input(
+                        f"% Alocação", 
+                        value=float(row['percentual_padrao']), 
+                        min_value=0.0, 
+                        max_value=100.0, 
+                        step=1.0, 
+                        key=f"cfg_{row['id']}"
+                    )
                 
-                novos_percs[row['id']] = val
-                total_perc += val
-                st.markdown("---")
+                    novos_percs[row['id']] = val
+                    total_perc += val
+                    st.markdown("---")
         
-        # Feedback Visual do Total
-        cor_total = "green" if total_perc == 100 else "orange"
-        st.markdown(f"**Total Configurado:** :{cor_total}[{total_perc:.1f}%]")
+            # Feedback Visual do Total
+            cor_total = "green" if total_perc == 100 else "orange"
+            st.markdown(f"**Total Configurado:** :{cor_total}[{total_perc:.1f}%]")
         
-        if total_perc != 100:
-            st.warning("⚠️ A soma não é 100%. Verifique se é intencional.")
+            if total_perc != 100:
+                st.warning("⚠️ A soma não é 100%. Verifique se é intencional.")
             
-        if st.form_submit_button("💾 Salvar Novas Regras"):
-            try:
-                # Chama a função segura do backend
-                rps.atualizar_percentuais_cofres(novos_percs)
+            if st.form_submit_button("💾 Salvar Novas Regras"):
+                try:
+                    # Chama a função segura do backend
+                    rps.atualizar_percentuais_cofres(novos_percs)
                 
-                st.success("Regras atualizadas com sucesso!")
-                time.sleep(1)
-                st.rerun()
+                    st.success("Regras atualizadas com sucesso!")
+                    componentes.descartar_antecipacoes()
+                    componentes.pausa(1)
+                    st.rerun()
                 
-            except Exception as e:
-                st.error(f"Erro ao salvar: {e}")
+                except Exception as e:
+                    st.error(f"Erro ao salvar: {e}")
 
 # ==============================================================================
 # TAB 3: EXTRATO
 # ==============================================================================
 with tab3:
-    st.subheader("Histórico de Movimentações")
+    if componentes.aba_aberta(tab3):
+        componentes.antecipar(rps.buscar_cofres_com_saldo, unidade_atual)
+        componentes.antecipar(rps.calcular_lucro_realizado, unidade_atual, mes_ant_str)
+
+        st.subheader("Histórico de Movimentações")
     
-    # 1. Busca Segura (Backend)
-    hist = rps.buscar_historico_movimentacoes_cofres(unidade_atual)
+        # 1. Busca Segura (Backend): só a página atual do extrato (paginação por cursor)
+        hist, proximo = componentes.carregar(rps.buscar_historico_movimentacoes_cofres, unidade_atual,
+                                             componentes.cursor_grade("cofres_extrato"), componentes.TAMANHO_PAGINA)
     
-    if not hist.empty:
-        # 2. Formatação Visual (Frontend)
-        # Trabalhamos numa cópia para não afetar os dados brutos caso precise usar depois
-        hist_visual = hist.copy()
+        if not hist.empty:
+            # 2. Formatação Visual (Frontend), apenas sobre as linhas da página
+            hist_visual = hist.drop(columns=['id'])
         
-        hist_visual['valor'] = hist_visual['valor'].apply(format_brl)
+            hist_visual['valor'] = hist_visual['valor'].apply(format_brl)
+            # Indicador de cor no próprio texto (Verde/Vermelho), sem Styler
+            hist_visual['tipo'] = hist_visual['tipo'].map(lambda x: f"{'🟢' if x == 'ENTRADA' else '🔴'} {x}")
         
-        # Estilização condicional (Verde/Vermelho)
-        st.dataframe(
-            hist_visual.style.map(
-                lambda x: f'color: {"green" if x=="ENTRADA" else "red"}', 
-                subset=['tipo']
-            ), 
-            width='stretch'
-        )
-    else:
-        st.info("Nenhuma movimentação registrada ainda.")
\ No newline at end of file
+            componentes.grade_cursor("cofres_extrato", hist_visual, proximo)
+            componentes.botao_exportar("cofres_extrato", "Extrato_Cofres",
+                                       rps.exportacao_historico_movimentacoes_cofres, unidade_atual)
+        else:
+            st.info("Nenhuma movimentação registrada ainda.")
+
+componentes.concluir_pagina()
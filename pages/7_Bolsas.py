@@ -2,12 +2,15 @@ from repositories import bolsas_rps as rps
 from services import geral_svc as g_svc
 
 import streamlit as st
-import pandas as pd
 import database as db
 import auth
+import componentes
+from services import dependencias_svc as dep
+pd = dep.preguicoso("pandas")
 
 # Configuração da Página
 st.set_page_config(page_title="Gestão de Bolsas", layout="wide", page_icon="🎓")
+componentes.medir_pagina("Gestão de Bolsas")
 if not auth.validar_sessao(): auth.tela_login(); st.stop()
 auth.barra_lateral()
 
@@ -76,4 +79,6 @@ else:
     1. Vá em **Gerenciar Alunos**.
     2. Selecione o aluno e localize a disciplina.
     3. Clique no botão **🎓 Conceder Bolsa**.
-    """)
\ No newline at end of file
+    """)
+
+componentes.concluir_pagina()
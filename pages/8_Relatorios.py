@@ -1,22 +1,25 @@
 from repositories import relatorios_rps as rps
-from services import geral_svc as g_svc
 
 import streamlit as st
-import pandas as pd
 import database as db
 import auth
+import componentes
 from datetime import datetime, date
 import calendar
 import io
+import functools
+from services import artefatos_svc as artefatos
+from services import lote_relatorios_svc as lote
+from services import dependencias_svc as dep
+pd = dep.preguicoso("pandas")
 
-# Tenta importar FPDF para PDF
-try:
-    from fpdf import FPDF
-    HAS_FPDF = True
-except ImportError:
-    HAS_FPDF = False
+# PDF (fpdf) só é importado ao gerar o arquivo; aqui apenas verificamos se está instalado
+HAS_FPDF = dep.disponivel("fpdf")
+HAS_XLSX = dep.disponivel("xlsxwriter")
+pdf_svc = dep.preguicoso("services.relatorios_pdf_svc")
 
 st.set_page_config(page_title="Relatórios", layout="wide", page_icon="📈")
+componentes.medir_pagina("Relatórios")
 if not auth.validar_sessao(): auth.tela_login(); st.stop()
 auth.barra_lateral()
 
@@ -29,88 +32,6 @@ st.title(f"📈 Relatórios - {nome_unidade}")
 if not HAS_FPDF:
     st.warning("⚠️ Biblioteca 'fpdf2' não encontrada. Instale com: `pip install fpdf2`")
 
-# ==============================================================================
-# 1. CLASSES DE RELATÓRIO PDF
-# ==============================================================================
-class PDFReportR2(FPDF):
-    def header(self):
-        self.set_font('Arial', 'B', 12)
-        # Usa safe_text no título também
-        titulo = g_svc.safe_text(f'R2 - Controle de Alunos - {st.session_state.get("unidade_nome")}')
-        self.cell(0, 10, titulo, 0, 1, 'C')
-        self.ln(5)
-        self.set_font('Arial', 'B', 9)
-        self.set_fill_color(220, 220, 220)
-        self.cell(75, 8, 'Aluno', 1, 0, 'L', 1)
-        self.cell(30, 8, 'Disciplina', 1, 0, 'L', 1)
-        self.cell(25, 8, g_svc.safe_text('Estágio'), 1, 0, 'C', 1) # Acento
-        self.cell(25, 8, g_svc.safe_text('Lição'), 1, 0, 'C', 1)  # Acento
-        self.cell(35, 8, 'Blocos', 1, 1, 'C', 1)
-
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        self.cell(0, 10, f'Pág {self.page_no()}/{{nb}}', 0, 0, 'C')
-
-def gerar_pdf_r2(df):
-    pdf = PDFReportR2(orientation='P', format='A4')
-    pdf.alias_nb_pages()
-    pdf.add_page()
-    pdf.set_font('Arial', '', 9)
-    h_line = 8
-    for index, row in df.iterrows():
-        nome_raw = str(row['Aluno'])
-        nome = nome_raw[:35] + '...' if len(nome_raw) > 35 else nome_raw
-        
-        # APLICA A PROTEÇÃO AQUI
-        pdf.cell(75, h_line, g_svc.safe_text(nome), 1, 0, 'L')
-        pdf.cell(30, h_line, g_svc.safe_text(row['Disciplina']), 1, 0, 'L')
-        
-        pdf.cell(25, h_line, '', 1, 0, 'C')
-        pdf.cell(25, h_line, '', 1, 0, 'C')
-        pdf.cell(35, h_line, '', 1, 1, 'C')
-    return bytes(pdf.output(dest='S'))
-
-class PDFReportTeste(FPDF):
-    def header(self):
-        self.set_font('Arial', 'B', 12)
-        self.cell(0, 10, f'Registro de Testes - {st.session_state.get("unidade_nome")}', 0, 1, 'C')
-        self.ln(5)
-        self.set_font('Arial', 'B', 8)
-        self.set_fill_color(220, 220, 220)
-        w_col = 16
-        colunas_repetidas = ['Data', 'Teste', 'Tempo', 'Nota', 'Grupo', 'Passou']
-        self.cell(65, 8, 'Aluno', 1, 0, 'L', 1)
-        self.cell(20, 8, 'Disc.', 1, 0, 'C', 1)
-        for c in colunas_repetidas:
-            self.cell(w_col, 8, c, 1, 0, 'C', 1)
-        for i, c in enumerate(colunas_repetidas):
-            ln = 1 if i == len(colunas_repetidas) - 1 else 0
-            self.cell(w_col, 8, c, 1, ln, 'C', 1)
-
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        self.cell(0, 10, f'Pág {self.page_no()}/{{nb}}', 0, 0, 'C')
-
-def gerar_pdf_teste(df):
-    pdf = PDFReportTeste(orientation='L', format='A4')
-    pdf.alias_nb_pages()
-    pdf.add_page()
-    pdf.set_font('Arial', '', 8)
-    h_line = 8
-    w_col = 16
-    for index, row in df.iterrows():
-        nome_raw = str(row['Aluno'])
-        nome = nome_raw[:30] + '..' if len(nome_raw) > 30 else nome_raw
-        disc = str(row['Disciplina'])[:3]
-        pdf.cell(65, h_line, nome, 1, 0, 'L')
-        pdf.cell(20, h_line, disc, 1, 0, 'C')
-        for i in range(12):
-            ln = 1 if i == 11 else 0
-            pdf.cell(w_col, h_line, '', 1, ln, 'C')
-    return bytes(pdf.output(dest='S'))
-
 # ==============================================================================
 # LÓGICA DE ESTADO (MEMÓRIA)
 # ==============================================================================
@@ -181,45 +102,87 @@ if st.session_state['rel_df'] is not None and not st.session_state['rel_df'].emp
     
     col_r2, col_teste, col_xls = st.columns(3)
     
+    # Os arquivos só são gerados no clique (download_button aceita uma função); nos reruns
+    # da página apenas os botões são desenhados. on_click="ignore": baixar não recarrega a página.
+    # Downloads repetidos dos mesmos dados saem do cache de artefatos (services/artefatos_svc.py).
+    periodo = f"{mes_display:02d}/{ano_display}"
+
+    def baixar(tipo, gerar):
+        versao = artefatos.versao_dados(df_show, nome_unidade)
+        return artefatos.obter(unidade_atual, tipo, periodo, versao, gerar)
+
+    def gerar_excel():
+        buffer_xls = io.BytesIO()
+        with pd.ExcelWriter(buffer_xls, engine='xlsxwriter') as writer:
+            df_show.to_excel(writer, index=False, sheet_name='Alunos')
+        return buffer_xls.getvalue()
+
     # 1. BOTÃO R2
     if HAS_FPDF:
-        try:
-            pdf_bytes_r2 = gerar_pdf_r2(df_show)
-            col_r2.download_button(
-                label="📄 Baixar R2 (Controle)",
-                data=pdf_bytes_r2,
-                file_name=f"R2_Alunos_{mes_display:02d}-{ano_display}.pdf",
-                mime="application/pdf",
-                type="secondary"
-            )
-        except Exception as e:
-            col_r2.error(f"Erro R2: {e}")
+        col_r2.download_button(
+            label="📄 Baixar R2 (Controle)",
+            data=functools.partial(baixar, "r2", lambda: pdf_svc.gerar_pdf_r2(df_show, nome_unidade)),
+            file_name=f"R2_Alunos_{mes_display:02d}-{ano_display}.pdf",
+            mime="application/pdf",
+            type="secondary",
+            on_click="ignore"
+        )
 
     # 2. BOTÃO TESTE
     if HAS_FPDF:
-        try:
-            pdf_bytes_teste = gerar_pdf_teste(df_show)
-            col_teste.download_button(
-                label="📄 Baixar Teste (Notas)",
-                data=pdf_bytes_teste,
-                file_name=f"Teste_Alunos_{mes_display:02d}-{ano_display}.pdf",
-                mime="application/pdf",
-                type="primary"
-            )
-        except Exception as e:
-            col_teste.error(f"Erro Teste: {e}")
+        col_teste.download_button(
+            label="📄 Baixar Teste (Notas)",
+            data=functools.partial(baixar, "teste", lambda: pdf_svc.gerar_pdf_teste(df_show, nome_unidade)),
+            file_name=f"Teste_Alunos_{mes_display:02d}-{ano_display}.pdf",
+            mime="application/pdf",
+            type="primary",
+            on_click="ignore"
+        )
 
     # 3. BOTÃO EXCEL
-    try:
-        buffer_xls = io.BytesIO()
-        with pd.ExcelWriter(buffer_xls, engine='xlsxwriter') as writer:
-            df_show.to_excel(writer, index=False, sheet_name='Alunos')
-        
+    if HAS_XLSX:
         col_xls.download_button(
             label="📊 Baixar Excel",
-            data=buffer_xls.getvalue(),
+            data=functools.partial(baixar, "excel", gerar_excel),
             file_name=f"Dados_Alunos_{mes_display:02d}-{ano_display}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            on_click="ignore"
         )
-    except Exception as e:
-        col_xls.error(f"Erro Excel: {e}")
\ No newline at end of file
+    else:
+        col_xls.error("Erro Excel: biblioteca 'xlsxwriter' não encontrada.")
+
+# ==============================================================================
+# GERAÇÃO EM LOTE (várias unidades e meses num ZIP)
+# ==============================================================================
+# Uma consulta para todas as combinações e PDFs renderizados em paralelo (services/lote_relatorios_svc.py).
+# Também disponível pela linha de comando: python -m services.lote_relatorios_svc --help
+if HAS_FPDF:
+    st.divider()
+    with st.expander("📦 Gerar em Lote (várias unidades e meses)"):
+        st.caption("Gera os relatórios de cada unidade e mês selecionados num único arquivo ZIP, uma pasta por unidade.")
+        unis = dict(db.get_unidades_usuario(st.session_state.get('usuario_logado')))
+        rotulos_tipos = {"r2": "R2 (Controle)", "teste": "Teste (Notas)"}
+
+        l1, l2, l3 = st.columns([2, 2, 1])
+        lote_unidades = l1.multiselect("Unidades", list(unis), default=[unidade_atual] if unidade_atual in unis else [],
+                                       format_func=unis.get, key="lote_unidades")
+        lote_meses = l2.multiselect("Meses", list(range(1, 13)), default=[st.session_state['rel_mes_idx'] + 1], key="lote_meses")
+        lote_ano = l3.number_input("Ano", min_value=2020, max_value=2030, value=st.session_state['rel_ano'], key="lote_ano")
+        lote_tipos = st.multiselect("Relatórios", list(lote.TIPOS), default=list(lote.TIPOS),
+                                    format_func=rotulos_tipos.get, key="lote_tipos")
+
+        if lote_unidades and lote_meses and lote_tipos:
+            st.download_button(
+                label=f"📦 Baixar ZIP ({len(lote_unidades)} unidade(s) x {len(lote_meses)} mês(es))",
+                data=functools.partial(lote.gerar_zip, {u: unis[u] for u in lote_unidades},
+                                       [(m, lote_ano) for m in sorted(lote_meses)], tuple(lote_tipos),
+                                       processos=lote.PROCESSOS_TELA),
+                file_name=f"Relatorios_Lote_{lote_ano}.zip",
+                mime="application/zip",
+                type="primary",
+                on_click="ignore"
+            )
+        else:
+            st.info("Selecione ao menos uma unidade, um mês e um relatório.")
+
+componentes.concluir_pagina()
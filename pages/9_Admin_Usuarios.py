@@ -1,5 +1,6 @@
 import streamlit as st
 import auth
+import componentes
 
 # --- VERIFICAÇÃO DE SEGURANÇA ---
 # 1. Garante que está logado
@@ -15,11 +16,10 @@ if not st.session_state.get('usuario_admin'):
 
 from repositories import admin_usuarios_rps as rps
 
-import pandas as pd
 import database as db
-import time
 
 st.set_page_config(page_title="Admin Usuários", layout="wide", page_icon="🔐")
+componentes.medir_pagina("Admin Usuários")
 if not auth.validar_sessao(): auth.tela_login(); st.stop()
 
 # Segurança: Verifica se é admin usando a chave correta definida no auth.py
@@ -29,7 +29,12 @@ if not st.session_state.get('usuario_admin'):
     st.stop()
 
 auth.barra_lateral()
-st.title("🔐 Gestão de Usuários e Acessos")
+c_tit, c_rec = st.columns([4, 1], vertical_alignment="bottom")
+c_tit.title("🔐 Gestão de Usuários e Acessos")
+if c_rec.button("🔄 Recarregar Cadastros", help="Relê unidades, disciplinas e demais tabelas de referência "
+                                               "(ex: após incluir uma unidade direto no banco)."):
+    db.invalidar_cache_referencia()
+    st.toast("Cadastros recarregados.", icon="🔄")
 
 
 
@@ -121,7 +126,7 @@ if submit_btn:
                 # e o Streamlit criará inputs novinhos e vazios.
                 st.session_state["user_form_id"] += 1
                 
-                time.sleep(1.5) # Tempo para ler a mensagem
+                componentes.pausa(1.5) # Tempo para ler a mensagem
                 st.rerun()      # Recarrega a página para desenhar o formulário novo
                 
         except Exception as e:
@@ -131,8 +136,8 @@ if submit_btn:
 with tab2:
     st.subheader("Editar Usuários")
     
-    # Busca lista de usuários (Backend)
-    users = db.buscar_lista_usuarios()
+    # Busca lista de usuários (Backend): só a página atual (paginação por cursor)
+    users, proximo = db.buscar_lista_usuarios(componentes.cursor_grade("usuarios"), componentes.TAMANHO_PAGINA)
     
     if not users.empty:
         sel_user = st.selectbox(
@@ -140,6 +145,7 @@ with tab2:
             users['username'].tolist(), 
             format_func=lambda x: f"{x} - {users[users['username']==x]['nome_completo'].values[0]}"
         )
+        componentes.paginador_cursor("usuarios", proximo)
         
         if sel_user:
             # Pega dados do DataFrame carregado
@@ -176,7 +182,7 @@ with tab2:
                     else:
                         try:
                             # Prepara hash apenas se houve troca de senha
-                            nhash = rps._gerar_hash_bcrypt(enova_senha.encode()) if enova_senha else None
+                            nhash = rps._gerar_hash_bcrypt(enova_senha) if enova_senha else None
                             # nhash = hashlib.sha256(enova_senha.encode()).hexdigest() if enova_senha else None
                             
                             # Chama função transacional do Backend
@@ -197,4 +203,6 @@ with tab2:
                         except Exception as e:
                             st.error(f"Erro ao atualizar: {e}")
     else:
-        st.info("Nenhum usuário cadastrado.")
\ No newline at end of file
+        st.info("Nenhum usuário cadastrado.")
+
+componentes.concluir_pagina()
@@ -1,22 +1,15 @@
 
 from conectDB.conexao import conectar
-
-import bcrypt
+import database as db
+from services import seguranca_svc as seg
 
 def _gerar_hash_bcrypt(senha_plana: str) -> str:
-    """Gera um hash seguro usando Bcrypt com Salt automático."""
-    # Bcrypt trabalha com bytes, então codificamos a string
-    # E decodificamos o resultado para salvar como TEXT no banco SQLite
-    salt = bcrypt.gensalt()
-    hash_bytes = bcrypt.hashpw(senha_plana.encode('utf-8'), salt)
-    return hash_bytes.decode('utf-8')
+    """Gera um hash seguro usando Bcrypt com Salt automático (custo configurado em seguranca_svc)."""
+    return seg.gerar_hash(senha_plana)
 
 def _verificar_senha_bcrypt(senha_plana: str, hash_banco: str) -> bool:
     """Verifica se a senha bate com o hash Bcrypt."""
-    try:
-        return bcrypt.checkpw(senha_plana.encode('utf-8'), hash_banco.encode('utf-8'))
-    except ValueError:
-        return False
+    return seg.verificar_senha(senha_plana, hash_banco)
 
 def verifica_usuario_existe(username):
     """
@@ -55,6 +48,7 @@ def criar_usuario_completo(username, password_hash, nome, is_admin, lista_unidad
             # 2. Vincula Unidades
             for uid in lista_unidades_ids:
                 conn.execute("INSERT INTO usuario_unidades (usuario_username, unidade_id) VALUES (?,?)", (username, uid))
+        db.invalidar_cache_unidades_usuario(username)
     except Exception as e:
         raise e
     finally:
@@ -83,6 +77,7 @@ def atualizar_usuario_completo(username, nome, is_admin, is_ativo, lista_unidade
             conn.execute("DELETE FROM usuario_unidades WHERE usuario_username=?", (username,))
             for uid in lista_unidades_ids:
                 conn.execute("INSERT INTO usuario_unidades (usuario_username, unidade_id) VALUES (?,?)", (username, uid))
+        db.invalidar_cache_unidades_usuario(username)
     except Exception as e:
         raise e
     finally:
@@ -1,10 +1,14 @@
+from __future__ import annotations
+
 # import sqlite3
-from typing import Dict, Tuple, List, Any, Optional
+from typing import Dict, Iterator, Tuple, List, Any, Optional
 from conectDB.conexao import conectar
-import pandas as pd
 from datetime import date, datetime
 from calendar import monthrange
 import database as db
+from repositories import relatorios_rps as rel_rps
+from services import dependencias_svc as dep
+pd = dep.preguicoso("pandas")
 
 
 def realizar_matricula_completa(unidade_id, dados_aluno, lista_disciplinas, dia_vencimento, valor_taxa, campanha_ativa, data_matricula_dt):
@@ -104,6 +108,9 @@ def realizar_matricula_completa(unidade_id, dados_aluno, lista_disciplinas, dia_
                     INSERT INTO pagamentos (unidade_id, matricula_id, aluno_id, mes_referencia, data_vencimento, valor_pago, id_status, id_tipo) 
                     VALUES (?,?,?,?,?,?, 1, 1)
                 """, (unidade_id, mid, aid, mes_str, dt_venc_real, valor_primeira_parc))
+
+            # Início retroativo: entra nos relatórios dos meses já fechados
+            rel_rps.incluir_matricula_retroativa(conn, unidade_id, data_matricula_dt)
             
             # 3. Taxa de Matrícula (Essa geralmente não tem desconto pro-rata, segue cheia)
             if not campanha_ativa and valor_taxa > 0:
@@ -249,27 +256,40 @@ def inativar_aluno_completo(aluno_id):
     finally:
         conn.close()
 
-def buscar_historico_financeiro_aluno(aluno_id, unidade_id):
-    """Retorna DataFrame de pagamentos do aluno."""
+def buscar_historico_financeiro_aluno(aluno_id, unidade_id, cursor: Optional[db.Cursor] = None,
+                                      limite: int = 25) -> Tuple[pd.DataFrame, Optional[db.Cursor]]:
+    """Retorna uma página de pagamentos do aluno (mais recentes primeiro) e o cursor da próxima."""
 
     conn = conectar()
     try:
         query = """
-            SELECT p.mes_referencia, data_vencimento, p.valor_pago, s.nome as status, t.nome as tipo 
+            SELECT p.id, p.mes_referencia, data_vencimento, p.valor_pago, s.nome as status, t.nome as tipo 
              FROM pagamentos p
              JOIN status_pagamentos s ON p.id_status = s.id
              JOIN tipos_pagamento t ON p.id_tipo = t.id
              WHERE p.aluno_id=? AND p.unidade_id=? 
-             ORDER BY p.id DESC
         """
         params = [aluno_id, unidade_id]
         
-        return pd.read_sql(query, conn, params=params)
+        return db.consultar_pagina_cursor(conn, query, params, ('id',), desc=True, cursor=cursor, limite=limite)
     finally:
         conn.close()
 
 
 
+def exportacao_historico_financeiro_aluno(aluno_id, unidade_id) -> Tuple[List[str], Iterator[List[tuple]]]:
+    """Histórico financeiro completo do aluno em lotes, já com títulos e valores em Reais (exportação)."""
+    return db.consultar_em_lotes("""
+        SELECT p.mes_referencia AS "Mês Ref", p.data_vencimento AS "Vencimento", p.data_pagamento AS "Pagamento",
+               ROUND(p.valor_pago / 100.0, 2) AS "Valor (R$)", s.nome AS "Status", t.nome AS "Tipo Lançamento"
+        FROM pagamentos p
+        JOIN status_pagamentos s ON p.id_status = s.id
+        JOIN tipos_pagamento t ON p.id_tipo = t.id
+        WHERE p.aluno_id=? AND p.unidade_id=?
+        ORDER BY p.id DESC
+    """, (aluno_id, unidade_id))
+
+
 def buscar_binario_contrato(unidade_id):
     """Retorna o arquivo .docx template salvo no banco."""
     conn = conectar()
@@ -309,50 +329,64 @@ def buscar_dados_para_doc_word(aluno_id, unidade_id):
 
 # No arquivo repositories/alunos_rps.py
 
-def listar_alunos_grid(unidade_id: int, termo: str = "", filtro_status: str = "Ativos"):
+_EXISTE_MATRICULA_ATIVA = "EXISTS (SELECT 1 FROM matriculas m WHERE m.aluno_id = a.id AND m.ativo = 1)"
+
+
+def _filtro_alunos_grid(unidade_id: int, termo: str, filtro_status: str) -> Tuple[str, list]:
+    """Cláusula WHERE (e parâmetros) comum à listagem e à contagem da grade de alunos."""
+    where = " WHERE a.unidade_id = ?"
+    params = [unidade_id]
+
+    # Aplica Filtro de Texto (Nome ou CPF)
+    if termo:
+        where += " AND (a.nome LIKE ? OR a.cpf_responsavel LIKE ?)"
+        termo_like = f"%{termo}%"
+        params.extend([termo_like, termo_like])
+
+    # Filtro de status no próprio SQL (a paginação precisa dele antes do LIMIT)
+    if filtro_status == "Ativos":
+        where += f" AND {_EXISTE_MATRICULA_ATIVA}"
+    elif filtro_status == "Inativos":
+        where += f" AND NOT {_EXISTE_MATRICULA_ATIVA}"
+    return where, params
+
+
+def listar_alunos_grid(unidade_id: int, termo: str = "", filtro_status: str = "Ativos",
+                       cursor: Optional[db.Cursor] = None, limite: int = 25) -> Tuple[pd.DataFrame, Optional[db.Cursor]]:
     """
-    Busca alunos otimizada para Dataframe com cálculo de status.
+    Busca uma página de alunos para o Dataframe, com o status calculado, e o cursor da próxima página.
     filtro_status: "Ativos", "Inativos", "Todos"
     """
     conn = conectar()
     try:
         # 1. Base da Query: Trazemos o status calculado com base na existência de matrículas ativas
         # O CASE WHEN verifica se existe pelo menos uma matrícula com ativo=1 para aquele aluno
-        sql = """
+        where, params = _filtro_alunos_grid(unidade_id, termo, filtro_status)
+        sql = f"""
             SELECT 
                 a.id, 
-                CASE 
-                    WHEN EXISTS (SELECT 1 FROM matriculas m WHERE m.aluno_id = a.id AND m.ativo = 1) THEN 'Ativo' 
-                    ELSE 'Inativo' 
-                END as status,
+                CASE WHEN {_EXISTE_MATRICULA_ATIVA} THEN 'Ativo' ELSE 'Inativo' END as status,
                 a.nome, 
                 a.responsavel_nome,
                 a.cpf_responsavel
             FROM alunos a
-            WHERE a.unidade_id = ?
-        """
-        params = [unidade_id]
+        """ + where
 
-        # 2. Aplica Filtro de Texto (Nome ou CPF)
-        if termo:
-            sql += " AND (a.nome LIKE ? OR a.cpf_responsavel LIKE ?)"
-            termo_like = f"%{termo}%"
-            params.extend([termo_like, termo_like])
+        # 2. Ordenação (Ativos primeiro, depois ordem alfabética; id desempata nomes iguais).
+        # Com o status filtrado, ordenar só por nome deixa o SQLite usar idx_alunos_busca.
+        chaves = ('status', 'nome', 'id') if filtro_status == "Todos" else ('nome', 'id')
+        return db.consultar_pagina_cursor(conn, sql, params, chaves, cursor=cursor, limite=limite)
 
-        # 3. Ordenação (Ativos primeiro, depois ordem alfabética)
-        sql += " ORDER BY status ASC, a.nome ASC"
-
-        # Carrega no Pandas
-        df = pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
 
-        # 4. Filtragem do DataFrame (Mais prático fazer no Pandas do que complicar o SQL dinâmico agora)
-        if filtro_status == "Ativos":
-            df = df[df['status'] == 'Ativo']
-        elif filtro_status == "Inativos":
-            df = df[df['status'] == 'Inativo']
-        
-        return df
 
+def contar_alunos_grid(unidade_id: int, termo: str = "", filtro_status: str = "Ativos") -> int:
+    """Total de alunos com os mesmos filtros de listar_alunos_grid."""
+    conn = conectar()
+    try:
+        where, params = _filtro_alunos_grid(unidade_id, termo, filtro_status)
+        return conn.execute("SELECT COUNT(*) FROM alunos a" + where, params).fetchone()[0]
     finally:
         conn.close()
 
@@ -1,10 +1,11 @@
 # import sqlite3
 from typing import Dict, Tuple, List, Any, Optional
 from conectDB.conexao import conectar
-import pandas as pd
 from datetime import date, datetime
 from calendar import monthrange
 import database as db
+from services import dependencias_svc as dep
+pd = dep.preguicoso("pandas")
 
 
 def buscar_bolsas_ativas(unidade_id):
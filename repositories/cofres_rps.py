@@ -1,9 +1,12 @@
-from typing import Dict, Tuple, List, Any, Optional
+from __future__ import annotations
+
+from typing import Dict, Iterator, Tuple, List, Any, Optional
 from conectDB.conexao import conectar
-import pandas as pd
 from datetime import date, datetime
 from calendar import monthrange
 import database as db
+from services import dependencias_svc as dep
+pd = dep.preguicoso("pandas")
 
 
 def realizar_distribuicao_lucro(unidade_id: int, mapa_distribuicao: Dict[int, float]) -> None:
@@ -102,20 +105,32 @@ def atualizar_percentuais_cofres(mapa_novos_percentuais: Dict[int, float]) -> bo
     finally:
         conn.close()
 
-def buscar_historico_movimentacoes_cofres(unidade_id):
+def buscar_historico_movimentacoes_cofres(unidade_id, cursor: Optional[db.Cursor] = None,
+                                          limite: int = 25) -> Tuple[pd.DataFrame, Optional[db.Cursor]]:
     """
-    Retorna o histórico completo de entradas e saídas dos cofres,
-    com join para pegar o nome do cofre.
+    Retorna uma página do histórico de entradas e saídas dos cofres (mais recentes primeiro),
+    com join para pegar o nome do cofre, e o cursor da próxima página.
     """
     conn = conectar()
     try:
         query = '''
-            SELECT m.data_movimentacao, c.nome, m.tipo, m.valor, m.descricao 
+            SELECT m.id, m.data_movimentacao, c.nome, m.tipo, m.valor, m.descricao 
             FROM cofres_movimentacao m 
             JOIN cofres c ON m.cofre_id = c.id 
             WHERE m.unidade_id = ? 
-            ORDER BY m.id DESC
         '''
-        return pd.read_sql_query(query, conn, params=(unidade_id,))
+        return db.consultar_pagina_cursor(conn, query, [unidade_id], ('id',), desc=True, cursor=cursor, limite=limite)
     finally:
         conn.close()
+
+
+def exportacao_historico_movimentacoes_cofres(unidade_id) -> Tuple[List[str], Iterator[List[tuple]]]:
+    """Extrato completo dos cofres em lotes, já com títulos e valores em Reais (exportação)."""
+    return db.consultar_em_lotes('''
+        SELECT m.data_movimentacao AS "Data", c.nome AS "Cofre", m.tipo AS "Tipo",
+               ROUND(m.valor / 100.0, 2) AS "Valor (R$)", m.descricao AS "Descrição"
+        FROM cofres_movimentacao m
+        JOIN cofres c ON m.cofre_id = c.id
+        WHERE m.unidade_id = ?
+        ORDER BY m.id DESC
+    ''', (unidade_id,))
@@ -1,7 +1,11 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
 from conectDB.conexao import conectar
-import pandas as pd
 from calendar import monthrange
 import database as db
+from services import dependencias_svc as dep
+pd = dep.preguicoso("pandas")
 
 
 def buscar_dados_financeiros_anuais(unidade_id: int, ano: int) -> pd.DataFrame:
@@ -114,4 +118,306 @@ def contar_alunos_unicos_ativos(unidade_id: int) -> int:
         query = "SELECT COUNT(DISTINCT aluno_id) as cnt FROM matriculas WHERE ativo=1 AND unidade_id=?"
         return int(conn.execute(query, (unidade_id,)).fetchone()['cnt'] or 0)
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+# ==============================================================================
+# PACOTE DE KPIs (Uma conexão, poucas consultas agregadas)
+# ==============================================================================
+
+ID_CATEGORIAS_RH = (1, 2)  # Pessoal + Impostos
+
+
+@dataclass(frozen=True)
+class KpisDashboard:
+    """Todos os indicadores do Dashboard Estratégico de um ano. Valores monetários em centavos, exceto custo_rh (Reais)."""
+    financeiro_mensal: pd.DataFrame        # mes_referencia, tipo ('Receita'/'Despesa'), total
+    despesas_categoria: pd.DataFrame       # nome_categoria, total
+    distribuicao_matriculas: pd.DataFrame  # disciplina, qtd
+    valor_total: int
+    valor_atrasado: int
+    custo_rh: float
+    funcionarios_ativos: int
+    meses_faturados: int
+    alunos_unicos: int
+    versao_projecao: str                   # Chave de cache da projeção de fluxo de caixa
+    versao_matriculas: str                 # Chave de cache da análise de coortes
+
+    @property
+    def receita_ano(self) -> float:
+        return db.from_cents(self.financeiro_mensal.loc[self.financeiro_mensal['tipo'] == 'Receita', 'total'].sum())
+
+    @property
+    def despesa_ano(self) -> float:
+        return db.from_cents(self.financeiro_mensal.loc[self.financeiro_mensal['tipo'] == 'Despesa', 'total'].sum())
+
+    @property
+    def total_matriculas(self) -> int:
+        return int(self.distribuicao_matriculas['qtd'].sum()) if not self.distribuicao_matriculas.empty else 0
+
+    @property
+    def taxa_inadimplencia(self) -> float:
+        return (self.valor_atrasado / self.valor_total) * 100 if self.valor_total else 0.0
+
+
+def buscar_kpis_dashboard(unidade_id: int, ano) -> KpisDashboard:
+    """
+    Calcula todos os indicadores do Dashboard com uma única conexão:
+    1. Pagamentos do ano agrupados por mês (receita, total, atraso e meses faturados)
+    2. Despesas pagas do ano por mês e categoria (total, categorias e custo de RH)
+    3. Matrículas ativas por disciplina
+    4. Contagens (alunos únicos e funcionários ativos)
+    5. Assinaturas das fontes da projeção e das coortes (evitam outra ida ao banco só para o cache)
+    """
+    conn = conectar()
+    try:
+        termo = f"%{ano}"
+
+        pag = pd.read_sql_query("""
+            SELECT
+                mes_referencia,
+                SUM(CASE WHEN id_status=2 THEN valor_pago ELSE 0 END) AS receita,
+                COUNT(CASE WHEN id_status=2 THEN 1 END) AS qtd_pagos,
+                SUM(valor_pago) AS valor_total,
+                SUM(CASE WHEN id_status=1 AND data_vencimento < DATE('now') THEN valor_pago ELSE 0 END) AS valor_atrasado,
+                MAX(CASE WHEN valor_pago > 0 THEN 1 ELSE 0 END) AS faturado
+            FROM pagamentos
+            WHERE unidade_id=? AND mes_referencia LIKE ?
+            GROUP BY mes_referencia
+        """, conn, params=(unidade_id, termo))
+
+        desp = pd.read_sql_query("""
+            SELECT d.mes_referencia, d.id_categoria, c.nome_categoria, SUM(d.valor) AS total
+            FROM despesas d
+            LEFT JOIN categorias_despesas c ON (c.id = d.id_categoria)
+            WHERE d.unidade_id=? AND d.mes_referencia LIKE ? AND d.id_status=2
+            GROUP BY d.mes_referencia, d.id_categoria, c.nome_categoria
+        """, conn, params=(unidade_id, termo))
+
+        dist = pd.read_sql_query("""
+            SELECT d.nome as disciplina, COUNT(*) as qtd
+            FROM matriculas m
+            INNER JOIN disciplinas d ON m.id_disciplina = d.id
+            WHERE m.ativo=1 AND m.unidade_id=?
+            GROUP BY d.nome
+        """, conn, params=(unidade_id,))
+
+        contagens = conn.execute("""
+            SELECT
+                (SELECT COUNT(DISTINCT aluno_id) FROM matriculas WHERE ativo=1 AND unidade_id=?) AS alunos,
+                (SELECT COUNT(*) FROM funcionarios WHERE ativo=1 AND unidade_id=?) AS funcionarios
+        """, (unidade_id, unidade_id)).fetchone()
+
+        # --- Montagem (mesmos formatos das consultas individuais) ---
+        receitas = pag.loc[pag['qtd_pagos'] > 0, ['mes_referencia', 'receita']].rename(columns={'receita': 'total'})
+        receitas.insert(1, 'tipo', 'Receita')
+        despesas = desp.groupby('mes_referencia', as_index=False)['total'].sum()
+        despesas.insert(1, 'tipo', 'Despesa')
+        financeiro = pd.concat([receitas, despesas], ignore_index=True)
+
+        categorias = (desp.dropna(subset=['nome_categoria'])
+                          .groupby('nome_categoria', as_index=False)['total'].sum())
+
+        custo_rh = desp.loc[desp['id_categoria'].isin(ID_CATEGORIAS_RH), 'total'].sum()
+
+        return KpisDashboard(
+            financeiro_mensal=financeiro,
+            despesas_categoria=categorias,
+            distribuicao_matriculas=dist,
+            valor_total=int(pag['valor_total'].sum() or 0),
+            valor_atrasado=int(pag['valor_atrasado'].sum() or 0),
+            custo_rh=db.from_cents(custo_rh) if custo_rh else 0,
+            funcionarios_ativos=int(contagens['funcionarios'] or 0),
+            meses_faturados=int(pag['faturado'].sum() or 0),
+            alunos_unicos=int(contagens['alunos'] or 0),
+            versao_projecao=_versao_dados_projecao(conn, unidade_id),
+            versao_matriculas=_versao_matriculas(conn, unidade_id),
+        )
+    finally:
+        conn.close()
+
+
+# ==============================================================================
+# PROJEÇÃO DE FLUXO DE CAIXA (Fontes)
+# ==============================================================================
+
+def _versao_dados_projecao(conn, unidade_id: int) -> str:
+    """
+    Assinatura barata das fontes da projeção (matrículas, despesas fixas, pessoal e royalties).
+    Qualquer inclusão, exclusão ou alteração de valor muda a string, invalidando o cache da tela
+    (vai para a tela em KpisDashboard.versao_projecao).
+    """
+    query = """
+        SELECT
+            (SELECT COUNT(*) || '.' || COALESCE(MAX(id), 0) || '.' || COALESCE(SUM(valor_acordado), 0) || '.' || COALESCE(SUM(bolsa_meses_restantes), 0)
+                    || '.' || COALESCE(SUM(bolsa_ativa), 0)
+               FROM matriculas WHERE unidade_id=? AND ativo=1) AS mat,
+            (SELECT COUNT(*) || '.' || COALESCE(MAX(id), 0) || '.' || COALESCE(SUM(valor), 0)
+               FROM despesas_recorrentes WHERE unidade_id=? AND ativo=1) AS rec,
+            (SELECT COUNT(*) || '.' || COALESCE(MAX(id), 0) || '.' || COALESCE(SUM(salario_base), 0)
+               FROM funcionarios WHERE unidade_id=? AND ativo=1) AS func,
+            (SELECT COUNT(*) || '.' || COALESCE(MAX(id), 0) || '.' || COALESCE(SUM(valor), 0)
+               FROM custos_pessoal WHERE unidade_id=?) AS custos,
+            (SELECT COUNT(*) || '.' || COALESCE(MAX(id), 0) || '.' || COALESCE(SUM(valor), 0)
+               FROM config_royalties WHERE unidade_id=?) AS roy
+    """
+    row = conn.execute(query, (unidade_id,) * 5).fetchone()
+    return "|".join(str(v) for v in row)
+
+
+def buscar_bases_projecao(unidade_id: int) -> dict:
+    """
+    Carrega, numa única conexão, tudo o que a projeção precisa (valores em centavos):
+    - matriculas: valor_acordado, dia_vencimento, bolsa_ativa, bolsa_meses_restantes
+    - recorrentes: valor das despesas fixas ativas
+    - pessoal: salários e custos de pessoal dos funcionários ativos
+    - royalties: valor, ano_mes_inicio, ano_mes_fim
+    """
+    conn = conectar()
+    try:
+        matriculas = pd.read_sql_query("""
+            SELECT valor_acordado, dia_vencimento, bolsa_ativa, bolsa_meses_restantes
+            FROM matriculas WHERE unidade_id=? AND ativo=1
+        """, conn, params=(unidade_id,))
+
+        recorrentes = pd.read_sql_query("""
+            SELECT valor FROM despesas_recorrentes WHERE unidade_id=? AND ativo=1
+        """, conn, params=(unidade_id,))
+
+        pessoal = pd.read_sql_query("""
+            SELECT salario_base AS valor FROM funcionarios WHERE unidade_id=? AND ativo=1
+            UNION ALL
+            SELECT c.valor FROM custos_pessoal c
+            INNER JOIN funcionarios f ON (f.id = c.funcionario_id)
+            WHERE f.unidade_id=? AND f.ativo=1
+        """, conn, params=(unidade_id, unidade_id))
+
+        royalties = pd.read_sql_query("""
+            SELECT valor, ano_mes_inicio, ano_mes_fim FROM config_royalties WHERE unidade_id=?
+        """, conn, params=(unidade_id,))
+
+        return {
+            'matriculas': matriculas,
+            'recorrentes': recorrentes,
+            'pessoal': pessoal,
+            'royalties': royalties,
+        }
+    finally:
+        conn.close()
+
+
+# ==============================================================================
+# VISÃO CONSOLIDADA (Todas as unidades do usuário numa só consulta)
+# ==============================================================================
+
+def buscar_kpis_consolidados(usuario: str, ano) -> pd.DataFrame:
+    """
+    Indicadores do ano para todas as unidades vinculadas ao usuário (usuario_unidades).
+    Cada fonte é agregada uma única vez com GROUP BY unidade_id e as partes são unidas
+    por LEFT JOIN, então o custo não cresce com uma consulta por unidade.
+
+    Retorna uma linha por unidade (valores monetários em centavos):
+    unidade_id, unidade, receita, despesa, custo_rh, valor_total, valor_atrasado,
+    meses_faturados, matriculas, alunos_unicos, funcionarios
+    """
+    conn = conectar()
+    try:
+        termo = f"%{ano}"
+        query = f"""
+            WITH minhas AS (
+                SELECT u.id, u.nome
+                FROM unidades u
+                INNER JOIN usuario_unidades uu ON (uu.unidade_id = u.id)
+                WHERE uu.usuario_username = ?
+            ),
+            pag AS (
+                SELECT unidade_id,
+                    SUM(CASE WHEN id_status=2 THEN valor_pago ELSE 0 END) AS receita,
+                    SUM(valor_pago) AS valor_total,
+                    SUM(CASE WHEN id_status=1 AND data_vencimento < DATE('now') THEN valor_pago ELSE 0 END) AS valor_atrasado,
+                    COUNT(DISTINCT CASE WHEN valor_pago > 0 THEN mes_referencia END) AS meses_faturados
+                FROM pagamentos
+                WHERE unidade_id IN (SELECT id FROM minhas) AND mes_referencia LIKE ?
+                GROUP BY unidade_id
+            ),
+            desp AS (
+                SELECT unidade_id,
+                    SUM(valor) AS despesa,
+                    SUM(CASE WHEN id_categoria IN ({",".join(str(c) for c in ID_CATEGORIAS_RH)}) THEN valor ELSE 0 END) AS custo_rh
+                FROM despesas
+                WHERE unidade_id IN (SELECT id FROM minhas) AND mes_referencia LIKE ? AND id_status=2
+                GROUP BY unidade_id
+            ),
+            mat AS (
+                SELECT unidade_id, COUNT(*) AS matriculas, COUNT(DISTINCT aluno_id) AS alunos_unicos
+                FROM matriculas
+                WHERE unidade_id IN (SELECT id FROM minhas) AND ativo=1
+                GROUP BY unidade_id
+            ),
+            func AS (
+                SELECT unidade_id, COUNT(*) AS funcionarios
+                FROM funcionarios
+                WHERE unidade_id IN (SELECT id FROM minhas) AND ativo=1
+                GROUP BY unidade_id
+            )
+            SELECT
+                mi.id AS unidade_id, mi.nome AS unidade,
+                COALESCE(pag.receita, 0) AS receita,
+                COALESCE(desp.despesa, 0) AS despesa,
+                COALESCE(desp.custo_rh, 0) AS custo_rh,
+                COALESCE(pag.valor_total, 0) AS valor_total,
+                COALESCE(pag.valor_atrasado, 0) AS valor_atrasado,
+                COALESCE(pag.meses_faturados, 0) AS meses_faturados,
+                COALESCE(mat.matriculas, 0) AS matriculas,
+                COALESCE(mat.alunos_unicos, 0) AS alunos_unicos,
+                COALESCE(func.funcionarios, 0) AS funcionarios
+            FROM minhas mi
+            LEFT JOIN pag ON (pag.unidade_id = mi.id)
+            LEFT JOIN desp ON (desp.unidade_id = mi.id)
+            LEFT JOIN mat ON (mat.unidade_id = mi.id)
+            LEFT JOIN func ON (func.unidade_id = mi.id)
+            ORDER BY mi.nome
+        """
+        return pd.read_sql_query(query, conn, params=(usuario, termo, termo))
+    finally:
+        conn.close()
+
+
+# ==============================================================================
+# RETENÇÃO POR COORTES (Fontes)
+# ==============================================================================
+
+def _versao_matriculas(conn, unidade_id: int) -> str:
+    """
+    Assinatura das matrículas da unidade (inclusões, encerramentos, valores e datas), chave de cache
+    da análise de coortes (vai para a tela em KpisDashboard.versao_matriculas).
+    """
+    # Só os campos que afetam a análise de retenção: bolsa e dia de vencimento não invalidam
+    query = """
+        SELECT COUNT(*) || '.' || COALESCE(MAX(id), 0) || '.' || TOTAL(ativo) || '.' || TOTAL(valor_acordado)
+               || '.' || TOTAL(id_disciplina) || '.' || TOTAL(julianday(data_inicio)) || '.' || TOTAL(julianday(data_fim))
+        FROM matriculas WHERE unidade_id=?
+    """
+    return str(conn.execute(query, (unidade_id,)).fetchone()[0])
+
+
+def buscar_historico_matriculas(unidade_id: int) -> pd.DataFrame:
+    """
+    Todo o histórico de matrículas da unidade (ativas e encerradas) numa única leitura,
+    já com disciplina e canal de aquisição do aluno. valor_acordado em centavos.
+    """
+    conn = conectar()
+    try:
+        query = """
+            SELECT
+                m.id, m.aluno_id, m.data_inicio, m.data_fim, m.ativo, m.valor_acordado,
+                d.nome AS disciplina,
+                COALESCE(c.nome, 'Não informado') AS canal
+            FROM matriculas m
+            INNER JOIN disciplinas d ON (d.id = m.id_disciplina)
+            LEFT JOIN alunos a ON (a.id = m.aluno_id)
+            LEFT JOIN canais_aquisicao c ON (c.id = a.id_canal_aquisicao)
+            WHERE m.unidade_id=? AND m.data_inicio IS NOT NULL
+        """
+        return pd.read_sql_query(query, conn, params=(unidade_id,))
+    finally:
+        conn.close()
@@ -1,21 +1,15 @@
-from typing import Dict, Tuple, List, Any, Optional
+from __future__ import annotations
+
+from typing import Dict, Tuple, Any, Optional
 from conectDB.conexao import conectar
-import pandas as pd
 from datetime import date, datetime
 from calendar import monthrange
 import database as db
+from services import dependencias_svc as dep
+pd = dep.preguicoso("pandas")
 
-def buscar_categorias_despesas() -> List[dict]:
-    conn = conectar()
-    try:
-        df = pd.read_sql("""
-            SELECT id, nome_categoria 
-            FROM categorias_despesas 
-            ORDER BY nome_categoria
-        """, conn)
-        return df.to_dict(orient="records")
-    finally:
-        conn.close()
+def buscar_categorias_despesas() -> tuple:
+    return db.obter_referencia('categorias_despesas')
 
 
 def adicionar_despesa_avulsa(unidade_id: int, categoria: str, descricao: str, valor: float, data_vencimento: date) -> None:
@@ -47,7 +41,7 @@ def adicionar_despesa_recorrente(unidade_id: int, categoria: str, descricao: str
             rid = cur.lastrowid
             hj = datetime.now()
             m_ref = f"{hj.month:02d}/{hj.year}"
-            dt_venc_atual = db._get_valid_date(hj.year, hj.month, dia_vencimento)
+            dt_venc_atual = db.get_valid_date(hj.year, hj.month, dia_vencimento)
             conn.execute('''
                 INSERT INTO despesas (unidade_id, recorrente_id, id_categoria, descricao, valor, data_vencimento, mes_referencia, id_status) 
                 VALUES (?, ?, ?, ?, ?, ?, ?, 1)
@@ -56,7 +50,9 @@ def adicionar_despesa_recorrente(unidade_id: int, categoria: str, descricao: str
         conn.close()
 
 
-def buscar_recorrencias(unidade_id: int, apenas_ativas: bool=True) -> pd.DataFrame:
+def buscar_recorrencias(unidade_id: int, apenas_ativas: bool=True, cursor: Optional[db.Cursor] = None,
+                        limite: int = 25) -> Tuple[pd.DataFrame, Optional[db.Cursor]]:
+    """Página de regras de despesas fixas (ordem de descrição) e o cursor da próxima página."""
     conn = conectar()
     try:
         query = """
@@ -64,7 +60,7 @@ def buscar_recorrencias(unidade_id: int, apenas_ativas: bool=True) -> pd.DataFra
                 d.id, 
                 d.id_categoria, 
                 c.nome_categoria,
-                d.descricao, 
+                COALESCE(d.descricao, '') AS descricao, 
                 d.valor, 
                 d.dia_vencimento, 
                 d.ativo
@@ -78,8 +74,7 @@ def buscar_recorrencias(unidade_id: int, apenas_ativas: bool=True) -> pd.DataFra
         params = [unidade_id]
         if apenas_ativas:
             query += " AND ativo=1"
-        query += " ORDER BY descricao"
-        return pd.read_sql_query(query, conn, params=params)
+        return db.consultar_pagina_cursor(conn, query, params, ('descricao', 'id'), cursor=cursor, limite=limite)
     finally:
         conn.close()
 
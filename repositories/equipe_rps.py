@@ -1,18 +1,13 @@
-from typing import List
 from conectDB.conexao import conectar
-import pandas as pd
 from datetime import date, datetime
 from calendar import monthrange
 import database as db
+from services import dependencias_svc as dep
+pd = dep.preguicoso("pandas")
 
 
-def buscar_tipos_contratacao() -> List[dict]:
-    conn = conectar()
-    try:
-        df = pd.read_sql_query("SELECT id, nome FROM tipos_contratacao ORDER BY nome", conn)
-        return df.to_dict(orient="records")
-    finally:
-        conn.close()
+def buscar_tipos_contratacao() -> tuple:
+    return db.obter_referencia('tipos_contratacao')
 
 
 def cadastrar_funcionario_completo(unidade_id, nome, id_tipo, salario, dia_pag, lista_custos_iniciais):
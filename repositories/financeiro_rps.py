@@ -1,9 +1,12 @@
-from typing import List, Optional
+from __future__ import annotations
+
+from typing import Dict, Iterator, List, Optional, Tuple
 from conectDB.conexao import conectar
-import pandas as pd
 from datetime import date
 from calendar import monthrange
 import database as db
+from services import dependencias_svc as dep
+pd = dep.preguicoso("pandas")
 
 def buscar_meses_com_movimento(unidade_id: int) -> List[str]:
     conn = conectar()
@@ -164,3 +167,123 @@ def pagar_despesa(despesa_id: int) -> None:
     finally:
         conn.close()
 
+
+
+# ==============================================================================
+# LISTAS PAGINADAS (Ordenação e paginação no banco)
+# ==============================================================================
+# Cada função aceita apenas as chaves de ordenação do seu dicionário (nada do usuário vai cru ao SQL)
+# e retorna (página, total de linhas).
+
+ORDEM_RECEBIMENTOS = {'vencimento': 'p.data_vencimento', 'aluno': 'a.nome', 'valor': 'p.valor_pago'}
+ORDEM_DESPESAS = {'vencimento': 'd.data_vencimento', 'categoria': 'c.nome_categoria', 'descricao': 'd.descricao', 'valor': 'd.valor'}
+ORDEM_FLUXO = {'data': 'data_pagamento', 'tipo': 'Tipo', 'descricao': 'Descricao', 'valor': 'valor_pago'}
+
+
+def _clausula_ordem(opcoes: dict, ordem: str, desc: bool) -> str:
+    if ordem not in opcoes:
+        raise ValueError(f"Ordenação inválida: {ordem}")
+    return f" ORDER BY {opcoes[ordem]} {'DESC' if desc else 'ASC'}"
+
+
+def buscar_recebimentos_pendentes_pagina(unidade_id: int, filtro_mes: Optional[str], ordem: str = 'vencimento',
+                                         desc: bool = False, limite: int = 25, offset: int = 0) -> Tuple[pd.DataFrame, int]:
+    conn = conectar()
+    try:
+        base = """
+            FROM pagamentos p 
+            LEFT JOIN matriculas m ON p.matricula_id=m.id 
+            LEFT JOIN disciplinas d ON m.id_disciplina=d.id
+            JOIN alunos a ON COALESCE(p.aluno_id, m.aluno_id)=a.id 
+            WHERE p.id_status=1 AND p.unidade_id=?
+        """
+        params = [unidade_id]
+        if filtro_mes and filtro_mes != "Todos":
+            base += " AND p.mes_referencia=?"
+            params.append(filtro_mes)
+
+        total = conn.execute("SELECT COUNT(*) " + base, params).fetchone()[0]
+        query = ("SELECT p.id, p.data_vencimento, a.nome, COALESCE(d.nome, 'Taxa') as disciplina, p.valor_pago " + base
+                 + _clausula_ordem(ORDEM_RECEBIMENTOS, ordem, desc) + ", p.id LIMIT ? OFFSET ?")
+        df = pd.read_sql(query, conn, params=params + [limite, offset])
+        return df, total
+    finally:
+        conn.close()
+
+
+def buscar_despesas_pendentes_pagina(unidade_id: int, filtro_mes: Optional[str], ordem: str = 'vencimento',
+                                     desc: bool = False, limite: int = 25, offset: int = 0) -> Tuple[pd.DataFrame, int]:
+    conn = conectar()
+    try:
+        base = """
+            FROM despesas d
+            INNER JOIN categorias_despesas c ON (c.id = d.id_categoria)
+            WHERE d.id_status=1 AND d.unidade_id=?
+        """
+        params = [unidade_id]
+        if filtro_mes and filtro_mes != "Todos":
+            base += " AND d.mes_referencia=?"
+            params.append(filtro_mes)
+
+        total = conn.execute("SELECT COUNT(*) " + base, params).fetchone()[0]
+        query = ("SELECT d.id, d.data_vencimento, d.id_categoria, c.nome_categoria, d.descricao, d.valor " + base
+                 + _clausula_ordem(ORDEM_DESPESAS, ordem, desc) + ", d.id LIMIT ? OFFSET ?")
+        df = pd.read_sql(query, conn, params=params + [limite, offset])
+        return df, total
+    finally:
+        conn.close()
+
+
+# Entradas e saídas pagas do mês num único conjunto (mesmas colunas de buscar_fluxo_caixa)
+_SQL_FLUXO_CAIXA = '''
+    SELECT p.id, p.data_pagamento, 'Entrada' as Tipo, p.valor_pago, 
+    fp.nome as forma_pagamento, 
+    a.nome || ' - ' || COALESCE(d.nome, 'Taxa') as Descricao 
+    FROM pagamentos p 
+    LEFT JOIN matriculas m ON p.matricula_id = m.id 
+    LEFT JOIN disciplinas d ON m.id_disciplina = d.id
+    JOIN alunos a ON COALESCE(p.aluno_id, m.aluno_id) = a.id 
+    LEFT JOIN formas_pagamento fp ON p.id_forma_pagamento = fp.id
+    WHERE p.id_status=2 AND p.unidade_id=:u AND p.mes_referencia=:mes
+    UNION ALL
+    SELECT d.id, d.data_pagamento, 'Saída' as Tipo, d.valor as valor_pago, '' as forma_pagamento, 
+    c.nome_categoria || ' - ' || d.descricao as Descricao 
+    FROM despesas d 
+    INNER JOIN categorias_despesas c ON (c.id = d.id_categoria)
+    WHERE d.id_status=2 AND d.unidade_id=:u AND d.mes_referencia=:mes
+    '''
+
+
+def buscar_fluxo_caixa_pagina(unidade_id: int, mes_referencia: str, ordem: str = 'data', desc: bool = True,
+                              limite: int = 25, offset: int = 0) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    Página do fluxo de caixa do mês e os totais do mês inteiro (centavos):
+    {'linhas', 'entradas', 'saidas'}.
+    """
+    conn = conectar()
+    try:
+        params = {'u': unidade_id, 'mes': mes_referencia}
+        uniao = _SQL_FLUXO_CAIXA
+        tot = conn.execute(f"""
+            SELECT COUNT(*) AS linhas,
+                   COALESCE(SUM(CASE WHEN Tipo='Entrada' THEN valor_pago END), 0) AS entradas,
+                   COALESCE(SUM(CASE WHEN Tipo='Saída' THEN valor_pago END), 0) AS saidas
+            FROM ({uniao})
+        """, params).fetchone()
+        query = (f"SELECT * FROM ({uniao})" + _clausula_ordem(ORDEM_FLUXO, ordem, desc)
+                 + ", Tipo, id LIMIT :lim OFFSET :off")
+        df = pd.read_sql(query, conn, params={**params, 'lim': limite, 'off': offset})
+        df['data_pagamento'] = pd.to_datetime(df['data_pagamento'])
+        return df, {'linhas': tot['linhas'], 'entradas': tot['entradas'], 'saidas': tot['saidas']}
+    finally:
+        conn.close()
+
+
+def exportacao_fluxo_caixa(unidade_id: int, mes_referencia: str) -> Tuple[List[str], Iterator[List[tuple]]]:
+    """Fluxo de caixa completo do mês em lotes, já com títulos e valores em Reais (exportação)."""
+    return db.consultar_em_lotes(f"""
+        SELECT data_pagamento AS "Data", Tipo AS "Tipo", Descricao AS "Descrição",
+               forma_pagamento AS "Forma de Pagamento", ROUND(valor_pago / 100.0, 2) AS "Valor (R$)"
+        FROM ({_SQL_FLUXO_CAIXA})
+        ORDER BY data_pagamento DESC, Tipo, id
+    """, {'u': unidade_id, 'mes': mes_referencia})
@@ -3,15 +3,22 @@
 
 # import sqlite3
 from conectDB.conexao import conectar
-import pandas as pd
-from datetime import date, datetime
+import hashlib
+from datetime import datetime
 from calendar import monthrange
 import database as db
+from repositories import relatorios_rps as rel_rps
+from services import geral_svc as g_svc
+from services import migracao_svc as mig_svc
+from services import dependencias_svc as dep
+np = dep.preguicoso("numpy")
+pd = dep.preguicoso("pandas")
 
 
 def verificar_status_migracao(unidade_id):
     """
-    Verifica se a unidade está apta a receber migração (deve estar vazia).
+    Verifica se a unidade está apta a receber migração (deve estar vazia,
+    ou ter apenas uma importação interrompida a retomar).
     Retorna: (pode_migrar, qtd_alunos, qtd_matriculas)
     """
     conn = conectar()
@@ -20,79 +27,574 @@ def verificar_status_migracao(unidade_id):
         qm = conn.execute("SELECT COUNT(*) FROM matriculas WHERE unidade_id = ?", (unidade_id,)).fetchone()[0]
         
         estah_limpa = (qa == 0 and qm == 0)
+        if not estah_limpa:
+            # Tudo o que existe veio de um lote interrompido: a importação pode continuar
+            pendente = conn.execute("""
+                SELECT id FROM lotes_importacao WHERE unidade_id = ? AND status = 'EM_ANDAMENTO'
+                ORDER BY id DESC LIMIT 1
+            """, (unidade_id,)).fetchone()
+            if pendente:
+                fora_do_lote = conn.execute("""
+                    SELECT (SELECT COUNT(*) FROM alunos WHERE unidade_id = :u AND lote_importacao_id IS NOT :l)
+                         + (SELECT COUNT(*) FROM matriculas WHERE unidade_id = :u AND lote_importacao_id IS NOT :l)
+                """, {'u': unidade_id, 'l': pendente['id']}).fetchone()[0]
+                estah_limpa = fora_do_lote == 0
         return estah_limpa, qa, qm
     finally:
         conn.close()
 
 def importar_dados_migracao(unidade_id, lista_registros):
     """
-    Processa a importação em lote de forma ATÔMICA.
+    Processa a importação em blocos, com ponto de retomada (ver importar_migracao_em_lotes).
     lista_registros: lista de dicionários contendo os dados limpos.
     """
+    importar_migracao_em_lotes(unidade_id, pd.DataFrame(list(lista_registros), columns=COLUNAS_MIGRACAO))
+
+
+# --- IMPORTAÇÃO EM LOTES (com retomada e reversão) ---
+# Cada importação é um registro em lotes_importacao, e todo aluno, matrícula e mensalidade criado
+# por ela guarda o id do lote (lote_importacao_id). As linhas são gravadas em blocos de TAMANHO_LOTE,
+# cada bloco na sua transação, que também avança linhas_gravadas (o ponto de retomada):
+#   - se a importação cair no meio, o que foi confirmado fica; reenviar os mesmos dados
+#     (mesma assinatura) continua do último bloco gravado
+#   - reverter_lote_importacao apaga o lote inteiro pelos índices de lote_importacao_id
+# Dentro do bloco: disciplinas e canais vêm do cache de referência, alunos do bloco são
+# resolvidos numa consulta, e as inserções usam executemany. Os ids gerados são lidos de volta
+# numa consulta (id > maior id anterior): a transação reserva a escrita desde o início
+# (BEGIN IMMEDIATE) e o AUTOINCREMENT garante ids crescentes na ordem de inserção.
+
+TAMANHO_LOTE = 500  # Também limita os parâmetros da consulta de alunos do bloco (nome IN (...))
+
+# Colunas esperadas em `registros` (já limpas: valor em reais, dia como inteiro)
+COLUNAS_MIGRACAO = ['nome', 'responsavel', 'cpf', 'canal', 'disciplina', 'valor', 'dia_vencimento']
+
+
+def _assinatura(df):
+    """Hash do conteúdo a importar: identifica o mesmo arquivo ao retomar."""
+    h = hashlib.sha256()
+    h.update(pd.util.hash_pandas_object(df[COLUNAS_MIGRACAO].astype(str), index=False).values.tobytes())
+    return h.hexdigest()
+
+
+def _inserir(conn, tabela, sql, linhas):
+    """executemany; devolve os ids gerados, na ordem de `linhas`."""
+    if not linhas:
+        return []
+    ultimo = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {tabela}").fetchone()[0]
+    conn.executemany(sql, linhas)
+    ids = [r[0] for r in conn.execute(f"SELECT id FROM {tabela} WHERE id > ? ORDER BY id", (ultimo,))]
+    if len(ids) != len(linhas):
+        raise RuntimeError(f"Importação interrompida: {tabela} com {len(ids)} ids para {len(linhas)} registros.")
+    return ids
+
+
+def _referencias(df):
+    """({disciplina: id}, {canal em minúsculas: id}); erro se alguma disciplina não estiver cadastrada."""
+    mapa_disc = {r['nome']: r['id'] for r in db.obter_referencia('disciplinas')}
+    faltantes = sorted(set(df['disciplina']) - set(mapa_disc))
+    if faltantes:
+        raise ValueError(f"Disciplina(s) não cadastrada(s) no sistema: {', '.join(map(str, faltantes))}")
+    mapa_canal = {str(r['nome']).strip().casefold(): r['id'] for r in db.obter_referencia('canais_aquisicao')}
+    return mapa_disc, mapa_canal
+
+
+def _ids_canais(canais, mapa_canal):
+    return [mapa_canal.get(str(c).strip().casefold()) if isinstance(c, str) else None for c in canais]
+
+
+def _abrir_lote(conn, unidade_id, assinatura, total, arquivo, usuario):
+    """
+    (id do lote, linhas já gravadas): retoma o lote em andamento da unidade ou cria um novo.
+    Com um lote interrompido de outros dados (arquivo corrigido, outras linhas marcadas para ignorar),
+    recusa: gravar do zero duplicaria as matrículas já confirmadas. O lote precisa ser revertido antes.
+    """
+    with conn:
+        pendente = conn.execute("""
+            SELECT id, arquivo, assinatura, linhas_gravadas FROM lotes_importacao
+            WHERE unidade_id = ? AND status = 'EM_ANDAMENTO'
+            ORDER BY id DESC LIMIT 1
+        """, (unidade_id,)).fetchone()
+        if pendente and pendente['assinatura'] != assinatura:
+            raise ValueError(f"A importação #{pendente['id']} ({pendente['arquivo'] or 'sem nome'}) foi interrompida com "
+                             "outros dados. Envie exatamente o mesmo arquivo (com as mesmas linhas ignoradas) para "
+                             "continuar, ou reverta essa importação antes de importar outro arquivo. Nada foi gravado.")
+        if pendente:
+            return pendente['id'], pendente['linhas_gravadas']
+        cur = conn.execute("""
+            INSERT INTO lotes_importacao (unidade_id, arquivo, usuario, assinatura, total_linhas, data_inicio)
+            VALUES (?,?,?,?,?,?)""", (unidade_id, arquivo, usuario, assinatura, total, datetime.now()))
+        return cur.lastrowid, 0
+
+
+def importar_migracao_em_lotes(unidade_id, registros, tamanho_lote=TAMANHO_LOTE, progresso=None,
+                               arquivo=None, usuario=None):
+    """
+    Importa os registros (DataFrame com COLUNAS_MIGRACAO, uma linha por matrícula) em blocos,
+    com ponto de retomada: reenviar os mesmos registros após uma falha continua de onde parou.
+    progresso(feitos, total, etapa): chamado a cada bloco confirmado (ex: barra de progresso da tela).
+    Retorna {'lote_id', 'retomado_de' (linhas já gravadas antes), 'alunos', 'alunos_existentes',
+    'matriculas', 'mensalidades'} (contagens desta execução).
+    """
+    df = registros.reset_index(drop=True)
+
+    # 1. Referências em memória (validação antes de qualquer escrita)
+    mapa_disc, mapa_canal = _referencias(df)
+
+    hj = datetime.now()
+    mes_ref = hj.strftime("%m/%Y")
+    total = len(df)
+
     conn = conectar()
     try:
-        # Helper de data para calcular vencimento
-        def get_valid_date(year, month, day):
-            try:
-                return date(year, month, day)
-            except ValueError:
-                if month == 12: return date(year, 12, 31)
-                return date(year, month + 1, 1) - pd.Timedelta(days=1)
-
-        hj = datetime.now()
-        mes_ref = hj.strftime("%m/%Y")
-        
-        # Cache local para evitar duplicidade dentro do próprio arquivo
-        cache_alunos = {} 
+        lote_id, inicio = _abrir_lote(conn, unidade_id, _assinatura(df), total, arquivo, usuario)
+        resumo = {'lote_id': lote_id, 'retomado_de': inicio, 'alunos': 0, 'alunos_existentes': 0,
+                  'matriculas': 0, 'mensalidades': 0}
+        mapa_alunos = {}  # nome -> id (alunos já vistos nesta execução)
+        mapa_chaves = {}  # nome -> chave_migracao do aluno (a chave das matrículas deriva dela)
 
-        # Cria dict: {'Matemática': 1, 'Inglês': 3...}
-        df_disc = pd.read_sql("SELECT id, nome FROM disciplinas", conn)
-        mapa_disc = dict(zip(df_disc['nome'], df_disc['id']))
-        
-        with conn: # Início da Transação
-            for row in lista_registros:
-                nome = row['nome']
-                
-                # 1. Busca/Cria Aluno
-                # Verifica no cache da transação
-                aid = cache_alunos.get(nome)
-                
-                if not aid:
-                    # Verifica no banco (caso existam alunos de outra importação manual, 
-                    # embora a trava de segurança evite isso, é bom garantir)
-                    exist = conn.execute("SELECT id FROM alunos WHERE nome=? AND unidade_id=?", (nome, unidade_id)).fetchone()
-                    if exist:
-                        aid = exist[0]
-                    else:
-                        cur = conn.execute("""
-                            INSERT INTO alunos (unidade_id, nome, responsavel_nome, cpf_responsavel, canal_aquisicao) 
-                            VALUES (?,?,?,?,?)""", 
-                            (unidade_id, nome, row['responsavel'], row['cpf'], row['canal']))
-                        aid = cur.lastrowid
-                    cache_alunos[nome] = aid
-
-                # Resolve ID da disciplina
-                nome_disc = row['disciplina']
-                id_disc = mapa_disc.get(nome_disc)
-                if not id_disc:
-                    raise ValueError(f"Disciplina '{nome_disc}' não cadastrada no sistema.")
-                
-                # 2. Cria Matrícula
-                cur = conn.execute("""
-                    INSERT INTO matriculas (unidade_id, aluno_id, id_disciplina, valor_acordado, dia_vencimento, data_inicio, ativo, justificativa_desconto) 
-                    VALUES (?,?,?,?,?,DATE('now'),1, 'Migracao')""",
-                    (unidade_id, aid, id_disc, db.to_cents(row['valor']), row['dia_vencimento']))
-                mid = cur.lastrowid
-                
-                # 3. Gera Mensalidade do Mês Atual
-                dt_venc = get_valid_date(hj.year, hj.month, row['dia_vencimento'])
-                
-                conn.execute("""
-                    INSERT INTO pagamentos (unidade_id, matricula_id, aluno_id, mes_referencia, data_vencimento, valor_pago, status) 
-                    VALUES (?,?,?,?,?,?,1)""",
-                    (unidade_id, mid, aid, mes_ref, dt_venc, db.to_cents(row['valor'])))
-                    
-    except Exception as e:
-        raise e
+        for ini in range(inicio, total, max(1, tamanho_lote)):
+            bloco = df.iloc[ini:ini + tamanho_lote]
+            valores = (bloco['valor'].astype(float) * 100).round().astype(int).tolist()
+            dias = bloco['dia_vencimento'].astype(int).tolist()
+
+            with conn:  # Um bloco = uma transação (checkpoint)
+                conn.execute("BEGIN IMMEDIATE")
+
+                # 2. Alunos do bloco: já existentes na unidade (inclusive de blocos anteriores) ou novos
+                a_resolver = [n for n in dict.fromkeys(bloco['nome']) if n not in mapa_alunos]
+                if a_resolver:
+                    existentes = conn.execute(
+                        f"SELECT nome, id, chave_migracao FROM alunos WHERE unidade_id=? AND nome IN ({','.join('?' * len(a_resolver))})",
+                        (unidade_id, *a_resolver)
+                    ).fetchall()
+                    mapa_alunos.update((r['nome'], r['id']) for r in existentes)
+                    mapa_chaves.update((r['nome'], r['chave_migracao']) for r in existentes if r['chave_migracao'] is not None)
+                    resumo['alunos_existentes'] += len(existentes)
+                novos = bloco[~bloco['nome'].isin(mapa_alunos.keys())].drop_duplicates('nome')
+                chaves_novos = mig_svc.chaves_alunos(novos['nome'], novos['cpf']).tolist()
+                ids_alunos = _inserir(
+                    conn, "alunos",
+                    """INSERT INTO alunos (unidade_id, nome, responsavel_nome, cpf_responsavel, id_canal_aquisicao, lote_importacao_id, chave_migracao)
+                       VALUES (?,?,?,?,?,?,?)""",
+                    list(zip([unidade_id] * len(novos), novos['nome'], novos['responsavel'], novos['cpf'],
+                             _ids_canais(novos['canal'], mapa_canal), [lote_id] * len(novos), chaves_novos))
+                )
+                mapa_alunos.update(zip(novos['nome'], ids_alunos))
+                mapa_chaves.update(zip(novos['nome'], chaves_novos))
+                aids = [mapa_alunos[n] for n in bloco['nome']]
+                chaves_bloco = mig_svc.chaves_alunos(bloco['nome'], bloco['cpf'])
+                chaves_mat = mig_svc.chaves_matriculas(
+                    pd.Series([mapa_chaves.get(n, c) for n, c in zip(bloco['nome'], chaves_bloco)], dtype="int64"),
+                    bloco['disciplina'].map(mapa_disc)
+                ).tolist()
+
+                # 3. Matrículas
+                ids_mat = _inserir(
+                    conn, "matriculas",
+                    """INSERT INTO matriculas (unidade_id, aluno_id, id_disciplina, valor_acordado, dia_vencimento, data_inicio, ativo, justificativa_desconto, lote_importacao_id, chave_migracao)
+                       VALUES (?,?,?,?,?,DATE('now'),1, 'Migracao', ?, ?)""",
+                    [(unidade_id, aid, mapa_disc[disc], valor, dia, lote_id, chave)
+                     for aid, disc, valor, dia, chave in zip(aids, bloco['disciplina'], valores, dias, chaves_mat)]
+                )
+
+                # 4. Mensalidade do mês atual (Pendente / Mensalidade)
+                linhas_pag = [
+                    (unidade_id, mid, aid, mes_ref, db.get_valid_date(hj.year, hj.month, dia), valor, lote_id)
+                    for mid, aid, dia, valor in zip(ids_mat, aids, dias, valores)
+                ]
+                conn.executemany("""
+                    INSERT INTO pagamentos (unidade_id, matricula_id, aluno_id, mes_referencia, data_vencimento, valor_pago, id_status, id_tipo, lote_importacao_id)
+                    VALUES (?,?,?,?,?,?,1,1,?)""", linhas_pag)
+
+                # 5. Checkpoint
+                conn.execute("UPDATE lotes_importacao SET linhas_gravadas=? WHERE id=?", (ini + len(bloco), lote_id))
+
+            resumo['alunos'] += len(novos)
+            resumo['matriculas'] += len(ids_mat)
+            resumo['mensalidades'] += len(linhas_pag)
+            if progresso:
+                progresso(ini + len(bloco), total, f"Lote #{lote_id}")
+
+        with conn:
+            conn.execute("UPDATE lotes_importacao SET status='CONCLUIDO', data_fim=? WHERE id=?", (datetime.now(), lote_id))
+        return resumo
+    finally:
+        conn.close()
+
+
+def buscar_lote_pendente(unidade_id):
+    """Último lote interrompido da unidade (dict) ou None."""
+    conn = conectar()
+    try:
+        r = conn.execute("""
+            SELECT id, arquivo, usuario, total_linhas, linhas_gravadas, data_inicio FROM lotes_importacao
+            WHERE unidade_id = ? AND status = 'EM_ANDAMENTO'
+            ORDER BY id DESC LIMIT 1
+        """, (unidade_id,)).fetchone()
+        return dict(r) if r else None
+    finally:
+        conn.close()
+
+
+def listar_lotes_importacao(unidade_id):
+    """Histórico de importações da unidade (mais recentes primeiro)."""
+    conn = conectar()
+    try:
+        return pd.read_sql_query("""
+            SELECT id, arquivo, usuario, modo, status, linhas_gravadas, total_linhas, data_inicio, data_fim
+            FROM lotes_importacao WHERE unidade_id = ?
+            ORDER BY id DESC
+        """, conn, params=(unidade_id,))
+    finally:
+        conn.close()
+
+
+# Lançamentos ligados ao lote: das matrículas que ele criou ou dos alunos que ele criou (inclusive os
+# sem matrícula, como taxa de matrícula ou cobrança avulsa lançadas depois da importação)
+_SQL_PAGAMENTOS_DO_LOTE = """
+    matricula_id IN (SELECT id FROM matriculas WHERE lote_importacao_id = ?)
+    OR aluno_id IN (SELECT id FROM alunos WHERE lote_importacao_id = ?)
+"""
+
+
+def reverter_lote_importacao(lote_id, unidade_id):
+    """
+    Apaga tudo o que o lote criou (mensalidades, matrículas, fotografias mensais e alunos) numa transação.
+    Lançamentos pendentes criados depois para as matrículas ou alunos do lote (robô, taxas, avulsos) também saem.
+    Bloqueado se houver lançamento já movimentado ou matrícula posterior (fora do lote) desses alunos.
+    Lote incremental: só o que ele inseriu sai; as atualizações de registros existentes permanecem.
+    Retorna {'alunos', 'matriculas', 'mensalidades'} apagados.
+    """
+    conn = conectar()
+    try:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            lote = conn.execute("SELECT status FROM lotes_importacao WHERE id=? AND unidade_id=?",
+                                (lote_id, unidade_id)).fetchone()
+            if not lote:
+                raise ValueError("Lote de importação não encontrado nesta unidade.")
+            if lote['status'] == 'REVERTIDO':
+                raise ValueError("Este lote já foi revertido.")
+
+            recebidos = conn.execute(f"""
+                SELECT COUNT(*) FROM pagamentos
+                WHERE id_status <> 1 AND ({_SQL_PAGAMENTOS_DO_LOTE})
+            """, (lote_id, lote_id)).fetchone()[0]
+            if recebidos:
+                raise ValueError(f"O lote tem {recebidos} lançamento(s) já movimentado(s) (pagos, cancelados ou estornados). "
+                                 "Nada foi apagado.")
+            posteriores = conn.execute("""
+                SELECT COUNT(*) FROM matriculas
+                WHERE aluno_id IN (SELECT id FROM alunos WHERE lote_importacao_id = ?)
+                  AND lote_importacao_id IS NOT ?
+            """, (lote_id, lote_id)).fetchone()[0]
+            if posteriores:
+                raise ValueError(f"Alunos do lote têm {posteriores} matrícula(s) criada(s) depois da importação. "
+                                 "Nada foi apagado.")
+
+            n_pag = conn.execute("DELETE FROM pagamentos WHERE lote_importacao_id = ?", (lote_id,)).rowcount
+            # Pendentes criados depois (sem o id do lote): robô nas matrículas do lote, taxas e cobranças avulsas dos alunos do lote
+            n_pag += conn.execute(f"DELETE FROM pagamentos WHERE {_SQL_PAGAMENTOS_DO_LOTE}", (lote_id, lote_id)).rowcount
+            # Meses já fechados: as matrículas do lote (inclusive as de alunos que já existiam) saem das fotografias
+            rel_rps.retirar_matriculas(conn, unidade_id, [r[0] for r in conn.execute(
+                "SELECT id FROM matriculas WHERE lote_importacao_id = ?", (lote_id,))])
+            n_mat = conn.execute("DELETE FROM matriculas WHERE lote_importacao_id = ?", (lote_id,)).rowcount
+            conn.execute("""
+                DELETE FROM matriculas_competencia
+                WHERE unidade_id = ? AND aluno_id IN (SELECT id FROM alunos WHERE lote_importacao_id = ?)
+            """, (unidade_id, lote_id))
+            n_alu = conn.execute("DELETE FROM alunos WHERE lote_importacao_id = ?", (lote_id,)).rowcount
+            conn.execute("UPDATE lotes_importacao SET status='REVERTIDO', data_fim=? WHERE id=?", (datetime.now(), lote_id))
+        return {'alunos': n_alu, 'matriculas': n_mat, 'mensalidades': n_pag}
+    finally:
+        conn.close()
+
+
+# --- IMPORTAÇÃO INCREMENTAL (unidade que já tem alunos) ---
+# Em vez de bloquear, compara a planilha com a base da unidade por chaves normalizadas
+# (migracao_svc.chaves_alunos / chaves_matriculas), guardadas em chave_migracao e indexadas por unidade:
+#   - a planilha vai para uma tabela temporária e uma única junção traz, por linha, o aluno e a
+#     matrícula ativa com a mesma chave (e os valores atuais para comparar)
+#   - aluno novo é inserido; aluno existente só é atualizado se responsável ou canal mudaram
+#     (célula vazia na planilha não apaga o que está no cadastro)
+#   - matrícula nova é inserida (com a mensalidade do mês); existente só é atualizada se valor ou
+#     vencimento mudaram, junto com as mensalidades pendentes (mesmas regras de alunos_rps)
+#   - o resto é ignorado
+# As telas de cadastro não mantêm as chaves: registros do sistema ficam sem chave e os gatilhos do banco
+# zeram a chave de quem tem nome, CPF, aluno ou disciplina editados. Só esses são calculados: a importação
+# grava as chaves que faltam antes de comparar; a prévia só as calcula, sem gravar nada.
+# A prévia (planejar_migracao_incremental) e a gravação (importar_migracao_incremental) usam o mesmo
+# plano; a gravação recalcula-o dentro da sua transação, então reenviar a planilha é idempotente.
+# O que é inserido fica num lote (modo INCREMENTAL) e pode ser revertido como na importação completa.
+
+ACOES_ALUNO = ('INSERIR', 'ATUALIZAR', 'MANTER')
+ACOES_MATRICULA = ('INSERIR', 'ATUALIZAR', 'IGNORAR')
+COLUNAS_PLANO = ['linha', 'nome', 'disciplina', 'acao_aluno', 'acao_matricula', 'alteracoes']
+
+
+def _chaves_pendentes(conn, unidade_id):
+    """
+    Calcula as chaves que faltam na unidade e as deixa em temp.chaves_pendentes (tabela da conexão:
+    a base não é alterada). Faltam as de cadastros feitos pelo sistema e as que os gatilhos do banco
+    zeraram (nome, CPF, aluno ou disciplina editados depois), então só esses registros são lidos.
+    """
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS chaves_pendentes (tabela TEXT, id INTEGER, chave INTEGER, PRIMARY KEY (tabela, id))")
+    conn.execute("CREATE INDEX IF NOT EXISTS temp.idx_chaves_pendentes ON chaves_pendentes (tabela, chave)")
+    conn.execute("DELETE FROM temp.chaves_pendentes")
+
+    alunos = conn.execute(
+        "SELECT id, nome, cpf_responsavel FROM alunos WHERE unidade_id=? AND chave_migracao IS NULL", (unidade_id,)
+    ).fetchall()
+    if alunos:
+        chaves = mig_svc.chaves_alunos(pd.Series([r['nome'] for r in alunos], dtype=object),
+                                       pd.Series([r['cpf_responsavel'] for r in alunos], dtype=object)).tolist()
+        conn.executemany("INSERT INTO temp.chaves_pendentes VALUES ('alunos',?,?)",
+                         [(r['id'], c) for r, c in zip(alunos, chaves)])
+
+    matriculas = conn.execute("""
+        SELECT m.id, m.id_disciplina, COALESCE(a.chave_migracao, p.chave) AS chave_aluno
+        FROM matriculas m
+        JOIN alunos a ON a.id = m.aluno_id
+        LEFT JOIN temp.chaves_pendentes p ON p.tabela = 'alunos' AND p.id = a.id
+        WHERE m.unidade_id = ? AND m.chave_migracao IS NULL
+    """, (unidade_id,)).fetchall()
+    if matriculas:
+        chaves = mig_svc.chaves_matriculas(pd.Series([r['chave_aluno'] for r in matriculas], dtype="int64"),
+                                           pd.Series([r['id_disciplina'] for r in matriculas], dtype="int64")).tolist()
+        conn.executemany("INSERT INTO temp.chaves_pendentes VALUES ('matriculas',?,?)",
+                         [(r['id'], c) for r, c in zip(matriculas, chaves)])
+
+
+def _gravar_chaves_pendentes(conn):
+    """Grava na base as chaves de temp.chaves_pendentes (só na importação, dentro da sua transação)."""
+    for tabela in ('alunos', 'matriculas'):
+        conn.execute(f"""
+            UPDATE {tabela} SET chave_migracao = (
+                SELECT chave FROM temp.chaves_pendentes p WHERE p.tabela = '{tabela}' AND p.id = {tabela}.id)
+            WHERE id IN (SELECT id FROM temp.chaves_pendentes WHERE tabela = '{tabela}')
+        """)
+    conn.execute("DELETE FROM temp.chaves_pendentes")
+
+
+def _planejar(conn, unidade_id, df, mapa_disc, mapa_canal):
+    """
+    Uma linha por linha da planilha: dados já convertidos (ids, centavos), ids encontrados na base,
+    ações (COLUNAS_PLANO) e chave_aluno. Usa a conexão recebida (sem commit).
+    """
+    n = len(df)
+    id_disc = df['disciplina'].map(mapa_disc).astype("int64")
+    id_canal = pd.Series(_ids_canais(df['canal'], mapa_canal), dtype="float64")
+    valor = (df['valor'].astype(float) * 100).round().astype("int64")
+    dia = df['dia_vencimento'].astype("int64")
+    resp = df['responsavel'].fillna("").astype(str).str.strip()
+    ch_alu = mig_svc.chaves_alunos(df['nome'], df['cpf'])
+    ch_mat = mig_svc.chaves_matriculas(ch_alu, id_disc)
+
+    # Junção única: planilha (tabela temporária) x alunos x matrículas ativas, pelas chaves indexadas
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS entrada_migracao (pos INTEGER PRIMARY KEY, chave_aluno INTEGER, chave_matricula INTEGER)")
+    conn.execute("DELETE FROM temp.entrada_migracao")
+    conn.executemany("INSERT INTO temp.entrada_migracao VALUES (?,?,?)", zip(range(n), ch_alu.tolist(), ch_mat.tolist()))
+    # Chave repetida na base (ex: aluno cadastrado duas vezes): vale o registro mais antigo.
+    # Sem chave gravada, vale a calculada em temp.chaves_pendentes (só na prévia: a importação grava antes).
+    base = pd.read_sql_query("""
+        SELECT e.pos,
+               a.id AS aluno_id, a.responsavel_nome, a.id_canal_aquisicao,
+               m.id AS matricula_id, m.valor_acordado, m.dia_vencimento
+        FROM temp.entrada_migracao e
+        LEFT JOIN alunos a ON a.id = COALESCE(
+            (SELECT MIN(id) FROM alunos WHERE unidade_id = :u AND chave_migracao = e.chave_aluno),
+            (SELECT MIN(id) FROM temp.chaves_pendentes WHERE tabela = 'alunos' AND chave = e.chave_aluno))
+        LEFT JOIN matriculas m ON m.id = COALESCE(
+            (SELECT MIN(id) FROM matriculas WHERE unidade_id = :u AND chave_migracao = e.chave_matricula AND ativo = 1),
+            (SELECT MIN(p.id) FROM temp.chaves_pendentes p JOIN matriculas x ON x.id = p.id AND x.ativo = 1
+             WHERE p.tabela = 'matriculas' AND p.chave = e.chave_matricula))
+        ORDER BY e.pos
+    """, conn, params={'u': unidade_id})
+    conn.execute("DELETE FROM temp.entrada_migracao")
+    base = base.set_index('pos').reindex(range(n))
+
+    # Aluno: decidido na primeira linha de cada chave e repetido nas demais
+    aluno_novo = base['aluno_id'].isna()
+    resp_atual = base['responsavel_nome'].astype(object).where(base['responsavel_nome'].notna(), "")
+    muda_resp = ~aluno_novo & (resp != "") & (resp != resp_atual)
+    canal_atual = base['id_canal_aquisicao'].astype("float64")
+    muda_canal = ~aluno_novo & id_canal.notna() & (id_canal != canal_atual)
+    acao_aluno = pd.Series(np.select([aluno_novo, muda_resp | muda_canal], ['INSERIR', 'ATUALIZAR'], 'MANTER'))
+    acao_aluno = acao_aluno.groupby(ch_alu).transform('first')
+
+    # Matrícula
+    repetida = ch_mat.duplicated()
+    matricula_nova = base['matricula_id'].isna()
+    muda_valor = ~matricula_nova & (valor != base['valor_acordado'])
+    muda_dia = ~matricula_nova & (dia != base['dia_vencimento'])
+    acao_matricula = pd.Series(np.select([repetida, matricula_nova, muda_valor | muda_dia],
+                                         ['IGNORAR', 'INSERIR', 'ATUALIZAR'], 'IGNORAR'))
+
+    nomes_canal = {r['id']: r['nome'] for r in db.obter_referencia('canais_aquisicao')}
+    primeira = ~ch_alu.duplicated()
+    alteracoes = []
+    for i in range(n):
+        partes = []
+        if repetida.iat[i]:
+            partes.append("Matrícula repetida no arquivo")
+        if primeira.iat[i] and muda_resp.iat[i]:
+            partes.append(f"Responsável: {resp_atual.iat[i] or '(vazio)'} → {resp.iat[i]}")
+        if primeira.iat[i] and muda_canal.iat[i]:
+            atual = canal_atual.iat[i]
+            partes.append(f"Canal: {'(vazio)' if pd.isna(atual) else nomes_canal.get(int(atual), int(atual))} → "
+                          f"{nomes_canal.get(int(id_canal.iat[i]))}")
+        if not repetida.iat[i] and muda_valor.iat[i]:
+            partes.append(f"Valor: {g_svc.format_brl(base['valor_acordado'].iat[i] / 100)} → {g_svc.format_brl(valor.iat[i] / 100)}")
+        if not repetida.iat[i] and muda_dia.iat[i]:
+            partes.append(f"Vencimento: dia {int(base['dia_vencimento'].iat[i])} → dia {dia.iat[i]}")
+        alteracoes.append("; ".join(partes))
+
+    return pd.DataFrame({
+        'linha': df['linha'].to_numpy() if 'linha' in df.columns else np.arange(1, n + 1),
+        'nome': df['nome'].to_numpy(),
+        'disciplina': df['disciplina'].to_numpy(),
+        'acao_aluno': acao_aluno.to_numpy(),
+        'acao_matricula': acao_matricula.to_numpy(),
+        'alteracoes': alteracoes,
+        'chave_aluno': ch_alu.to_numpy(),
+        'chave_matricula': ch_mat.to_numpy(),
+        'aluno_id': base['aluno_id'].to_numpy(),
+        'matricula_id': base['matricula_id'].to_numpy(),
+        'responsavel': resp.to_numpy(),
+        'cpf': df['cpf'].to_numpy(),
+        'id_canal': id_canal.to_numpy(),
+        'id_disciplina': id_disc.to_numpy(),
+        'valor_cents': valor.to_numpy(),
+        'dia_vencimento': dia.to_numpy(),
+        'muda_valor': muda_valor.to_numpy() & ~repetida.to_numpy(),
+        'muda_dia': muda_dia.to_numpy() & ~repetida.to_numpy(),
+    })
+
+
+def _resumir_plano(plano):
+    alunos = plano.drop_duplicates('chave_aluno')['acao_aluno'].value_counts()
+    matriculas = plano['acao_matricula'].value_counts()
+    return {
+        'alunos_novos': int(alunos.get('INSERIR', 0)),
+        'alunos_atualizados': int(alunos.get('ATUALIZAR', 0)),
+        'matriculas_novas': int(matriculas.get('INSERIR', 0)),
+        'matriculas_atualizadas': int(matriculas.get('ATUALIZAR', 0)),
+        'ignoradas': int(matriculas.get('IGNORAR', 0)),
+    }
+
+
+def planejar_migracao_incremental(unidade_id, registros):
+    """
+    Prévia da importação incremental: só leitura (as chaves que faltam são calculadas numa tabela temporária).
+    Retorna (plano, resumo): plano com COLUNAS_PLANO, uma linha por linha da planilha;
+    resumo com alunos_novos, alunos_atualizados, matriculas_novas, matriculas_atualizadas e ignoradas.
+    """
+    df = registros.reset_index(drop=True)
+    mapa_disc, mapa_canal = _referencias(df)
+    conn = conectar()
+    try:
+        _chaves_pendentes(conn, unidade_id)
+        plano = _planejar(conn, unidade_id, df, mapa_disc, mapa_canal)
+        return plano[COLUNAS_PLANO], _resumir_plano(plano)
+    finally:
+        conn.close()
+
+
+def importar_migracao_incremental(unidade_id, registros, arquivo=None, usuario=None):
+    """
+    Grava só o que é novo ou mudou (ver planejar_migracao_incremental) numa única transação.
+    Retorna o resumo do plano aplicado, com 'lote_id' e 'mensalidades' (geradas para as matrículas novas).
+    """
+    df = registros.reset_index(drop=True)
+    mapa_disc, mapa_canal = _referencias(df)
+    hj = datetime.now()
+    mes_ref = hj.strftime("%m/%Y")
+
+    conn = conectar()
+    try:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            _chaves_pendentes(conn, unidade_id)
+            _gravar_chaves_pendentes(conn)
+            plano = _planejar(conn, unidade_id, df, mapa_disc, mapa_canal)
+            resumo = _resumir_plano(plano)
+
+            lote_id = _inserir(conn, "lotes_importacao", """
+                INSERT INTO lotes_importacao (unidade_id, arquivo, usuario, assinatura, total_linhas, modo, data_inicio)
+                VALUES (?,?,?,?,?,'INCREMENTAL',?)""", [(unidade_id, arquivo, usuario, _assinatura(df), len(df), hj)])[0]
+            canal = lambda v: None if pd.isna(v) else int(v)
+
+            # 1. Alunos novos (uma vez por chave)
+            novos = plano[plano['acao_aluno'].eq('INSERIR')].drop_duplicates('chave_aluno')
+            ids_alunos = _inserir(
+                conn, "alunos",
+                """INSERT INTO alunos (unidade_id, nome, responsavel_nome, cpf_responsavel, id_canal_aquisicao, lote_importacao_id, chave_migracao)
+                   VALUES (?,?,?,?,?,?,?)""",
+                [(unidade_id, r.nome, r.responsavel, r.cpf, canal(r.id_canal), lote_id, int(r.chave_aluno))
+                 for r in novos.itertuples()]
+            )
+            mapa_alunos = dict(zip(novos['chave_aluno'], ids_alunos))
+            aids = [int(a) if pd.notna(a) else mapa_alunos[c] for a, c in zip(plano['aluno_id'], plano['chave_aluno'])]
+            plano = plano.assign(aluno_id=aids)
+
+            # 2. Alunos alterados (célula vazia mantém o cadastro)
+            alterados = plano[plano['acao_aluno'].eq('ATUALIZAR')].drop_duplicates('chave_aluno')
+            conn.executemany("""
+                UPDATE alunos SET responsavel_nome = COALESCE(NULLIF(?, ''), responsavel_nome),
+                                  id_canal_aquisicao = COALESCE(?, id_canal_aquisicao)
+                WHERE id = ?""", [(r.responsavel, canal(r.id_canal), r.aluno_id) for r in alterados.itertuples()])
+
+            # 3. Matrículas novas e a mensalidade do mês atual (Pendente / Mensalidade)
+            inserir = plano[plano['acao_matricula'].eq('INSERIR')]
+            ids_mat = _inserir(
+                conn, "matriculas",
+                """INSERT INTO matriculas (unidade_id, aluno_id, id_disciplina, valor_acordado, dia_vencimento, data_inicio, ativo, justificativa_desconto, lote_importacao_id, chave_migracao)
+                   VALUES (?,?,?,?,?,DATE('now'),1, 'Migracao', ?, ?)""",
+                [(unidade_id, r.aluno_id, int(r.id_disciplina), int(r.valor_cents), int(r.dia_vencimento), lote_id,
+                  int(r.chave_matricula)) for r in inserir.itertuples()]
+            )
+            linhas_pag = [
+                (unidade_id, mid, r.aluno_id, mes_ref, db.get_valid_date(hj.year, hj.month, int(r.dia_vencimento)),
+                 int(r.valor_cents), lote_id)
+                for mid, r in zip(ids_mat, inserir.itertuples())
+            ]
+            conn.executemany("""
+                INSERT INTO pagamentos (unidade_id, matricula_id, aluno_id, mes_referencia, data_vencimento, valor_pago, id_status, id_tipo, lote_importacao_id)
+                VALUES (?,?,?,?,?,?,1,1,?)""", linhas_pag)
+
+            # 4. Matrículas alteradas e suas mensalidades pendentes
+            atualizar = plano[plano['acao_matricula'].eq('ATUALIZAR')]
+            conn.executemany("UPDATE matriculas SET valor_acordado=?, dia_vencimento=? WHERE id=?",
+                             [(int(r.valor_cents), int(r.dia_vencimento), int(r.matricula_id)) for r in atualizar.itertuples()])
+            # Valor: como em alunos_rps.atualizar_valor_matricula (bolsa ativa = 50%)
+            conn.executemany("""
+                UPDATE pagamentos
+                SET valor_pago = (SELECT CASE WHEN bolsa_ativa THEN CAST(valor_acordado * 0.5 AS INTEGER) ELSE valor_acordado END
+                                  FROM matriculas WHERE id = :m)
+                WHERE aluno_id = :a AND matricula_id = :m AND id_status = 1 AND id_tipo = 1
+            """, [{'a': r.aluno_id, 'm': int(r.matricula_id)} for r in atualizar[atualizar['muda_valor']].itertuples()])
+            # Vencimento: como em alunos_rps.atualizar_dia_vencimento_aluno (não joga boleto para o passado)
+            novos_dias = {int(r.matricula_id): int(r.dia_vencimento) for r in atualizar[atualizar['muda_dia']].itertuples()}
+            ids_dias = list(novos_dias)
+            vencimentos = []
+            for ini in range(0, len(ids_dias), TAMANHO_LOTE):
+                parte = ids_dias[ini:ini + TAMANHO_LOTE]
+                pendentes = conn.execute(f"""
+                    SELECT id, matricula_id, mes_referencia FROM pagamentos
+                    WHERE matricula_id IN ({','.join('?' * len(parte))}) AND id_status = 1 AND id_tipo = 1
+                """, parte).fetchall()
+                for p in pendentes:
+                    mes, ano = (int(x) for x in p['mes_referencia'].split('/'))
+                    nova_data = db.get_valid_date(ano, mes, novos_dias[p['matricula_id']])
+                    if nova_data >= hj.date():
+                        vencimentos.append((nova_data, p['id']))
+            conn.executemany("UPDATE pagamentos SET data_vencimento=? WHERE id=?", vencimentos)
+
+            gravadas = int((plano['acao_matricula'].ne('IGNORAR') | plano['acao_aluno'].ne('MANTER')).sum())
+            conn.execute("UPDATE lotes_importacao SET linhas_gravadas=?, status='CONCLUIDO', data_fim=? WHERE id=?",
+                         (gravadas, datetime.now(), lote_id))
+
+        resumo.update(lote_id=lote_id, mensalidades=len(linhas_pag))
+        return resumo
     finally:
         conn.close()
@@ -1,8 +1,11 @@
+from __future__ import annotations
+
 from typing import Optional
 from conectDB.conexao import conectar
-import pandas as pd
 from calendar import monthrange
 import database as db
+from services import dependencias_svc as dep
+pd = dep.preguicoso("pandas")
 
 
 def atualizar_parametros_unidade(unidade_id: int, mensalidade: float, taxa: float, em_campanha: bool) -> None:
@@ -1,12 +1,189 @@
+import calendar
+from datetime import date
+
 from conectDB.conexao import conectar
-import pandas as pd
+from services import dependencias_svc as dep
+pd = dep.preguicoso("pandas")
+
+# --- FOTOGRAFIA MENSAL DE MATRÍCULAS ---
+# "Quem estava matriculado no mês X" vem de matriculas_competencia para os meses já encerrados
+# (gravada uma vez por competência e lida pelo índice (unidade_id, competencia)); só o mês em
+# aberto, e os futuros, usam a regra por datas sobre matriculas:
+#   Data Início da matrícula <= Fim do Mês E (Ativo ou Data Fim >= Início do Mês)
+# Assim, inativar um aluno hoje não muda mais a lista de meses passados.
+# O fechamento é feito pelo robô ao abrir o Financeiro (fechar_competencias_pendentes); um mês
+# passado que ainda não foi fechado é fechado na primeira leitura. Meses anteriores à primeira
+# matrícula da unidade não são fechados (não há o que fotografar). Depois de fechado, um mês só muda em
+# dois casos: matrícula cadastrada com início retroativo entra nas fotografias (incluir_matricula_retroativa)
+# e matrícula apagada ao reverter uma importação sai delas (retirar_matriculas). O resto fica congelado de
+# propósito: inativações (data fim = hoje), reativações, trocas de valor, bolsa ou vencimento e correções
+# de datas feitas direto no banco não reescrevem meses passados.
+# Cada par (aluno, disciplina) aparece uma vez por competência.
+
+
+def _limites_mes(mes, ano):
+    """(competência 'MM/AAAA', primeiro dia, último dia) do mês, no formato gravado nas matrículas."""
+    ultimo_dia = calendar.monthrange(ano, mes)[1]
+    return f"{mes:02d}/{ano}", date(ano, mes, 1).isoformat(), date(ano, mes, ultimo_dia).isoformat()
+
+
+def _mes_aberto(mes, ano, hoje=None):
+    hj = hoje or date.today()
+    return (ano, mes) >= (hj.year, hj.month)
+
+
+def _valores_periodos(limites):
+    """Trecho VALUES de uma CTE de períodos e seus parâmetros."""
+    return ", ".join(["(?, ?, ?, ?)"] * len(limites)), [v for i, lim in enumerate(limites) for v in (i, *lim)]
+
+
+def _fechar_competencias(conn, unidade_id, periodos):
+    """Grava a fotografia dos meses [(mes, ano)] da unidade numa única instrução (idempotente)."""
+    limites = [_limites_mes(mes, ano) for mes, ano in periodos]
+    valores, params = _valores_periodos(limites)
+    conn.execute(f'''
+        WITH periodos (ordem, competencia, inicio, fim) AS (VALUES {valores})
+        INSERT OR IGNORE INTO matriculas_competencia (unidade_id, competencia, aluno_id, id_disciplina)
+        SELECT m.unidade_id, p.competencia, m.aluno_id, m.id_disciplina
+        FROM periodos p
+        JOIN matriculas m ON m.data_inicio <= p.fim AND (m.ativo = 1 OR m.data_fim >= p.inicio)
+        WHERE m.unidade_id = ?
+          AND m.aluno_id IS NOT NULL
+    ''', params + [unidade_id])
+    conn.executemany(
+        "INSERT OR IGNORE INTO competencias_fechadas (unidade_id, competencia) VALUES (?, ?)",
+        [(unidade_id, lim[0]) for lim in limites]
+    )
+
+
+def _indice_mes(data_iso):
+    """'AAAA-MM-DD' -> ano * 12 + mês - 1 (meses comparáveis como inteiros)."""
+    return int(str(data_iso)[:4]) * 12 + int(str(data_iso)[5:7]) - 1
+
+
+def _garantir_fechamento(conn, unidades, periodos):
+    """
+    Fecha, na mesma conexão, os pares (unidade, mês passado) que ainda não têm fotografia,
+    a partir do mês da primeira matrícula de cada unidade.
+    """
+    competencias = [f"{mes:02d}/{ano}" for mes, ano in periodos]
+    primeiras = {
+        r[0]: _indice_mes(r[1])
+        for r in conn.execute(f'''
+            SELECT unidade_id, MIN(data_inicio) FROM matriculas
+            WHERE unidade_id IN ({", ".join("?" * len(unidades))}) AND data_inicio IS NOT NULL
+            GROUP BY unidade_id
+        ''', list(unidades)).fetchall()
+    }
+    fechados = {
+        (r['unidade_id'], r['competencia'])
+        for r in conn.execute(f'''
+            SELECT unidade_id, competencia FROM competencias_fechadas
+            WHERE unidade_id IN ({", ".join("?" * len(unidades))})
+              AND competencia IN ({", ".join("?" * len(competencias))})
+        ''', list(unidades) + competencias).fetchall()
+    }
+    with conn:
+        for uid in unidades:
+            if uid not in primeiras:
+                continue
+            faltantes = [p for p, c in zip(periodos, competencias)
+                         if (uid, c) not in fechados and p[1] * 12 + p[0] - 1 >= primeiras[uid]]
+            if faltantes:
+                _fechar_competencias(conn, uid, faltantes)
+
+
+def fechar_competencias_pendentes(unidade_id, hoje=None):
+    """
+    Fotografa todos os meses encerrados da unidade que ainda não foram fechados
+    (do mês da primeira matrícula até o mês anterior ao atual). Retorna quantos meses foram fechados.
+    """
+    hj = hoje or date.today()
+    conn = conectar()
+    try:
+        primeira = conn.execute(
+            "SELECT MIN(data_inicio) FROM matriculas WHERE unidade_id = ?", (unidade_id,)
+        ).fetchone()[0]
+        if not primeira:
+            return 0
+        fechados = {
+            r['competencia']
+            for r in conn.execute("SELECT competencia FROM competencias_fechadas WHERE unidade_id = ?", (unidade_id,))
+        }
+        idx_ini = _indice_mes(primeira)
+        idx_fim = hj.year * 12 + hj.month - 1  # Mês atual continua em aberto
+        pendentes = [(i % 12 + 1, i // 12) for i in range(idx_ini, idx_fim)
+                     if f"{i % 12 + 1:02d}/{i // 12}" not in fechados]
+        if pendentes:
+            with conn:
+                _fechar_competencias(conn, unidade_id, pendentes)
+        return len(pendentes)
+    finally:
+        conn.close()
+
+
+def incluir_matricula_retroativa(conn, unidade_id, data_inicio):
+    """
+    Matrícula nova com início num mês já fechado: acrescenta-a (e qualquer outra que falte) às
+    fotografias dos meses fechados a partir de data_inicio. Usa a conexão/transação de quem cadastrou.
+    """
+    idx = _indice_mes(data_inicio.isoformat() if hasattr(data_inicio, "isoformat") else data_inicio)
+    periodos = []
+    for r in conn.execute("SELECT competencia FROM competencias_fechadas WHERE unidade_id = ?", (unidade_id,)):
+        mes, ano = (int(p) for p in r[0].split("/"))
+        if ano * 12 + mes - 1 >= idx:
+            periodos.append((mes, ano))
+    if periodos:
+        _fechar_competencias(conn, unidade_id, periodos)
+    return len(periodos)
+
+
+def retirar_matriculas(conn, unidade_id, ids_matriculas):
+    """
+    Matrículas que vão ser apagadas (reversão de importação): tira das fotografias dos meses fechados
+    os pares (aluno, disciplina) que só estavam lá por causa delas. O par continua no mês se outra
+    matrícula dele, que fica, também cobre o mês. Chamar antes de apagar, na transação de quem apaga.
+    """
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS matriculas_retiradas (id INTEGER PRIMARY KEY)")
+    conn.execute("DELETE FROM temp.matriculas_retiradas")
+    conn.executemany("INSERT OR IGNORE INTO temp.matriculas_retiradas VALUES (?)", [(int(i),) for i in ids_matriculas])
+    removidas = conn.execute('''
+        DELETE FROM matriculas_competencia
+        WHERE rowid IN (
+            WITH meses AS (
+                SELECT competencia, inicio, DATE(inicio, '+1 month', '-1 day') AS fim
+                FROM (SELECT competencia, SUBSTR(competencia, 4, 4) || '-' || SUBSTR(competencia, 1, 2) || '-01' AS inicio
+                      FROM competencias_fechadas WHERE unidade_id = :u)
+            )
+            SELECT mc.rowid
+            FROM matriculas_competencia mc
+            JOIN meses p ON p.competencia = mc.competencia
+            WHERE mc.unidade_id = :u
+              AND EXISTS (SELECT 1 FROM matriculas m JOIN temp.matriculas_retiradas r ON r.id = m.id
+                          WHERE m.aluno_id = mc.aluno_id AND m.id_disciplina = mc.id_disciplina
+                            AND m.data_inicio <= p.fim AND (m.ativo = 1 OR m.data_fim >= p.inicio))
+              AND NOT EXISTS (SELECT 1 FROM matriculas m
+                              WHERE m.unidade_id = :u AND m.aluno_id = mc.aluno_id AND m.id_disciplina = mc.id_disciplina
+                                AND m.id NOT IN (SELECT id FROM temp.matriculas_retiradas)
+                                AND m.data_inicio <= p.fim AND (m.ativo = 1 OR m.data_fim >= p.inicio))
+        )
+    ''', {'u': unidade_id}).rowcount
+    conn.execute("DELETE FROM temp.matriculas_retiradas")
+    return removidas
 
 
 def buscar_lista_alunos_periodo(unidade_id, data_inicio, data_fim):
     """
     Busca alunos que tiveram matrícula ativa em algum momento dentro do período informado.
     Regra: Data Início da matrícula <= Fim do Mês E (Ativo ou Data Fim >= Início do Mês).
+    Mês fechado (período = um mês inteiro já encerrado) sai da fotografia mensal.
     """
+    mes_inteiro = (data_inicio.day == 1 and (data_inicio.year, data_inicio.month) == (data_fim.year, data_fim.month)
+                   and data_fim.day == calendar.monthrange(data_fim.year, data_fim.month)[1])
+    if mes_inteiro:
+        df = buscar_lista_alunos_periodos([unidade_id], [(data_inicio.month, data_inicio.year)])
+        return df[['Aluno', 'Disciplina']].reset_index(drop=True)
+
     conn = conectar()
     try:
         query = '''
@@ -26,3 +203,58 @@ def buscar_lista_alunos_periodo(unidade_id, data_inicio, data_fim):
         return pd.read_sql_query(query, conn, params=(unidade_id, data_fim, data_inicio))
     finally:
         conn.close()
+
+
+def buscar_lista_alunos_periodos(unidades, periodos, hoje=None):
+    """
+    Alunos matriculados em cada unidade e mês numa única consulta (relatórios avulsos e em lote).
+    periodos: [(mes, ano), ...]. Meses encerrados vêm da fotografia; o mês em aberto, da regra por datas.
+    Retorna unidade_id, competencia ('MM/AAAA'), Aluno e Disciplina, ordenados por unidade,
+    período (na ordem recebida), aluno e disciplina.
+    """
+    unidades = list(dict.fromkeys(unidades))
+    periodos = list(dict.fromkeys(periodos))
+    if not unidades or not periodos:
+        return pd.DataFrame(columns=['unidade_id', 'competencia', 'Aluno', 'Disciplina'])
+
+    abertos = {p for p in periodos if _mes_aberto(*p, hoje)}
+    conn = conectar()
+    try:
+        encerrados = [p for p in periodos if p not in abertos]
+        if encerrados:
+            _garantir_fechamento(conn, unidades, encerrados)
+
+        limites = [_limites_mes(mes, ano) for mes, ano in periodos]
+        valores, params = _valores_periodos(limites)
+        marcadores = ", ".join("?" * len(unidades))
+        fechadas = [lim[0] for p, lim in zip(periodos, limites) if p not in abertos] or ['']
+        query = f'''
+            WITH periodos (ordem, competencia, inicio, fim) AS (VALUES {valores})
+            SELECT
+                x.unidade_id,
+                p.competencia,
+                a.nome as Aluno,
+                d.nome as Disciplina
+            FROM (
+                SELECT s.unidade_id, s.competencia, s.aluno_id, s.id_disciplina
+                FROM matriculas_competencia s
+                WHERE s.unidade_id IN ({marcadores})
+                  AND s.competencia IN ({", ".join("?" * len(fechadas))})
+                UNION
+                SELECT m.unidade_id, p.competencia, m.aluno_id, m.id_disciplina
+                FROM periodos p
+                JOIN matriculas m ON m.data_inicio <= p.fim AND (m.ativo = 1 OR m.data_fim >= p.inicio)
+                WHERE p.competencia NOT IN ({", ".join("?" * len(fechadas))})
+                  AND m.unidade_id IN ({marcadores})
+                  AND m.aluno_id IS NOT NULL
+            ) x
+            JOIN periodos p ON p.competencia = x.competencia
+            INNER JOIN disciplinas d ON d.id = x.id_disciplina
+            JOIN alunos a ON x.aluno_id = a.id
+            WHERE a.nome IS NOT NULL
+            ORDER BY x.unidade_id, p.ordem, a.nome, x.id_disciplina
+        '''
+        params += unidades + fechadas + fechadas + unidades
+        return pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
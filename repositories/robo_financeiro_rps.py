@@ -1,9 +1,15 @@
-from typing import Tuple, List, Optional
+from typing import Dict, Tuple, List, Optional
 from conectDB.conexao import conectar
-import pandas as pd
 from datetime import date, datetime
 from calendar import monthrange
 import database as db
+from services import dependencias_svc as dep
+pd = dep.preguicoso("pandas")
+
+def _valor_com_bolsa(valor_cents: int) -> int:
+    """Mensalidade com bolsa (50%) em centavos inteiros, truncada como em alunos_rps.atualizar_valor_matricula."""
+    return int(valor_cents * 0.5)
+
 
 def executar_robo_financeiro(unidade_id: int) -> Tuple[int, int, int]:
     conn = conectar()
@@ -57,7 +63,7 @@ def executar_robo_financeiro(unidade_id: int) -> Tuple[int, int, int]:
                 if not existe_bol:
                     valor_final = val_base
                     if b_ativa and b_meses and b_meses > 0:
-                        valor_final = float(val_base) * 0.50
+                        valor_final = _valor_com_bolsa(val_base)
                         novo_saldo = b_meses - 1
                         novo_status = 1 if novo_saldo > 0 else 0
                         conn.execute("UPDATE matriculas SET bolsa_meses_restantes=?, bolsa_ativa=? WHERE id=?", (novo_saldo, novo_status, mid))
@@ -91,8 +97,191 @@ def executar_robo_financeiro(unidade_id: int) -> Tuple[int, int, int]:
                             conn.execute("""
                                 INSERT INTO despesas (unidade_id, id_categoria, descricao, valor, data_vencimento, mes_referencia, id_status) 
                                 VALUES (?, ?, ?, ?, ?, ?, 1)
-                            """, (unidade_id, cat, desc_item, db.to_cents(cval), _get_valid_date_local(hj.year, hj.month, cdia), mes_str))
+                            """, (unidade_id, cat, desc_item, cval, _get_valid_date_local(hj.year, hj.month, cdia), mes_str))
                             cnt_p += 1
+
+            # --- LEDGER: registra a competência processada (base do modo retroativo) ---
+            _registrar_execucao(conn, unidade_id, mes_str, cnt_d, cnt_r, cnt_p)
         return cnt_d, cnt_r, cnt_p
     finally:
         conn.close()
+
+
+# ==============================================================================
+# MODO RETROATIVO (Catch-up de competências sem execução)
+# ==============================================================================
+
+def _registrar_execucao(conn, unidade_id: int, mes_ref: str, cnt_d: int, cnt_r: int, cnt_p: int) -> None:
+    """Grava (ou acumula) a execução do robô para a competência no ledger `robo_execucoes`."""
+    conn.execute("""
+        INSERT INTO robo_execucoes (unidade_id, mes_referencia, data_execucao, qtd_despesas, qtd_boletos, qtd_rh)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(unidade_id, mes_referencia) DO UPDATE SET
+            data_execucao=excluded.data_execucao,
+            qtd_despesas=qtd_despesas + excluded.qtd_despesas,
+            qtd_boletos=qtd_boletos + excluded.qtd_boletos,
+            qtd_rh=qtd_rh + excluded.qtd_rh
+    """, (unidade_id, mes_ref, datetime.now(), cnt_d, cnt_r, cnt_p))
+
+
+def _competencias_sem_execucao(conn, unidade_id: int, hoje: datetime) -> List[Tuple[int, int, str]]:
+    """
+    Lista as competências entre a última registrada no ledger e o mês atual (exclusive).
+    Sem ledger para a unidade não há referência confiável, então nada é gerado retroativamente.
+    Retorna [(ano, mes, 'MM/AAAA'), ...] em ordem cronológica.
+    """
+    ultimo = conn.execute("""
+        SELECT MAX(substr(mes_referencia, 4, 4) || substr(mes_referencia, 1, 2))
+        FROM robo_execucoes WHERE unidade_id=?
+    """, (unidade_id,)).fetchone()[0]
+    if not ultimo:
+        return []
+
+    idx_ini = int(ultimo[:4]) * 12 + int(ultimo[4:]) # Mês seguinte ao último registrado (base 0)
+    idx_fim = hoje.year * 12 + hoje.month - 1        # Mês atual fica com o robô normal
+    return [(i // 12, i % 12 + 1, f"{i % 12 + 1:02d}/{i // 12}") for i in range(idx_ini, idx_fim)]
+
+
+def executar_robo_retroativo(unidade_id: int) -> List[Dict]:
+    """
+    Gera de uma vez todas as competências que ficaram sem execução do robô
+    (meses em que ninguém abriu o Financeiro da unidade).
+
+    - Descobre as lacunas pelo ledger `robo_execucoes`.
+    - Carrega regras, matrículas, funcionários e o que já existe em poucas consultas.
+    - Monta os lançamentos em memória e grava tudo com executemany numa transação única.
+    - Consome o saldo de bolsa mês a mês, na ordem cronológica das competências.
+
+    Retorna um resumo por competência: [{'mes', 'despesas', 'boletos', 'rh'}, ...]
+    """
+    conn = conectar()
+    try:
+        with conn:
+            competencias = _competencias_sem_execucao(conn, unidade_id, datetime.now())
+            if not competencias:
+                return []
+
+            meses = [c[2] for c in competencias]
+            marcadores = ",".join("?" * len(meses))
+            resumo = {m: {'mes': m, 'despesas': 0, 'boletos': 0, 'rh': 0} for m in meses}
+
+            # --- 1. O QUE JÁ EXISTE NAS COMPETÊNCIAS (evita duplicidade) ---
+            desp_existentes = conn.execute(f"""
+                SELECT recorrente_id, descricao, mes_referencia FROM despesas
+                WHERE unidade_id=? AND mes_referencia IN ({marcadores})
+            """, (unidade_id, *meses)).fetchall()
+            rec_existentes = {(r['recorrente_id'], r['mes_referencia']) for r in desp_existentes if r['recorrente_id']}
+            desc_existentes = {(r['descricao'], r['mes_referencia']) for r in desp_existentes}
+
+            bol_existentes = {
+                (r['matricula_id'], r['mes_referencia'])
+                for r in conn.execute(f"""
+                    SELECT matricula_id, mes_referencia FROM pagamentos
+                    WHERE unidade_id=? AND matricula_id IS NOT NULL AND mes_referencia IN ({marcadores})
+                """, (unidade_id, *meses)).fetchall()
+            }
+
+            # --- 2. FONTES (mesmos critérios do robô mensal) ---
+            regras = conn.execute("""
+                SELECT id, id_categoria, descricao, valor, dia_vencimento, data_criacao
+                FROM despesas_recorrentes WHERE ativo=1 AND unidade_id=?
+            """, (unidade_id,)).fetchall()
+
+            mats = conn.execute("""
+                SELECT id, valor_acordado, aluno_id, dia_vencimento, bolsa_ativa, bolsa_meses_restantes, data_inicio
+                FROM matriculas WHERE ativo=1 AND unidade_id=?
+            """, (unidade_id,)).fetchall()
+
+            funcs = conn.execute("""
+                SELECT id, nome, salario_base, dia_pagamento_salario, data_contratacao
+                FROM funcionarios WHERE ativo=1 AND unidade_id=?
+            """, (unidade_id,)).fetchall()
+
+            custos = conn.execute("""
+                SELECT c.funcionario_id, c.tipo_item, c.nome_item, c.valor, c.dia_vencimento
+                FROM custos_pessoal c
+                INNER JOIN funcionarios f ON (f.id = c.funcionario_id)
+                WHERE f.ativo=1 AND f.unidade_id=?
+            """, (unidade_id,)).fetchall()
+            custos_por_func = {}
+            for c in custos:
+                custos_por_func.setdefault(c['funcionario_id'], []).append(c)
+
+            # --- 3. MONTAGEM DOS LANÇAMENTOS EM MEMÓRIA ---
+            novas_despesas = []   # (unidade_id, recorrente_id, id_categoria, descricao, valor, data_vencimento, mes_referencia)
+            novos_boletos = []    # (unidade_id, matricula_id, aluno_id, mes_referencia, data_vencimento, valor_pago)
+            bolsas_atualizadas = []  # (bolsa_meses_restantes, bolsa_ativa, id)
+
+            for ano, mes, mes_ref in competencias:
+                ano_mes = f"{ano}-{mes:02d}"
+
+                # 3.1 Despesas recorrentes (só a partir do mês de criação da regra)
+                for r in regras:
+                    if r['data_criacao'] and str(r['data_criacao'])[:7] > ano_mes:
+                        continue
+                    if (r['id'], mes_ref) in rec_existentes:
+                        continue
+                    novas_despesas.append((unidade_id, r['id'], r['id_categoria'], r['descricao'], r['valor'],
+                                           db.get_valid_date(ano, mes, r['dia_vencimento']), mes_ref))
+                    resumo[mes_ref]['despesas'] += 1
+
+                # 3.2 Folha e custos de pessoal (só após a contratação)
+                for f in funcs:
+                    if f['data_contratacao'] and str(f['data_contratacao'])[:7] > ano_mes:
+                        continue
+                    desc_sal = f"Salário - {f['nome']}"
+                    if f['salario_base'] and f['salario_base'] > 0 and (desc_sal, mes_ref) not in desc_existentes:
+                        novas_despesas.append((unidade_id, None, 1, desc_sal, f['salario_base'],
+                                               db.get_valid_date(ano, mes, f['dia_pagamento_salario']), mes_ref))
+                        resumo[mes_ref]['rh'] += 1
+
+                    for c in custos_por_func.get(f['id'], []):
+                        desc_item = f"{c['nome_item']} - {f['nome']}"
+                        if c['valor'] and c['valor'] > 0 and (desc_item, mes_ref) not in desc_existentes:
+                            cat = 2 if c['tipo_item'] == "IMPOSTO" else 1
+                            novas_despesas.append((unidade_id, None, cat, desc_item, c['valor'],
+                                                   db.get_valid_date(ano, mes, c['dia_vencimento']), mes_ref))
+                            resumo[mes_ref]['rh'] += 1
+
+            # 3.3 Boletos: percorre as competências por matrícula para consumir a bolsa na ordem certa
+            for m in mats:
+                saldo_bolsa = m['bolsa_meses_restantes'] if m['bolsa_ativa'] and m['bolsa_meses_restantes'] else 0
+                saldo_inicial = saldo_bolsa
+
+                for ano, mes, mes_ref in competencias:
+                    if m['data_inicio'] and str(m['data_inicio'])[:7] > f"{ano}-{mes:02d}":
+                        continue
+                    if (m['id'], mes_ref) in bol_existentes:
+                        continue
+
+                    valor_final = m['valor_acordado']
+                    if saldo_bolsa > 0:
+                        valor_final = _valor_com_bolsa(m['valor_acordado'])
+                        saldo_bolsa -= 1
+
+                    novos_boletos.append((unidade_id, m['id'], m['aluno_id'], mes_ref,
+                                          db.get_valid_date(ano, mes, m['dia_vencimento']), valor_final))
+                    resumo[mes_ref]['boletos'] += 1
+
+                if saldo_bolsa != saldo_inicial:
+                    bolsas_atualizadas.append((saldo_bolsa, 1 if saldo_bolsa > 0 else 0, m['id']))
+
+            # --- 4. GRAVAÇÃO EM LOTE (mesma transação) ---
+            conn.executemany("""
+                INSERT INTO despesas (unidade_id, recorrente_id, id_categoria, descricao, valor, data_vencimento, mes_referencia, id_status)
+                VALUES (?,?,?,?,?,?,?, 1)
+            """, novas_despesas)
+
+            conn.executemany("""
+                INSERT INTO pagamentos (unidade_id, matricula_id, aluno_id, mes_referencia, data_vencimento, valor_pago, id_status, id_tipo)
+                VALUES (?,?,?,?,?,?, 1, 1)
+            """, novos_boletos)
+
+            conn.executemany("UPDATE matriculas SET bolsa_meses_restantes=?, bolsa_ativa=? WHERE id=?", bolsas_atualizadas)
+
+            for r in resumo.values():
+                _registrar_execucao(conn, unidade_id, r['mes'], r['despesas'], r['boletos'], r['rh'])
+
+        return list(resumo.values())
+    finally:
+        conn.close()
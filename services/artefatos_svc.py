@@ -0,0 +1,146 @@
+import contextlib
+import hashlib
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, List, Optional, Tuple
+
+from services import dependencias_svc as dep
+pd = dep.preguicoso("pandas")
+
+# --- CACHE DE ARQUIVOS GERADOS (PDF, Excel) ---
+# Relatórios idênticos não são gerados de novo: a chave é (unidade, tipo, período, versão dos dados),
+# e a versão é um hash do conteúdo (versao_dados). Se os dados mudarem, a chave muda sozinha.
+# Os arquivos ficam em disco, num diretório com tamanho máximo; ao passar do limite, os usados
+# há mais tempo são apagados (LRU pela data de modificação, que é renovada a cada acerto).
+# Compartilhado entre as sessões e entre reinícios do servidor.
+#
+# Uso típico:
+#   data=lambda: artefatos.obter(unidade, "r2", "10/2026", artefatos.versao_dados(df), lambda: gerar(df))
+
+_PADRAO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache_relatorios")
+DIRETORIO = os.environ.get("KUMON_CACHE_DIR", _PADRAO)
+LIMITE_MB = float(os.environ.get("KUMON_CACHE_MB", 200))
+
+_lock = threading.Lock()
+_estatisticas = defaultdict(lambda: {"acertos": 0, "falhas": 0, "geracao_ms": 0.0})  # tipo -> contadores
+
+
+def versao_dados(df, *extras) -> str:
+    """Hash do conteúdo de um DataFrame (colunas, valores e ordem) e de valores extras que mudem o arquivo."""
+    h = hashlib.sha256()
+    h.update(repr((list(df.columns), extras)).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return h.hexdigest()[:32]
+
+
+def _caminho(unidade_id, tipo: str, periodo: str, versao: str) -> str:
+    chave = hashlib.sha256(repr((unidade_id, tipo, periodo, versao)).encode()).hexdigest()[:40]
+    return os.path.join(DIRETORIO, f"{tipo}_{chave}.bin")
+
+
+def ler(unidade_id, tipo: str, periodo: str, versao: str) -> Optional[bytes]:
+    """Bytes do arquivo em cache (conta como acerto) ou None."""
+    caminho = _caminho(unidade_id, tipo, periodo, versao)
+    try:
+        with open(caminho, "rb") as f:
+            dados = f.read()
+    except FileNotFoundError:
+        return None
+    with contextlib.suppress(FileNotFoundError):
+        os.utime(caminho)  # Marca como usado agora (ordem do LRU)
+    with _lock:
+        _estatisticas[tipo]["acertos"] += 1
+    return dados
+
+
+def guardar(unidade_id, tipo: str, periodo: str, versao: str, dados: bytes, geracao_ms: float) -> None:
+    """Guarda um arquivo gerado após uma falha de ler() (ex: gerado em outro processo)."""
+    with _lock:
+        e = _estatisticas[tipo]
+        e["falhas"] += 1
+        e["geracao_ms"] += geracao_ms
+    _gravar(_caminho(unidade_id, tipo, periodo, versao), dados)
+
+
+def obter(unidade_id, tipo: str, periodo: str, versao: str, gerar: Callable[[], bytes]) -> bytes:
+    """Bytes do arquivo em cache; na falta, chama gerar(), guarda o resultado e o devolve."""
+    dados = ler(unidade_id, tipo, periodo, versao)
+    if dados is not None:
+        return dados
+    t0 = time.perf_counter()
+    dados = gerar()
+    guardar(unidade_id, tipo, periodo, versao, dados, (time.perf_counter() - t0) * 1000)
+    return dados
+
+
+def _gravar(caminho: str, dados: bytes) -> None:
+    if len(dados) > LIMITE_MB * 1024 * 1024:
+        return  # Maior que o cache inteiro: não guarda
+    os.makedirs(DIRETORIO, exist_ok=True)
+    temporario = f"{caminho}.{threading.get_ident()}.tmp"
+    with open(temporario, "wb") as f:
+        f.write(dados)
+    os.replace(temporario, caminho)  # Quem ler ao mesmo tempo vê o arquivo antigo ou o completo
+    _despejar()
+
+
+def _arquivos() -> List[Tuple[float, int, str]]:
+    """[(última utilização, tamanho, caminho)] dos arquivos do cache."""
+    itens = []
+    try:
+        with os.scandir(DIRETORIO) as it:
+            for entrada in it:
+                if entrada.is_file() and entrada.name.endswith(".bin"):
+                    info = entrada.stat()
+                    itens.append((info.st_mtime, info.st_size, entrada.path))
+    except FileNotFoundError:
+        pass
+    return itens
+
+
+def _despejar() -> None:
+    """Apaga os arquivos usados há mais tempo até o total caber em LIMITE_MB."""
+    with _lock:
+        itens = sorted(_arquivos())
+        total = sum(tamanho for _, tamanho, _ in itens)
+        limite = LIMITE_MB * 1024 * 1024
+        for _, tamanho, caminho in itens:
+            if total <= limite:
+                break
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+            total -= tamanho
+
+
+def estatisticas() -> List[Tuple[str, int, int, float, Optional[float]]]:
+    """[(tipo, acertos, falhas, taxa de acerto %, tempo médio de geração ms)] desde o início do processo."""
+    with _lock:
+        copia = {t: dict(e) for t, e in _estatisticas.items()}
+    linhas = []
+    for tipo, e in sorted(copia.items()):
+        pedidos = e["acertos"] + e["falhas"]
+        taxa = 100.0 * e["acertos"] / pedidos if pedidos else 0.0
+        media = e["geracao_ms"] / e["falhas"] if e["falhas"] else None
+        linhas.append((tipo, e["acertos"], e["falhas"], taxa, media))
+    return linhas
+
+
+def ocupacao() -> Tuple[int, int]:
+    """(quantidade de arquivos, bytes) atualmente no cache."""
+    itens = _arquivos()
+    return len(itens), sum(tamanho for _, tamanho, _ in itens)
+
+
+def limpar() -> None:
+    """Apaga todos os arquivos do cache e zera as estatísticas."""
+    with _lock:
+        for _, _, caminho in _arquivos():
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+        _estatisticas.clear()
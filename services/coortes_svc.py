@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+from datetime import date
+from typing import Optional
+from services import dependencias_svc as dep
+np = dep.preguicoso("numpy")
+pd = dep.preguicoso("pandas")
+
+# Teto para a vida média estimada (evita LTV infinito quando quase ninguém cancela)
+LIMITE_VIDA_MESES = 60
+
+DIMENSOES = {"disciplina": "Disciplina", "canal": "Canal de Aquisição"}
+
+
+def _indice_mes(datas: pd.Series) -> np.ndarray:
+    """Converte datas em um índice contínuo de meses (NaN quando vazio ou inválido)."""
+    dt = pd.to_datetime(datas, errors="coerce")
+    return (dt.dt.year * 12 + dt.dt.month - 1).to_numpy(dtype=float, na_value=np.nan)
+
+
+def preparar_intervalos(historico: pd.DataFrame, hoje: Optional[date] = None) -> pd.DataFrame:
+    """
+    Transforma o histórico de matrículas (dashboard_rps.buscar_historico_matriculas) em intervalos:
+    - coorte: mês de início ('AAAA-MM')
+    - tempo: meses de permanência (até o encerramento ou, se ativa, até hoje)
+    - evento: True quando a matrícula foi encerrada (cancelamento); ativas são censuradas
+
+    Encerramento no próprio mês de início conta como saída no 1º mês.
+    Matrícula inativa sem data_fim é tratada como encerrada no mês de início.
+    """
+    hj = hoje or date.today()
+    idx_hoje = hj.year * 12 + hj.month - 1
+
+    df = historico.copy()
+    ini = _indice_mes(df["data_inicio"])
+    df = df.loc[~np.isnan(ini)].copy()
+    ini = ini[~np.isnan(ini)].astype(int)
+
+    ativo = pd.to_numeric(df["ativo"], errors="coerce").fillna(0).to_numpy() > 0
+    fim = _indice_mes(df["data_fim"])
+    fim = np.where(ativo, idx_hoje, np.where(np.isnan(fim), ini, fim)).astype(int)
+
+    evento = ~ativo
+    tempo = np.clip(fim - ini, 0, None)
+    tempo = np.where(evento, np.maximum(tempo, 1), tempo)
+
+    df["idx_inicio"] = ini
+    df["coorte"] = [f"{i // 12}-{i % 12 + 1:02d}" for i in ini]
+    df["tempo"] = tempo
+    df["evento"] = evento
+    df["valor_mensal"] = pd.to_numeric(df["valor_acordado"], errors="coerce").fillna(0).to_numpy() / 100.0
+    df.attrs["idx_hoje"] = idx_hoje
+    return df
+
+
+def _grupos(intervalos: pd.DataFrame, por: Optional[str]):
+    if por is None:
+        return np.zeros(len(intervalos), dtype=int), pd.Index(["Geral"])
+    codigos, rotulos = pd.factorize(intervalos[por].fillna("Não informado"), sort=True)
+    return codigos, pd.Index(rotulos)
+
+
+def matriz_retencao(intervalos: pd.DataFrame, meses: int = 12) -> pd.DataFrame:
+    """
+    Tabela de coortes: uma linha por mês de início e uma coluna por mês de vida (0..meses).
+    Cada célula é o % da coorte ainda matriculado após k meses, considerando apenas quem
+    já poderia ter completado k meses (células futuras ficam vazias).
+    """
+    if intervalos.empty:
+        return pd.DataFrame()
+
+    k = np.arange(meses + 1)
+    tempo = intervalos["tempo"].to_numpy()[:, None]
+    evento = intervalos["evento"].to_numpy()[:, None]
+    ini = intervalos["idx_inicio"].to_numpy()[:, None]
+
+    # (N, K): a matrícula segue ativa no mês k? / o mês k já é observável?
+    retido = np.where(evento, tempo > k, tempo >= k)
+    observado = np.where(evento, ini + k <= intervalos.attrs["idx_hoje"], tempo >= k)
+
+    codigos, coortes = pd.factorize(intervalos["coorte"], sort=True)
+    n_coortes = len(coortes)
+    retidos = np.zeros((n_coortes, k.size))
+    observados = np.zeros((n_coortes, k.size))
+    np.add.at(retidos, codigos, retido & observado)
+    np.add.at(observados, codigos, observado)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = np.where(observados > 0, retidos / observados * 100, np.nan)
+    pct[:, 0] = 100.0
+
+    matriz = pd.DataFrame(pct, index=coortes, columns=k)
+    matriz.insert(0, "tamanho", np.bincount(codigos, minlength=n_coortes))
+    matriz.index.name = "coorte"
+    return matriz
+
+
+def curvas_sobrevivencia(intervalos: pd.DataFrame, por: Optional[str] = None, meses: int = 24) -> pd.DataFrame:
+    """
+    Curvas de sobrevivência (Kaplan-Meier) por grupo: % das matrículas que permanecem após k meses,
+    tratando as ativas como censuradas. Retorna formato longo: grupo, mes, sobrevivencia, em_risco.
+    """
+    if intervalos.empty:
+        return pd.DataFrame(columns=["grupo", "mes", "sobrevivencia", "em_risco"])
+
+    codigos, rotulos = _grupos(intervalos, por)
+    g = len(rotulos)
+    tempo = np.minimum(intervalos["tempo"].to_numpy(), meses + 1)
+    evento = intervalos["evento"].to_numpy()
+
+    saidas = np.zeros((g, meses + 2))
+    total = np.zeros((g, meses + 2))
+    np.add.at(total, (codigos, tempo), 1)
+    np.add.at(saidas, (codigos[evento], tempo[evento]), 1)
+
+    # Em risco no mês k = quem permaneceu pelo menos k meses (soma acumulada reversa)
+    em_risco = total[:, ::-1].cumsum(axis=1)[:, ::-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        risco = np.where(em_risco > 0, saidas / em_risco, 0.0)
+    risco[:, 0] = 0.0
+    sobrevivencia = np.cumprod(1 - risco, axis=1)[:, :meses + 1] * 100
+
+    return pd.DataFrame({
+        "grupo": np.repeat(rotulos.to_numpy(), meses + 1),
+        "mes": np.tile(np.arange(meses + 1), g),
+        "sobrevivencia": sobrevivencia.ravel(),
+        "em_risco": em_risco[:, :meses + 1].ravel().astype(int),
+    })
+
+
+def resumo_retencao(intervalos: pd.DataFrame, por: Optional[str] = None) -> pd.DataFrame:
+    """
+    Indicadores por grupo:
+    - churn_mensal: cancelamentos / meses-matrícula expostos (%)
+    - vida_media: 1 / churn mensal, limitada a LIMITE_VIDA_MESES (meses)
+    - ltv: valor médio da mensalidade x vida média (Reais)
+    """
+    colunas = ["grupo", "matriculas", "ativas", "encerradas", "churn_mensal", "vida_media", "ticket_medio", "ltv"]
+    if intervalos.empty:
+        return pd.DataFrame(columns=colunas)
+
+    codigos, rotulos = _grupos(intervalos, por)
+    g = len(rotulos)
+    evento = intervalos["evento"].to_numpy()
+
+    matriculas = np.bincount(codigos, minlength=g)
+    encerradas = np.bincount(codigos, weights=evento, minlength=g)
+    exposicao = np.bincount(codigos, weights=intervalos["tempo"].to_numpy(), minlength=g)
+    valor = np.bincount(codigos, weights=intervalos["valor_mensal"].to_numpy(), minlength=g)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        churn = np.where(exposicao > 0, encerradas / exposicao, 0.0)
+        vida = np.where(churn > 0, np.minimum(1 / churn, LIMITE_VIDA_MESES), LIMITE_VIDA_MESES)
+    ticket = valor / np.maximum(matriculas, 1)
+
+    return pd.DataFrame({
+        "grupo": rotulos.to_numpy(),
+        "matriculas": matriculas,
+        "ativas": matriculas - encerradas.astype(int),
+        "encerradas": encerradas.astype(int),
+        "churn_mensal": churn * 100,
+        "vida_media": vida,
+        "ticket_medio": ticket,
+        "ltv": ticket * vida,
+    }, columns=colunas)
+
+
+def analisar_coortes(historico: pd.DataFrame, por: str = "disciplina", meses: int = 12, hoje: Optional[date] = None) -> dict:
+    """
+    Executa a análise completa sobre o histórico inteiro da unidade (uma única carga):
+    matriz de coortes, curvas de sobrevivência e resumo por dimensão, além do total geral.
+    """
+    intervalos = preparar_intervalos(historico, hoje)
+    curvas = pd.concat([curvas_sobrevivencia(intervalos, None, meses * 2),
+                        curvas_sobrevivencia(intervalos, por, meses * 2)], ignore_index=True)
+    resumo = pd.concat([resumo_retencao(intervalos, por),
+                        resumo_retencao(intervalos, None)], ignore_index=True)
+    return {
+        "matriz": matriz_retencao(intervalos, meses),
+        "curvas": curvas,
+        "resumo": resumo,
+    }
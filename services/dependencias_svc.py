@@ -0,0 +1,87 @@
+import importlib
+import importlib.util
+import sys
+import threading
+import time
+import types
+from typing import List, Tuple
+
+from services import desempenho_svc as perf
+
+# --- IMPORTAÇÃO SOB DEMANDA ---
+# Bibliotecas pesadas (pandas, numpy, plotly, fpdf, docxtpl) só são carregadas no primeiro uso:
+#   pd = dep.preguicoso("pandas")      # no lugar de: import pandas as pd
+# O tempo de cada primeira importação fica registrado (e entra na fase "importacao" da página).
+# Módulos que anotam tipos com pd.DataFrame usam `from __future__ import annotations`
+# para que a anotação não force a importação.
+
+# Carregadas em segundo plano na primeira página aberta (usadas por quase todas as telas)
+COMUNS = ("pandas", "numpy", "plotly.express")
+
+_tempos = {}  # módulo -> (ms, thread que importou)
+_lock = threading.Lock()
+_aquecimento = None
+
+
+def importar(nome: str) -> types.ModuleType:
+    """importlib.import_module medido (só a primeira importação do processo é registrada)."""
+    if nome in sys.modules:
+        # Pode estar sendo importado por outra thread: import_module espera a conclusão
+        return importlib.import_module(nome)
+    with perf.fase("importacao"):
+        t0 = time.perf_counter()
+        modulo = importlib.import_module(nome)
+        ms = (time.perf_counter() - t0) * 1000
+    with _lock:
+        _tempos.setdefault(nome, (ms, threading.current_thread().name))
+    return modulo
+
+
+class _ModuloPreguicoso(types.ModuleType):
+    """Representa o módulo até o primeiro acesso a um atributo; então importa e copia o conteúdo."""
+
+    def __init__(self, nome: str):
+        super().__init__(nome)
+        self.__dict__["_nome_real"] = nome
+
+    def __getattr__(self, atributo):
+        modulo = importar(self.__dict__["_nome_real"])
+        self.__dict__.update(modulo.__dict__)  # Próximos acessos não passam mais por aqui
+        return getattr(modulo, atributo)
+
+
+def preguicoso(nome: str) -> types.ModuleType:
+    return _ModuloPreguicoso(nome)
+
+
+def disponivel(nome: str) -> bool:
+    """A biblioteca está instalada? (sem importá-la)"""
+    try:
+        return importlib.util.find_spec(nome) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def aquecer(modulos=COMUNS) -> None:
+    """Importa `modulos` numa thread em segundo plano (uma vez por processo)."""
+    global _aquecimento
+    with _lock:
+        if _aquecimento is not None:
+            return
+        _aquecimento = threading.Thread(target=_aquecer, args=(modulos,), name="aquecimento", daemon=True)
+    _aquecimento.start()
+
+
+def _aquecer(modulos) -> None:
+    for nome in modulos:
+        try:
+            importar(nome)
+        except ImportError:
+            pass  # Opcional: a página mostra o aviso quando precisar da biblioteca
+
+
+def tempos_importacao() -> List[Tuple[str, float, str]]:
+    """[(módulo, ms, origem)] das bibliotecas carregadas por este serviço, mais lentas primeiro."""
+    with _lock:
+        itens = [(nome, ms, origem) for nome, (ms, origem) in _tempos.items()]
+    return sorted(itens, key=lambda x: x[1], reverse=True)
@@ -0,0 +1,167 @@
+import functools
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Optional
+
+# --- ORÇAMENTO DE LATÊNCIA POR PÁGINA ---
+# Cada execução de página (ou de fragmento) vira uma amostra com o tempo gasto em cada fase.
+# As fases são exclusivas: o tempo de banco dentro do robô conta como "banco", não como "robo",
+# e "renderizacao" é o que sobra do total (desenho dos widgets e demais trechos não marcados).
+# As amostras ficam só em memória, nas últimas AMOSTRAS execuções de cada página.
+
+AMOSTRAS = 200
+
+# Orçamento de referência para o p95 de uma execução completa (ms)
+ORCAMENTO_MS = float(os.environ.get("KUMON_ORCAMENTO_MS", 1000))
+
+FASES = {
+    "auth": "Autenticação / Menu",
+    "robo": "Robô Financeiro",
+    "banco": "Consultas ao Banco",
+    "processamento": "Processamento (DataFrames)",
+    "importacao": "Importação de Bibliotecas",
+    "renderizacao": "Renderização",
+    "pausa": "Pausas (time.sleep)",
+}
+
+_amostras = defaultdict(lambda: deque(maxlen=AMOSTRAS))  # nome -> deque[{fase: ms, 'total': ms}]
+_lock = threading.Lock()
+_local = threading.local()  # Medição ativa na thread do script
+
+
+class Medicao:
+    """Execução em andamento: início, tempo exclusivo por fase e pilha de fases abertas."""
+
+    def __init__(self, nome: str):
+        self.nome = nome
+        self.inicio = self.ultimo = time.perf_counter()
+        self.fases = defaultdict(float)
+        self.pilha = []  # [[fase, tempo já atribuído a fases internas], ...]
+        self.encerrada = False
+
+    def acumular(self, fase: str, exclusivo: float, total: float) -> None:
+        self.fases[fase] += exclusivo
+        if self.pilha:
+            self.pilha[-1][1] += total  # Descontado da fase que envolve esta
+        self.ultimo = time.perf_counter()
+
+
+def atual() -> Optional[Medicao]:
+    m = getattr(_local, "medicao", None)
+    return m if m is not None and not m.encerrada else None
+
+
+def iniciar(nome: str) -> Medicao:
+    """Abre a medição de uma execução na thread atual."""
+    m = Medicao(nome)
+    _local.medicao = m
+    return m
+
+
+def encerrar(m: Medicao, fim: Optional[float] = None) -> None:
+    """
+    Fecha a medição e grava a amostra. Sem `fim`, usa o instante atual.
+    Execuções interrompidas (st.stop/st.rerun) são fechadas depois com fim=m.ultimo.
+    """
+    if m.encerrada:
+        return
+    m.encerrada = True
+    total = max(0.0, (fim if fim is not None else time.perf_counter()) - m.inicio)
+    amostra = {f: s * 1000 for f, s in m.fases.items()}
+    amostra["renderizacao"] = max(0.0, total - sum(m.fases.values())) * 1000
+    amostra["total"] = total * 1000
+    with _lock:
+        _amostras[m.nome].append(amostra)
+    if getattr(_local, "medicao", None) is m:
+        _local.medicao = None
+
+
+@contextmanager
+def fase(nome: str):
+    """Atribui o tempo do bloco à fase `nome` (sem efeito fora de uma medição)."""
+    m = atual()
+    if m is None:
+        yield
+        return
+    item = [nome, 0.0]
+    m.pilha.append(item)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracao = time.perf_counter() - t0
+        m.pilha.pop()
+        m.acumular(nome, duracao - item[1], duracao)
+
+
+def na_fase(nome: str):
+    """Decorador: o tempo de cada chamada da função conta na fase `nome`."""
+    def decorador(func):
+        @functools.wraps(func)
+        def medido(*args, **kwargs):
+            with fase(nome):
+                return func(*args, **kwargs)
+        return medido
+    return decorador
+
+
+@contextmanager
+def trecho(nome: str):
+    """
+    Mede um trecho como execução própria (ex: rerun de fragmento).
+    Quando roda dentro de outra medição, as fases também somam na execução que o envolve.
+    """
+    externa = atual()
+    m = iniciar(nome)
+    try:
+        yield m
+    finally:
+        encerrar(m)
+        _local.medicao = externa
+        if externa is not None:
+            for f, s in m.fases.items():
+                externa.fases[f] += s
+            if externa.pilha:
+                externa.pilha[-1][1] += sum(m.fases.values())
+
+
+def registrar_banco(segundos: float) -> None:
+    """Chamado pela conexão a cada operação no SQLite."""
+    m = atual()
+    if m is not None:
+        m.acumular("banco", segundos, segundos)
+
+
+def pausa(segundos: float) -> None:
+    """time.sleep contabilizado (pausas para leitura de toasts/mensagens)."""
+    with fase("pausa"):
+        time.sleep(segundos)
+
+
+# ==============================================================================
+# CONSULTA DAS AMOSTRAS
+# ==============================================================================
+
+def resumo():
+    """p50/p95 (ms) por página e fase (DataFrame): pagina, fase, execucoes, p50, p95, media."""
+    import numpy as np
+    import pandas as pd
+
+    with _lock:
+        copia = {nome: list(d) for nome, d in _amostras.items()}
+
+    linhas = []
+    for nome, amostras in copia.items():
+        for f in ["total", *FASES]:
+            valores = np.array([a.get(f, 0.0) for a in amostras])
+            p50, p95 = np.percentile(valores, [50, 95])
+            linhas.append((nome, f, len(valores), p50, p95, valores.mean()))
+    return pd.DataFrame(linhas, columns=["pagina", "fase", "execucoes", "p50", "p95", "media"])
+
+
+def limpar() -> None:
+    with _lock:
+        _amostras.clear()
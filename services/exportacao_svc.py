@@ -0,0 +1,146 @@
+import csv
+import functools
+import io
+import pickle
+import tempfile
+from typing import BinaryIO, Dict, Iterable, List, Sequence
+
+from services import dependencias_svc as dep
+
+# --- EXPORTAÇÃO EM LOTES (xlsx, CSV, Parquet) ---
+# Recebe os nomes das colunas e um iterável de lotes de linhas (ex: database.consultar_em_lotes)
+# e grava o arquivo lote a lote, sem montar o resultado inteiro num DataFrame:
+#   - xlsx: xlsxwriter em modo constant_memory (cada linha vai para o disco ao ser escrita)
+#   - CSV: padrão do Excel em português (separador ';' e vírgula decimal, UTF-8 com BOM)
+#   - Parquet: um row group por lote, com o esquema unificado entre os lotes (pyarrow, se instalado)
+# O arquivo é montado num temporário em disco; só os bytes finais vão para o download.
+#
+# Uso típico:
+#   colunas, lotes = rps.exportacao_historico_movimentacoes_cofres(unidade)
+#   dados = exportacao.gerar(colunas, lotes, "xlsx")
+
+FORMATOS = {
+    "xlsx": {"rotulo": "Excel (.xlsx)", "mime": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+             "biblioteca": "xlsxwriter"},
+    "csv": {"rotulo": "CSV (;)", "mime": "text/csv", "biblioteca": None},
+    "parquet": {"rotulo": "Parquet", "mime": "application/vnd.apache.parquet", "biblioteca": "pyarrow"},
+}
+
+LINHAS_POR_PLANILHA = 1_048_575  # Limite do Excel (menos o cabeçalho): o restante continua numa nova aba
+_MEMORIA_MAX = 8 * 1024 * 1024   # Até aqui o temporário fica em memória; acima, vai para o disco
+
+
+@functools.lru_cache(maxsize=1)
+def disponiveis() -> Dict[str, dict]:
+    """{formato: informações} dos formatos cujas bibliotecas estão instaladas, na ordem de FORMATOS."""
+    return {f: info for f, info in FORMATOS.items() if info["biblioteca"] is None or dep.disponivel(info["biblioteca"])}
+
+
+def _xlsx(colunas: Sequence[str], lotes: Iterable[List[tuple]], destino: BinaryIO) -> None:
+    xlsxwriter = dep.importar("xlsxwriter")
+    livro = xlsxwriter.Workbook(destino, {"constant_memory": True, "strings_to_numbers": False})
+    negrito = livro.add_format({"bold": True, "bg_color": "#DDDDDD"})
+    planilha, linha = None, LINHAS_POR_PLANILHA
+    for lote in lotes:
+        for registro in lote:
+            if linha >= LINHAS_POR_PLANILHA:
+                planilha = livro.add_worksheet(f"Dados{'' if planilha is None else len(livro.worksheets()) + 1}")
+                planilha.write_row(0, 0, colunas, negrito)
+                linha = 0
+            linha += 1
+            planilha.write_row(linha, 0, registro)
+    if planilha is None:  # Resultado vazio: só o cabeçalho
+        livro.add_worksheet("Dados").write_row(0, 0, colunas, negrito)
+    livro.close()
+
+
+def _valor_csv(valor):
+    if isinstance(valor, float):  # Só troca o separador: arredondar é papel da consulta (ex: ROUND(..., 2))
+        return repr(valor).replace(".", ",")
+    return "" if valor is None else valor
+
+
+def _csv(colunas: Sequence[str], lotes: Iterable[List[tuple]], destino: BinaryIO) -> None:
+    texto = io.TextIOWrapper(destino, encoding="utf-8-sig", newline="")
+    escritor = csv.writer(texto, delimiter=";")
+    escritor.writerow(colunas)
+    for lote in lotes:
+        escritor.writerows([_valor_csv(v) for v in registro] for registro in lote)
+    texto.flush()
+    texto.detach()  # Devolve o destino aberto para quem chamou
+
+
+def _tipo_arrow(pa, tipos_python: set):
+    """Tipo Arrow que comporta todos os tipos Python vistos numa coluna (na dúvida, texto)."""
+    tipos_python = tipos_python - {type(None)}
+    if tipos_python <= {bool}:
+        return pa.bool_() if tipos_python else pa.string()  # Coluna só com nulos vira texto
+    if tipos_python <= {bool, int}:
+        return pa.int64()
+    if tipos_python <= {bool, int, float}:
+        return pa.float64()
+    if tipos_python <= {bytes}:
+        return pa.binary()
+    return pa.string()
+
+
+def _converter(valores, tipo, pa) -> list:
+    if pa.types.is_string(tipo):
+        return [None if v is None else v if isinstance(v, str) else str(v) for v in valores]
+    if pa.types.is_floating(tipo):
+        return [None if v is None else float(v) for v in valores]
+    return list(valores)
+
+
+def _parquet(colunas: Sequence[str], lotes: Iterable[List[tuple]], destino: BinaryIO) -> None:
+    pa = dep.importar("pyarrow")
+    pq = dep.importar("pyarrow.parquet")
+    # O SQLite não tem tipo fixo por coluna (nulos, inteiros e reais se misturam entre lotes) e o
+    # esquema do Parquet é único para o arquivo. Primeira passada: os lotes vão para um temporário
+    # em disco enquanto se anotam os tipos vistos em cada coluna; segunda passada: grava com o esquema unificado.
+    vistos = [set() for _ in colunas]
+    with tempfile.TemporaryFile() as rascunho:
+        for lote in lotes:
+            if not lote:
+                continue
+            for tipos, valores in zip(vistos, zip(*lote)):
+                tipos.update(map(type, valores))
+            pickle.dump(lote, rascunho, protocol=pickle.HIGHEST_PROTOCOL)
+        esquema = pa.schema([(c, _tipo_arrow(pa, t)) for c, t in zip(colunas, vistos)])
+        rascunho.seek(0)
+        escritor = pq.ParquetWriter(destino, esquema)
+        try:
+            while True:
+                try:
+                    lote = pickle.load(rascunho)
+                except EOFError:
+                    break
+                arrays = [pa.array(_converter(v, campo.type, pa), type=campo.type)
+                          for v, campo in zip(zip(*lote), esquema)]
+                escritor.write_batch(pa.RecordBatch.from_arrays(arrays, schema=esquema))
+        finally:
+            escritor.close()  # Vazio: arquivo só com o esquema
+
+
+_ESCRITORES = {"xlsx": _xlsx, "csv": _csv, "parquet": _parquet}
+
+
+def exportar(colunas: Sequence[str], lotes: Iterable[List[tuple]], formato: str, destino: BinaryIO) -> None:
+    """Grava os lotes em `destino` (arquivo binário aberto) no formato pedido."""
+    if formato not in _ESCRITORES:
+        raise ValueError(f"Formato de exportação inválido: {formato}")
+    try:
+        _ESCRITORES[formato](colunas, lotes, destino)
+    finally:
+        fechar = getattr(lotes, "close", None)
+        if fechar:
+            fechar()  # Gerador de consultar_em_lotes: libera a conexão mesmo se a escrita falhar
+
+
+def gerar(colunas: Sequence[str], lotes: Iterable[List[tuple]], formato: str) -> bytes:
+    """Bytes do arquivo exportado (montado num temporário que passa para o disco se crescer)."""
+    with tempfile.SpooledTemporaryFile(max_size=_MEMORIA_MAX) as tmp:
+        exportar(colunas, lotes, formato, tmp)
+        tmp.seek(0)
+        return tmp.read()
+
@@ -1,4 +1,7 @@
 from datetime import date, datetime
+from services import dependencias_svc as dep
+np = dep.preguicoso("numpy")
+pd = dep.preguicoso("pandas")
 
 def format_brl(val):
     if val is None: return "R$ 0,00"
@@ -13,6 +16,19 @@ def validar_cpf(cpf):
     # (Lógica simplificada para manter o código breve, use a sua completa se preferir)
     return True 
 
+def validar_cpfs(cpfs):
+    """Versão vetorizada (com dígitos verificadores) para colunas de CPFs só com dígitos: array de bool por linha."""
+    s = pd.Series(cpfs, dtype="object").fillna("").astype(str)
+    ok = (s.str.len() == 11) & s.str.isdigit()
+    validos = np.zeros(len(s), dtype=bool)
+    if ok.any():
+        d = (np.frombuffer("".join(s[ok]).encode("ascii"), dtype=np.uint8).reshape(-1, 11) - 48).astype(int)
+        dv1 = (d[:, :9] @ np.arange(10, 1, -1)) * 10 % 11 % 10
+        dv2 = (d[:, :10] @ np.arange(11, 1, -1)) * 10 % 11 % 10
+        repetidos = (d == d[:, :1]).all(axis=1)
+        validos[ok.to_numpy()] = (dv1 == d[:, 9]) & (dv2 == d[:, 10]) & ~repetidos
+    return validos
+
 def formatar_cpf(cpf):
     if len(cpf) != 11: return cpf
     return f"{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}"
@@ -43,6 +59,12 @@ def get_status_visual(data_vencimento):
     except Exception:
         return "-"
 
+def situacao_vencimento(datas):
+    """Versão vetorizada de get_status_visual para grades: '🚨 Vencido', '⚠️ Hoje' ou '' por linha."""
+    dt = pd.to_datetime(pd.Series(datas), errors="coerce").dt.date
+    hoje = date.today()
+    return np.select([dt < hoje, dt == hoje], ["🚨 Vencido", "⚠️ Hoje"], default="")
+
 def safe_text(text):
     if not text: return ""
     try:
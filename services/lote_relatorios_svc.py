@@ -0,0 +1,189 @@
+import argparse
+import collections
+import concurrent.futures
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from typing import BinaryIO, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from repositories import relatorios_rps as rps
+from services import artefatos_svc as artefatos
+from services import dependencias_svc as dep
+pdf_svc = dep.preguicoso("services.relatorios_pdf_svc")
+
+# --- RELATÓRIOS EM LOTE (várias unidades e meses num único ZIP) ---
+# Uma consulta traz os alunos de todas as combinações (unidade, mês); cada grupo vira um PDF
+# por tipo pedido, renderizado num pool de processos (o fpdf é CPU puro: threads não ajudam).
+# Os PDFs que já estão no cache entram primeiro; os demais, na ordem das tarefas, à medida que
+# ficam prontos, com no máximo 2 por processo em andamento: a memória não cresce com o lote.
+# Os processos auxiliares são criados por forkserver (spawn onde não houver), nunca por fork: o
+# servidor do Streamlit tem várias threads, e um fork pode herdar travas presas por elas.
+# Cada PDF passa pelo cache de artefatos com a mesma chave do download avulso (8_Relatorios),
+# então o que já foi baixado antes não é renderizado de novo, e vice-versa.
+#
+# Uso típico:
+#   dados = lote.gerar_zip({1: "Centro", 2: "Norte"}, [(10, 2026), (11, 2026)])
+# Ou pela linha de comando (na pasta do projeto):
+#   python -m services.lote_relatorios_svc --unidades 1 2 --meses 10/2026 11/2026 -o relatorios.zip
+
+TIPOS = {
+    "r2": ("R2_Alunos", "gerar_pdf_r2"),
+    "teste": ("Teste_Alunos", "gerar_pdf_teste"),
+}
+
+_MEMORIA_MAX = 8 * 1024 * 1024  # Até aqui o ZIP fica em memória; acima, vai para o disco
+PROCESSOS_TELA = 2  # Teto de processos por download na tela (a linha de comando usa todas as CPUs)
+
+Tarefa = Tuple[int, str, str, str, object]  # (unidade_id, competência, tipo, caminho no ZIP, DataFrame)
+
+
+def _renderizar(tipo: str, df, unidade_nome: str) -> Tuple[bytes, float]:
+    """Executado no processo auxiliar: (bytes do PDF, tempo de geração em ms)."""
+    t0 = time.perf_counter()
+    dados = getattr(pdf_svc, TIPOS[tipo][1])(df, unidade_nome)
+    return dados, (time.perf_counter() - t0) * 1000
+
+
+def _contexto_processos():
+    metodos = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in metodos else "spawn")
+
+
+def _nome_pasta(texto: str) -> str:
+    return "".join("_" if c in '\\/:*?"<>|' else c for c in str(texto)).strip() or "Unidade"
+
+
+def _tarefas(unidades: Dict[int, str], periodos: Sequence[Tuple[int, int]],
+             tipos: Sequence[str]) -> Tuple[List[Tarefa], List[Tuple[str, str]]]:
+    """([tarefas], [(unidade, competência) sem alunos]) na ordem unidade -> mês -> tipo."""
+    df = rps.buscar_lista_alunos_periodos(list(unidades), periodos)
+    grupos = {chave: g for chave, g in df.groupby(['unidade_id', 'competencia'], sort=False)}
+
+    tarefas, vazios = [], []
+    for uid, nome in unidades.items():
+        for mes, ano in dict.fromkeys(periodos):
+            competencia = f"{mes:02d}/{ano}"
+            grupo = grupos.get((uid, competencia))
+            if grupo is None:
+                vazios.append((nome, competencia))
+                continue
+            # Mesmas colunas (e índice) do relatório avulso: a versão no cache coincide
+            dados = grupo[['Aluno', 'Disciplina']].reset_index(drop=True)
+            pasta = f"{_nome_pasta(nome)}/{ano}-{mes:02d}"
+            for tipo in tipos:
+                arquivo = f"{pasta}/{TIPOS[tipo][0]}_{mes:02d}-{ano}.pdf"
+                tarefas.append((uid, competencia, tipo, arquivo, dados))
+    return tarefas, vazios
+
+
+def escrever_zip(unidades: Dict[int, str], periodos: Sequence[Tuple[int, int]], destino: BinaryIO,
+                 tipos: Sequence[str] = tuple(TIPOS), processos: Optional[int] = None) -> dict:
+    """
+    Grava em `destino` um ZIP com os PDFs de cada unidade ({id: nome}) e mês ([(mes, ano)]).
+    Retorna um resumo: arquivos gravados, quantos vieram do cache e as combinações sem alunos.
+    """
+    invalidos = [t for t in tipos if t not in TIPOS]
+    if invalidos:
+        raise ValueError(f"Tipo de relatório inválido: {', '.join(invalidos)}")
+
+    tarefas, vazios = _tarefas(unidades, periodos, tipos)
+    resumo = {"arquivos": 0, "do_cache": 0, "sem_alunos": vazios}
+
+    with zipfile.ZipFile(destino, "w", zipfile.ZIP_STORED) as zf:  # PDF já sai comprimido
+        def gravar(arquivo, dados):
+            zf.writestr(arquivo, dados)
+            resumo["arquivos"] += 1
+
+        # Separa o que já está no cache; só o restante vai para o pool
+        pendentes = []
+        for uid, competencia, tipo, arquivo, df in tarefas:
+            versao = artefatos.versao_dados(df, unidades[uid])
+            pronto = artefatos.ler(uid, tipo, competencia, versao)
+            if pronto is not None:
+                gravar(arquivo, pronto)
+                resumo["do_cache"] += 1
+            else:
+                pendentes.append((uid, competencia, tipo, arquivo, df, versao))
+
+        def concluir(tarefa, dados, ms):
+            uid, competencia, tipo, arquivo, _, versao = tarefa
+            artefatos.guardar(uid, tipo, competencia, versao, dados, ms)
+            gravar(arquivo, dados)
+
+        trabalhadores = min(processos or os.cpu_count() or 1, len(pendentes))
+        if trabalhadores <= 1:
+            for t in pendentes:
+                concluir(t, *_renderizar(t[2], t[4], unidades[t[0]]))
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=trabalhadores,
+                                                        mp_context=_contexto_processos()) as pool:
+                em_andamento = collections.deque()
+                for t in pendentes:
+                    em_andamento.append((t, pool.submit(_renderizar, t[2], t[4], unidades[t[0]])))
+                    if len(em_andamento) >= 2 * trabalhadores:
+                        tarefa, futuro = em_andamento.popleft()
+                        concluir(tarefa, *futuro.result())
+                while em_andamento:
+                    tarefa, futuro = em_andamento.popleft()
+                    concluir(tarefa, *futuro.result())
+
+        if vazios:
+            linhas = [f"{nome} - {competencia}" for nome, competencia in vazios]
+            zf.writestr("SEM_ALUNOS.txt", "Sem alunos no período:\n" + "\n".join(linhas) + "\n")
+    return resumo
+
+
+def gerar_zip(unidades: Dict[int, str], periodos: Sequence[Tuple[int, int]],
+              tipos: Sequence[str] = tuple(TIPOS), processos: Optional[int] = None) -> bytes:
+    """Bytes do ZIP (montado num temporário que passa para o disco se crescer)."""
+    with tempfile.SpooledTemporaryFile(max_size=_MEMORIA_MAX) as tmp:
+        escrever_zip(unidades, periodos, tmp, tipos, processos)
+        tmp.seek(0)
+        return tmp.read()
+
+
+def _mes_ano(texto: str) -> Tuple[int, int]:
+    try:
+        mes, ano = (int(p) for p in texto.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"mês inválido: {texto} (use MM/AAAA)")
+    if not 1 <= mes <= 12:
+        raise argparse.ArgumentTypeError(f"mês inválido: {texto} (use MM/AAAA)")
+    return mes, ano
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    import database as db
+    from conectDB import conexao
+
+    parser = argparse.ArgumentParser(description="Gera os PDFs de controle (R2 e Testes) de várias unidades e meses num ZIP.")
+    parser.add_argument("--unidades", nargs="+", type=int, required=True, help="IDs das unidades")
+    parser.add_argument("--meses", nargs="+", type=_mes_ano, required=True, help="Meses no formato MM/AAAA")
+    parser.add_argument("--tipos", nargs="+", choices=list(TIPOS), default=list(TIPOS))
+    parser.add_argument("--banco", default=conexao.DB_PATH, help="Arquivo do banco (padrão: %(default)s)")
+    parser.add_argument("--processos", type=int, default=None, help="Processos de renderização (padrão: nº de CPUs)")
+    parser.add_argument("-o", "--saida", required=True, help="Arquivo ZIP de saída")
+    args = parser.parse_args(argv)
+
+    conexao.DB_PATH = args.banco
+    nomes = {r['id']: r['nome'] for r in db.obter_referencia('unidades')}
+    faltantes = [u for u in args.unidades if u not in nomes]
+    if faltantes:
+        parser.error(f"unidade(s) não encontrada(s): {', '.join(map(str, faltantes))}")
+    unidades = {u: nomes[u] for u in dict.fromkeys(args.unidades)}
+
+    t0 = time.perf_counter()
+    with open(args.saida, "wb") as f:  # O ZIP é gravado direto no arquivo, PDF a PDF
+        resumo = escrever_zip(unidades, args.meses, f, args.tipos, args.processos)
+    print(f"{resumo['arquivos']} PDF(s) em {args.saida} ({resumo['do_cache']} do cache) "
+          f"em {time.perf_counter() - t0:.1f}s")
+    for nome, competencia in resumo["sem_alunos"]:
+        print(f"  sem alunos: {nome} - {competencia}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import hashlib
+from typing import Iterable, Tuple
+
+from services import geral_svc as g_svc
+from services import dependencias_svc as dep
+np = dep.preguicoso("numpy")
+pd = dep.preguicoso("pandas")
+
+# --- PRÉ-VALIDAÇÃO DA PLANILHA DE MIGRAÇÃO ---
+# Normaliza e valida todas as colunas de uma vez (operações de coluna, sem laço por linha),
+# antes de qualquer escrita no banco. Devolve:
+#   - limpo: só as linhas sem erro, já tipadas nas colunas de migracao_rps.COLUNAS_MIGRACAO
+#   - erros: relatório completo, uma linha por (linha da planilha, coluna) com problema
+# Uma linha ruim não impede mais de ver (ou importar) as demais.
+#
+# Uso típico:
+#   limpo, erros = mig_svc.validar_planilha(df, nomes_disciplinas, nomes_canais)
+
+COLUNAS_OBRIGATORIAS = {"Aluno", "Responsavel", "Disciplina", "Valor", "Dia Vencimento"}
+COLUNAS_MODELO = ["Aluno", "Responsavel", "CPF Responsavel", "Disciplina", "Valor", "Dia Vencimento", "Canal"]
+COLUNAS_ERROS = ["Linha", "Coluna", "Valor", "Erro"]
+
+_PRIMEIRA_LINHA = 2  # Linha 1 da planilha é o cabeçalho
+
+
+def normalizar_colunas(df: pd.DataFrame) -> pd.DataFrame:
+    """Cabeçalhos sem espaços nas pontas e em Title Case ('cpf responsavel' -> 'Cpf Responsavel')."""
+    df = df.copy()
+    df.columns = [str(c).strip().title() for c in df.columns]
+    return df
+
+
+def _texto(serie: pd.Series) -> pd.Series:
+    """Texto sem espaços nas pontas; vazio para células em branco (NaN não vira 'nan')."""
+    return serie.astype("string").str.strip().fillna("").astype(object)
+
+
+def _chave(serie: pd.Series) -> pd.Series:
+    """Chave de comparação de nomes: sem acentos, sem caixa e sem espaços extras."""
+    return (_texto(serie).str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii")
+            .str.casefold().str.split().str.join(" "))
+
+
+def converter_valores(serie: pd.Series) -> pd.Series:
+    """
+    Valores em reais como float (NaN quando não der para converter). Aceita números e textos
+    como 'R$ 1.234,56', '350,50', '350.50' e '1.234' (ponto de milhar).
+    """
+    if pd.api.types.is_numeric_dtype(serie):
+        return pd.to_numeric(serie, errors="coerce").astype(float)
+    t = _texto(serie).str.replace(r"(?i)r\$|\s", "", regex=True)
+    brasileiro = t.str.contains(",", regex=False) | t.str.fullmatch(r"-?\d{1,3}(\.\d{3})+")
+    t = t.where(~brasileiro, t.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    return pd.to_numeric(t, errors="coerce").astype(float)
+
+
+def limpar_cpfs(serie: pd.Series) -> pd.Series:
+    """Só os dígitos do CPF (zeros à esquerda recuperados quando a planilha gravou como número)."""
+    if pd.api.types.is_numeric_dtype(serie):
+        digitos = pd.to_numeric(serie, errors="coerce").astype("Int64").astype("string").fillna("")
+        return digitos.where(digitos == "", digitos.str.zfill(11)).astype(object)
+    return _texto(serie).str.replace(r"\.0$", "", regex=True).str.replace(r"\D", "", regex=True)
+
+
+def formatar_cpfs(digitos: pd.Series) -> pd.Series:
+    """000.000.000-00 para CPFs com 11 dígitos; os demais ficam como estão."""
+    fmt = digitos.str.replace(r"^(\d{3})(\d{3})(\d{3})(\d{2})$", r"\1.\2.\3-\4", regex=True)
+    return fmt.where(digitos.str.len() == 11, digitos)
+
+
+# --- CHAVES DA IMPORTAÇÃO INCREMENTAL ---
+# Aluno: nome (sem acentos, caixa e espaços extras) + dígitos do CPF do responsável.
+# Matrícula: chave do aluno + id da disciplina.
+# Guardadas como hash de 64 bits com sinal (cabe num INTEGER do SQLite e no índice por unidade).
+
+def _hash64(textos: pd.Series) -> pd.Series:
+    """Hash estável (blake2b, 8 bytes) de cada texto: não muda entre versões do Python ou do pandas."""
+    valores = [int.from_bytes(hashlib.blake2b(t.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+               for t in textos]
+    return pd.Series(valores, index=textos.index, dtype="int64")
+
+
+def chaves_alunos(nomes: pd.Series, cpfs: pd.Series) -> pd.Series:
+    """Chave de cada aluno (CPF com ou sem máscara dá a mesma chave)."""
+    nomes, cpfs = nomes.reset_index(drop=True), cpfs.reset_index(drop=True)
+    return _hash64(_chave(nomes) + "|" + limpar_cpfs(cpfs))
+
+
+def chaves_matriculas(chaves_aluno: pd.Series, ids_disciplina: pd.Series) -> pd.Series:
+    """Chave de cada matrícula a partir da chave do aluno e do id da disciplina."""
+    chaves_aluno, ids_disciplina = chaves_aluno.reset_index(drop=True), ids_disciplina.reset_index(drop=True)
+    return _hash64(chaves_aluno.astype("int64").astype(str) + "|" + ids_disciplina.astype("int64").astype(str))
+
+
+def validar_planilha(df: pd.DataFrame, disciplinas: Iterable[str],
+                     canais: Iterable[str] = ()) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    (limpo, erros) da planilha já com colunas normalizadas (normalizar_colunas).
+    disciplinas / canais: nomes cadastrados; a grafia da planilha é trocada pela do cadastro.
+    Canal desconhecido não é erro: o aluno fica sem canal de aquisição.
+    """
+    disciplinas, canais = list(disciplinas), list(canais)
+    bruto = df.reset_index(drop=True)
+    n = len(bruto)
+    vazio = pd.Series([""] * n, dtype=object)
+    coluna = lambda nome: bruto[nome] if nome in bruto.columns else vazio
+
+    nome = _texto(coluna("Aluno"))
+    responsavel = _texto(coluna("Responsavel"))
+    valor = converter_valores(coluna("Valor"))
+    dia = pd.to_numeric(coluna("Dia Vencimento"), errors="coerce")
+    cpf = limpar_cpfs(coluna("Cpf Responsavel"))
+
+    nomes_disc = {k: v for k, v in zip(_chave(pd.Series(list(disciplinas), dtype=object)), disciplinas)}
+    disciplina = _chave(coluna("Disciplina")).map(nomes_disc)
+    nomes_canal = {k: v for k, v in zip(_chave(pd.Series(list(canais), dtype=object)), canais)}
+    canal = _chave(coluna("Canal")).map(nomes_canal)
+
+    # Regras: (máscara de linhas com problema, coluna da planilha, mensagem)
+    regras = [
+        (nome == "", "Aluno", "Nome do aluno vazio"),
+        (valor.isna(), "Valor", "Valor inválido ou vazio"),
+        (valor < 0, "Valor", "Valor negativo"),
+        (dia.isna() | (dia % 1 != 0), "Dia Vencimento", "Dia de vencimento deve ser um número inteiro"),
+        (dia.notna() & (dia % 1 == 0) & ~dia.between(1, 31), "Dia Vencimento", "Dia de vencimento fora de 1 a 31"),
+        (disciplina.isna(), "Disciplina", f"Disciplina não cadastrada (use: {', '.join(disciplinas)})"),
+        ((_texto(coluna("Cpf Responsavel")) != "") & ~g_svc.validar_cpfs(cpf), "Cpf Responsavel", "CPF inválido"),
+        ((nome != "") & disciplina.notna() & pd.DataFrame({"n": nome.str.casefold(), "d": disciplina}).duplicated(),
+         "Disciplina", "Matrícula repetida no arquivo (mesmo aluno e disciplina)"),
+    ]
+
+    partes = []
+    for mascara, col, mensagem in regras:
+        idx = np.flatnonzero(np.asarray(mascara, dtype=bool))
+        if len(idx):
+            original = coluna(col).iloc[idx]
+            partes.append(pd.DataFrame({
+                "Linha": idx + _PRIMEIRA_LINHA,
+                "Coluna": "CPF Responsavel" if col == "Cpf Responsavel" else col,
+                "Valor": original.astype("string").fillna("").to_numpy(),
+                "Erro": mensagem,
+            }))
+    erros = (pd.concat(partes, ignore_index=True).sort_values("Linha", kind="stable").reset_index(drop=True)
+             if partes else pd.DataFrame(columns=COLUNAS_ERROS))
+
+    com_erro = np.zeros(n, dtype=bool)
+    com_erro[erros["Linha"].to_numpy(dtype=int) - _PRIMEIRA_LINHA] = True
+    ok = ~com_erro
+
+    limpo = pd.DataFrame({
+        "nome": nome[ok],
+        "responsavel": responsavel[ok],
+        "cpf": formatar_cpfs(cpf[ok]),
+        "canal": canal[ok].astype(object).where(canal[ok].notna(), None),
+        "disciplina": disciplina[ok],
+        "valor": valor[ok].round(2),
+        "dia_vencimento": dia[ok].astype(int),
+    })
+    limpo.insert(0, "linha", np.flatnonzero(ok) + _PRIMEIRA_LINHA)
+    return limpo.reset_index(drop=True), erros
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from datetime import date
+from typing import Optional
+from services import dependencias_svc as dep
+np = dep.preguicoso("numpy")
+pd = dep.preguicoso("pandas")
+
+# Regra de bolsa do sistema: 50% de desconto enquanto houver meses restantes
+FATOR_BOLSA = 0.5
+
+
+def _indice_mes(ano: int, mes: int) -> int:
+    """Converte (ano, mês) em um índice contínuo de meses (permite aritmética vetorizada)."""
+    return ano * 12 + mes - 1
+
+
+def _indices_ano_mes(serie: pd.Series) -> np.ndarray:
+    """Converte uma série 'MM/AAAA' em índices de mês (NaN quando vazio ou inválido)."""
+    txt = serie.astype("string").str.strip()
+    mes = pd.to_numeric(txt.str[:2], errors="coerce")
+    ano = pd.to_numeric(txt.str[3:7], errors="coerce")
+    return (ano * 12 + mes - 1).to_numpy(dtype=float, na_value=np.nan)
+
+
+def _valores(df: pd.DataFrame, coluna: str = "valor") -> np.ndarray:
+    if df is None or df.empty:
+        return np.zeros(0)
+    return pd.to_numeric(df[coluna], errors="coerce").fillna(0).to_numpy(dtype=float)
+
+
+def projetar_fluxo_caixa(bases: dict, meses: int = 12, inicio: Optional[date] = None) -> pd.DataFrame:
+    """
+    Projeta entradas e saídas mensais da unidade sem gravar nada no banco.
+
+    bases: dicionário de DataFrames vindo de dashboard_rps.buscar_bases_projecao (centavos).
+    meses: horizonte da projeção (12 a 24).
+    inicio: primeiro mês projetado (padrão: mês seguinte ao atual, pois o mês corrente já foi gerado pelo robô).
+
+    Todas as fontes são calculadas de uma vez sobre a grade (itens x meses) com numpy.
+    Retorna um DataFrame por mês com os valores em Reais.
+    """
+    meses = int(min(max(meses, 12), 24))
+    if inicio is None:
+        hj = date.today()
+        idx_inicio = _indice_mes(hj.year, hj.month) + 1
+    else:
+        idx_inicio = _indice_mes(inicio.year, inicio.month)
+
+    idx_meses = idx_inicio + np.arange(meses)   # (M,)
+    passo = np.arange(meses)                    # 0..M-1 (meses à frente)
+
+    # --- 1. MENSALIDADES: valor cheio, ou 50% enquanto a bolsa tiver saldo ---
+    mats = bases.get("matriculas")
+    if mats is not None and not mats.empty:
+        valor = _valores(mats, "valor_acordado")
+        restantes = pd.to_numeric(mats["bolsa_meses_restantes"], errors="coerce").fillna(0).to_numpy()
+        com_bolsa = pd.to_numeric(mats["bolsa_ativa"], errors="coerce").fillna(0).to_numpy() > 0
+        # (N, M): True onde o mês ainda está coberto pela bolsa daquela matrícula
+        em_bolsa = com_bolsa[:, None] & (passo[None, :] < restantes[:, None])
+        mensalidades = (valor[:, None] * np.where(em_bolsa, FATOR_BOLSA, 1.0)).sum(axis=0)
+    else:
+        mensalidades = np.zeros(meses)
+
+    # --- 2. DESPESAS FIXAS E PESSOAL: valor constante por mês ---
+    despesas_fixas = np.full(meses, _valores(bases.get("recorrentes")).sum())
+    pessoal = np.full(meses, _valores(bases.get("pessoal")).sum())
+
+    # --- 3. ROYALTIES: regra vigente = a de início mais recente até o mês, respeitando o fim ---
+    roy = bases.get("royalties")
+    royalties = np.zeros(meses)
+    if roy is not None and not roy.empty:
+        ini = _indices_ano_mes(roy["ano_mes_inicio"])
+        fim = _indices_ano_mes(roy["ano_mes_fim"])
+        val = _valores(roy)
+
+        validos = ~np.isnan(ini)
+        ini, fim, val = ini[validos], fim[validos], val[validos]
+        if ini.size:
+            ordem = np.argsort(ini, kind="stable")
+            ini, fim, val = ini[ordem], fim[ordem], val[ordem]
+
+            pos = np.searchsorted(ini, idx_meses, side="right") - 1   # regra vigente por mês
+            tem_regra = pos >= 0
+            pos = np.clip(pos, 0, None)
+            dentro_fim = np.isnan(fim[pos]) | (idx_meses <= fim[pos])
+            royalties = np.where(tem_regra & dentro_fim, val[pos], 0.0)
+
+    entradas = mensalidades
+    saidas = despesas_fixas + pessoal + royalties
+    saldo = entradas - saidas
+
+    df = pd.DataFrame({
+        "mes_referencia": [f"{i % 12 + 1:02d}/{i // 12}" for i in idx_meses],
+        "mensalidades": mensalidades,
+        "despesas_fixas": despesas_fixas,
+        "pessoal": pessoal,
+        "royalties": royalties,
+        "entradas": entradas,
+        "saidas": saidas,
+        "saldo": saldo,
+        "saldo_acumulado": np.cumsum(saldo),
+    })
+    colunas_valor = df.columns.drop("mes_referencia")
+    df[colunas_valor] = df[colunas_valor] / 100.0
+    return df
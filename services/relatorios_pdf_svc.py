@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+from typing import NamedTuple, Optional, Tuple
+
+from fpdf import FPDF
+
+from services import geral_svc as g_svc
+from services import dependencias_svc as dep
+pd = dep.preguicoso("pandas")
+
+# Geração dos PDFs de controle (R2 e Registro de Testes).
+# Importado sob demanda pela página de relatórios: fpdf só é carregado quando há PDF a gerar.
+#
+# Cada relatório é um Layout (título, colunas, fontes) montado uma vez, no import.
+# A renderização prepara os textos de todas as linhas de uma vez (pandas) e, por página,
+# desenha a grade com linhas (em vez de uma cell() com borda por célula) e escreve só os
+# textos não vazios. Colunas sem campo ficam em branco para preenchimento à mão.
+
+ALTURA_TITULO = 10
+ESPACO_TITULO = 5
+MARGEM_RODAPE = 20  # Mesma margem da quebra automática de página do FPDF
+
+
+class Coluna(NamedTuple):
+    titulo: str
+    largura: float
+    alinhamento: str = 'L'          # 'L' (esquerda) ou 'C' (centro)
+    campo: Optional[str] = None     # Coluna do DataFrame; None = célula em branco
+    max_chars: Optional[int] = None
+    reticencias: str = ''
+
+
+class Layout:
+    """Estrutura fixa de um relatório tabular: posições das colunas e textos do cabeçalho já calculados."""
+
+    def __init__(self, titulo: str, colunas: Tuple[Coluna, ...], orientacao: str = 'P',
+                 fonte_cabecalho: int = 9, fonte_linhas: int = 9, altura_linha: float = 8):
+        self.titulo = titulo  # Aceita {unidade}
+        self.colunas = colunas
+        self.orientacao = orientacao
+        self.fonte_cabecalho = fonte_cabecalho
+        self.fonte_linhas = fonte_linhas
+        self.altura_linha = altura_linha
+        self.cabecalhos = tuple(g_svc.safe_text(c.titulo) for c in colunas)
+        self.xs = []  # Deslocamento de cada coluna a partir da margem esquerda
+        x = 0.0
+        for c in colunas:
+            self.xs.append(x)
+            x += c.largura
+        self.largura_total = x
+        self.preenchidas = tuple(i for i, c in enumerate(colunas) if c.campo)
+
+
+LAYOUT_R2 = Layout(
+    'R2 - Controle de Alunos - {unidade}',
+    (
+        Coluna('Aluno', 75, 'L', 'Aluno', 35, '...'),
+        Coluna('Disciplina', 30, 'L', 'Disciplina'),
+        Coluna('Estágio', 25, 'C'),
+        Coluna('Lição', 25, 'C'),
+        Coluna('Blocos', 35, 'C'),
+    ),
+    orientacao='P', fonte_cabecalho=9, fonte_linhas=9,
+)
+
+_COLUNAS_TESTE = ('Data', 'Teste', 'Tempo', 'Nota', 'Grupo', 'Passou')
+LAYOUT_TESTE = Layout(
+    'Registro de Testes - {unidade}',
+    (
+        Coluna('Aluno', 65, 'L', 'Aluno', 30, '..'),
+        Coluna('Disc.', 20, 'C', 'Disciplina', 3),
+        *(Coluna(c, 16, 'C') for c in _COLUNAS_TESTE * 2),
+    ),
+    orientacao='L', fonte_cabecalho=8, fonte_linhas=8,
+)
+
+
+def _textos_coluna(serie: pd.Series, coluna: Coluna) -> list:
+    """Textos prontos (cortados e em latin-1) de uma coluna inteira, sem laço por linha."""
+    s = serie.fillna('').astype(str)
+    if coluna.max_chars:
+        longos = s.str.len() > coluna.max_chars
+        s = s.where(~longos, s.str.slice(0, coluna.max_chars) + coluna.reticencias)
+    return s.str.encode('latin-1', 'replace').str.decode('latin-1').tolist()
+
+
+def _desenhar_cabecalho(pdf: FPDF, layout: Layout, titulo: str) -> None:
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, ALTURA_TITULO, titulo, 0, 1, 'C')
+    pdf.ln(ESPACO_TITULO)
+    pdf.set_font('Arial', 'B', layout.fonte_cabecalho)
+    pdf.set_fill_color(220, 220, 220)
+    ultima = len(layout.colunas) - 1
+    for i, (c, texto) in enumerate(zip(layout.colunas, layout.cabecalhos)):
+        pdf.cell(c.largura, layout.altura_linha, texto, 1, 1 if i == ultima else 0, c.alinhamento, 1)
+
+
+def _desenhar_rodape(pdf: FPDF) -> None:
+    pdf.set_y(-15)
+    pdf.set_font('Arial', 'I', 8)
+    pdf.cell(0, 10, f'Pág {pdf.page_no()}/{{nb}}', 0, 0, 'C')
+
+
+def renderizar(layout: Layout, df: pd.DataFrame, unidade_nome: str) -> bytes:
+    """Gera o PDF do layout com uma linha por registro de df."""
+    pdf = FPDF(orientation=layout.orientacao, format='A4')
+    pdf.set_auto_page_break(False)  # As quebras são calculadas aqui, por lote de linhas
+    pdf.alias_nb_pages()
+    titulo = g_svc.safe_text(layout.titulo.format(unidade=unidade_nome))
+
+    textos = [_textos_coluna(df[layout.colunas[i].campo], layout.colunas[i]) for i in layout.preenchidas]
+    total = len(df)
+    h = layout.altura_linha
+    x0 = pdf.l_margin
+    topo_linhas = pdf.t_margin + ALTURA_TITULO + ESPACO_TITULO + h
+    por_pagina = max(1, int((pdf.h - MARGEM_RODAPE - topo_linhas) // h))
+    bordas_x = [x0 + x for x in layout.xs] + [x0 + layout.largura_total]
+    alinhamentos = [layout.colunas[i].alinhamento for i in layout.preenchidas]
+    xs = [x0 + layout.xs[i] for i in layout.preenchidas]
+    larguras = [layout.colunas[i].largura for i in layout.preenchidas]
+
+    inicio = 0
+    while True:
+        pdf.add_page()
+        _desenhar_cabecalho(pdf, layout, titulo)
+        lote = range(inicio, min(inicio + por_pagina, total))
+
+        if lote:
+            # Grade do lote: linhas horizontais e verticais no lugar de uma borda por célula
+            fim_y = topo_linhas + len(lote) * h
+            for k in range(1, len(lote) + 1):
+                pdf.line(x0, topo_linhas + k * h, bordas_x[-1], topo_linhas + k * h)
+            for x in bordas_x:
+                pdf.line(x, topo_linhas, x, fim_y)
+
+            # Textos, na linha de base centralizada verticalmente (como cell())
+            pdf.set_font('Arial', '', layout.fonte_linhas)
+            desloc_base = h / 2 + 0.3 * pdf.font_size
+            larguras_texto = {}
+            for j, coluna in enumerate(textos):
+                centro = alinhamentos[j] == 'C'
+                for k, linha in enumerate(lote):
+                    texto = coluna[linha]
+                    if not texto:
+                        continue
+                    if centro:
+                        w = larguras_texto.get(texto)
+                        if w is None:
+                            w = larguras_texto[texto] = pdf.get_string_width(texto)
+                        x = xs[j] + (larguras[j] - w) / 2
+                    else:
+                        x = xs[j] + pdf.c_margin
+                    pdf.text(x, topo_linhas + k * h + desloc_base, texto)
+
+        _desenhar_rodape(pdf)
+        inicio += por_pagina
+        if inicio >= total:
+            break
+    return bytes(pdf.output())
+
+
+def gerar_pdf_r2(df, unidade_nome):
+    return renderizar(LAYOUT_R2, df, unidade_nome)
+
+
+def gerar_pdf_teste(df, unidade_nome):
+    return renderizar(LAYOUT_TESTE, df, unidade_nome)
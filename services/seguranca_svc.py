@@ -0,0 +1,197 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional
+
+import bcrypt
+
+# --- CONFIGURAÇÃO ---
+# Custo fixo via ambiente (ex: KUMON_BCRYPT_ROUNDS=12). Sem ele, o custo é calibrado
+# na primeira utilização para que um hash leve aproximadamente ALVO_MS neste servidor.
+ALVO_MS = float(os.environ.get("KUMON_BCRYPT_ALVO_MS", 250))
+CUSTO_MINIMO = 10
+CUSTO_MAXIMO = 14
+
+# Pool limitado: o hash roda fora da thread do script e nunca ocupa mais que WORKERS núcleos.
+# Pedidos além de MAX_PENDENTES são recusados em vez de enfileirados indefinidamente.
+WORKERS = max(1, min(4, (os.cpu_count() or 2) // 2))
+MAX_PENDENTES = WORKERS * 4
+TEMPO_MAX_S = 10
+
+# Limite de tentativas: após MAX_FALHAS em JANELA_S, bloqueio com espera crescente
+MAX_FALHAS = 5
+JANELA_S = 15 * 60
+BLOQUEIO_BASE_S = 30
+BLOQUEIO_MAX_S = 15 * 60
+MAX_CHAVES = 10_000  # Teto de usuários/IPs acompanhados: acima dele, os menos recentes são descartados
+
+_pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="bcrypt")
+_vagas = threading.BoundedSemaphore(MAX_PENDENTES)
+
+
+class LoginBloqueado(Exception):
+    """Tentativa recusada antes de verificar a senha (excesso de falhas ou servidor ocupado)."""
+
+    def __init__(self, mensagem: str, segundos: float = 0):
+        super().__init__(mensagem)
+        self.segundos = segundos
+
+
+# ==============================================================================
+# CUSTO DO BCRYPT
+# ==============================================================================
+
+@lru_cache(maxsize=1)
+def custo_atual() -> int:
+    """Custo (log2 das rodadas) usado para novos hashes."""
+    fixo = os.environ.get("KUMON_BCRYPT_ROUNDS")
+    if fixo:
+        return int(fixo)
+    return calibrar_custo(ALVO_MS)
+
+
+def calibrar_custo(alvo_ms: float) -> int:
+    """
+    Mede um hash barato (custo 4) e extrapola: cada +1 no custo dobra o tempo.
+    Retorna o maior custo cujo tempo estimado não passa do alvo, entre CUSTO_MINIMO e CUSTO_MAXIMO.
+    """
+    base = 4
+    amostras = []
+    for _ in range(3):
+        t0 = time.perf_counter()
+        bcrypt.hashpw(b"calibracao", bcrypt.gensalt(rounds=base))
+        amostras.append((time.perf_counter() - t0) * 1000)
+    ms_base = max(min(amostras), 1e-3)
+    custo = base + int(math.floor(math.log2(alvo_ms / ms_base)))
+    return max(CUSTO_MINIMO, min(CUSTO_MAXIMO, custo))
+
+
+@lru_cache(maxsize=1)
+def _hash_ficticio() -> bytes:
+    # Hash válido usado quando o usuário não existe (mantém o tempo de resposta igual)
+    return bcrypt.hashpw(b"usuario-inexistente", bcrypt.gensalt(rounds=custo_atual()))
+
+
+def custo_do_hash(hash_armazenado: str) -> Optional[int]:
+    """Lê o custo de um hash no formato $2b$12$... (None se não for bcrypt)."""
+    partes = hash_armazenado.split("$")
+    if len(partes) >= 4 and partes[2].isdigit():
+        return int(partes[2])
+    return None
+
+
+def precisa_rehash(hash_armazenado: str) -> bool:
+    """Só regrava hashes mais fracos que o custo atual (custo maior, ex: definido via ambiente, é mantido)."""
+    custo = custo_do_hash(hash_armazenado)
+    return custo is None or custo < custo_atual()
+
+
+# ==============================================================================
+# EXECUÇÃO NO POOL
+# ==============================================================================
+
+def _executar(funcao, *args):
+    if not _vagas.acquire(blocking=False):
+        raise LoginBloqueado("Muitos acessos simultâneos. Tente novamente em instantes.")
+    try:
+        futuro = _pool.submit(funcao, *args)
+    except Exception:
+        _vagas.release()
+        raise
+    futuro.add_done_callback(lambda _: _vagas.release())
+    return futuro
+
+
+def gerar_hash(senha: str) -> str:
+    """
+    Gera o hash com o custo configurado, fora da thread chamadora.
+    Uso administrativo (cadastro e troca de senha): não passa pelo limite de vagas do login.
+    """
+    salt = bcrypt.gensalt(rounds=custo_atual())
+    return _pool.submit(bcrypt.hashpw, senha.encode("utf-8"), salt).result(TEMPO_MAX_S).decode("utf-8")
+
+
+def verificar_senha(senha: str, hash_armazenado: Optional[str]) -> bool:
+    """Compara a senha com o hash no pool. Usuário inexistente consome o mesmo tempo e falha."""
+    alvo = hash_armazenado.encode("utf-8") if hash_armazenado else None
+
+    def _checar():
+        try:
+            return bcrypt.checkpw(senha.encode("utf-8"), alvo or _hash_ficticio())
+        except ValueError:
+            # Hash inválido/corrompido no banco
+            return False
+
+    ok = _executar(_checar).result(TEMPO_MAX_S)
+    return bool(ok and hash_armazenado)
+
+
+def agendar(funcao, *args) -> None:
+    """Executa uma tarefa no pool sem esperar o resultado (ex: regravar hash após o login)."""
+    try:
+        _executar(funcao, *args)
+    except LoginBloqueado:
+        pass  # Sem vaga: a tarefa é opcional e será refeita no próximo login
+
+
+# ==============================================================================
+# LIMITE DE TENTATIVAS (por usuário e por IP)
+# ==============================================================================
+
+_falhas = {}                   # chave -> horários das falhas recentes (ordem: menos recente primeiro)
+_bloqueado_ate = {}            # chave -> instante de liberação
+_lock_falhas = threading.Lock()
+
+
+def _chaves(usuario: str, ip: Optional[str]):
+    chaves = [f"u:{(usuario or '').strip().lower()}"]
+    if ip:
+        chaves.append(f"ip:{ip}")
+    return chaves
+
+
+def verificar_bloqueio(usuario: str, ip: Optional[str] = None) -> None:
+    """Levanta LoginBloqueado se o usuário ou o IP estiverem em período de espera."""
+    agora = time.monotonic()
+    with _lock_falhas:
+        espera = max((_bloqueado_ate.get(c, 0) - agora for c in _chaves(usuario, ip)), default=0)
+    if espera > 0:
+        raise LoginBloqueado(f"Muitas tentativas incorretas. Aguarde {math.ceil(espera)} segundos.", espera)
+
+
+def _podar(agora: float) -> None:
+    """Descarta bloqueios vencidos e chaves sem falha na janela; mantém no máximo MAX_CHAVES (chamar com o lock)."""
+    for chave in [c for c, ate in _bloqueado_ate.items() if ate <= agora]:
+        del _bloqueado_ate[chave]
+    for chave in [c for c, fila in _falhas.items() if agora - fila[-1] > JANELA_S and c not in _bloqueado_ate]:
+        del _falhas[chave]
+    for chave in list(_falhas)[:max(0, len(_falhas) - MAX_CHAVES)]:
+        del _falhas[chave]
+        _bloqueado_ate.pop(chave, None)
+
+
+def registrar_falha(usuario: str, ip: Optional[str] = None) -> None:
+    agora = time.monotonic()
+    with _lock_falhas:
+        for chave in _chaves(usuario, ip):
+            fila = _falhas.pop(chave, None) or deque()
+            _falhas[chave] = fila  # Reinsere no fim: a ordem do dicionário é a da falha mais recente
+            fila.append(agora)
+            while fila and agora - fila[0] > JANELA_S:
+                fila.popleft()
+            excesso = len(fila) - MAX_FALHAS
+            if excesso >= 0:
+                _bloqueado_ate[chave] = agora + min(BLOQUEIO_BASE_S * 2 ** excesso, BLOQUEIO_MAX_S)
+        _podar(agora)
+
+
+def registrar_sucesso(usuario: str, ip: Optional[str] = None) -> None:
+    # Só o usuário é liberado: um IP que testa várias contas continua sob observação
+    chave = _chaves(usuario, None)[0]
+    with _lock_falhas:
+        _falhas.pop(chave, None)
+        _bloqueado_ate.pop(chave, None)